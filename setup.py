@@ -18,4 +18,5 @@ else:
 setup(name="xsgen",
       version="0.1",
       packages=["xsgen"],
+      package_data={"xsgen": ["data/*.npz"]},
       **setup_kwargs)
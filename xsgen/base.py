@@ -5,6 +5,11 @@
   - ``--verbose``: Print more output.
   - ``--version``: Print version information.
   - ``--bash_completion``: Flag for enabling/disabling BASH completion when using argcomplete.
+  - ``--profile``: Print a summary of where the time was spent at the end of the run.
+  - ``--trace-file``: Path to write the timing trace to.
+  - ``--trace-format``: Format of the timing trace, 'jsonl' or 'chrome'.
+  - ``--trace-malloc``: Measure the memory allocated by each plugin phase.
+  - ``--plugin-threads``: Number of threads to execute parallel-safe plugins on.
 
 Base Plugin API
 ===============
@@ -17,6 +22,7 @@ from warnings import warn
 from xsgen.utils import RunControl, NotSpecified, writenewonly, \
     DEFAULT_RC_FILE, DEFAULT_PLUGINS, nyansep, indent
 from xsgen.plugins import Plugin
+from xsgen.tracing import Tracer, TRACE_FORMATS
 from xsgen.version import report_versions
 
 if sys.version_info[0] >= 3:
@@ -32,6 +38,11 @@ class XSGenPlugin(Plugin):
         verbose=False,
         version=False,
         bash_completion=True,
+        profile=False,
+        trace_file=None,
+        trace_format='jsonl',
+        trace_malloc=False,
+        plugin_threads=4,
         )
 
     rcdocs = {
@@ -42,6 +53,17 @@ class XSGenPlugin(Plugin):
         'version': "Print version information.",
         'bash_completion': ("Flag for enabling / disabling BASH completion. "
                             "This is only relevant when using argcomplete."),
+        'profile': ("Print a summary of the time spent in each phase of the "
+                    "calculation at the end of the run."),
+        'trace_file': ("Path to write the timing trace of the calculation to. "
+                       "If None, no trace is written."),
+        'trace_format': "Format of the timing trace, 'jsonl' or 'chrome'.",
+        'trace_malloc': ("Measure the peak memory allocated by Python in each "
+                         "phase of each plugin with tracemalloc, which slows "
+                         "down the calculation."),
+        'plugin_threads': ("Number of threads that consecutive parallel-safe "
+                           "plugins are executed on. 1 executes all plugins "
+                           "serially."),
         }
 
     def update_argparser(self, parser):
@@ -56,12 +78,32 @@ class XSGenPlugin(Plugin):
                             help=self.rcdocs["version"])
         parser.add_argument('--bash-completion', action='store_true',
                             help="enable bash completion", dest="bash_completion")
+        parser.add_argument('--profile', action='store_true', dest='profile',
+                            help=self.rcdocs["profile"])
+        parser.add_argument('--trace-file', dest='trace_file',
+                            help=self.rcdocs["trace_file"])
+        parser.add_argument('--trace-format', dest='trace_format',
+                            choices=TRACE_FORMATS, help=self.rcdocs["trace_format"])
+        parser.add_argument('--trace-malloc', action='store_true', dest='trace_malloc',
+                            help=self.rcdocs["trace_malloc"])
+        parser.add_argument('--plugin-threads', type=int, dest='plugin_threads',
+                            help=self.rcdocs["plugin_threads"])
 
     def setup(self, rc):
-        """Report version if requested."""
+        """Report version if requested and start the tracers."""
         if rc.version:
             print(report_versions())
             sys.exit()
+        if rc.trace_malloc:
+            try:
+                import tracemalloc
+            except ImportError:
+                warn("tracemalloc is not available, memory allocations will "
+                     "not be measured", RuntimeWarning)
+            else:
+                tracemalloc.start()
+        rc.tracer = Tracer(path=rc.trace_file, format=rc.trace_format,
+                           enabled=rc.profile or rc.trace_file is not None)
 
     def report_debug(self, rc):
         msg = 'Version Information:\n\n{0}\n\n'
@@ -0,0 +1,266 @@
+"""Writers that store all of the reactor libraries of a calculation in a binary,
+columnar layout: either a single chunked and compressed HDF5 file or a
+directory of uncompressed NumPy NPZ archives.
+
+Each perturbation state - the initial state of a run - gets its own group,
+``state<i>``.  The libraries that are superposed for the k-th initial nuclide
+perturbation of the run (see ``xsgen.superposition``) get the group
+``state<i>_p<k>``.
+The ``index`` group maps the groups to the state parameters (everything but
+``burn_times``) so that readers may look a state up without scanning the file.
+Within a state group, every material library (``fuel`` and one per tracked
+nuclide, named by zzaaam) has the ``TIME``, ``phi_tot``, ``NEUT_PROD``,
+``NEUT_DEST``, and ``BUd`` rows, and the transmutation matrix as ``trans``
+with its row names in ``trans_nucs``.  The ``xs`` group has the collapsed
+cross sections of every step and the ``phi_g`` group has the flux spectra on
+the EAF and OpenMC data source groups.
+
+In the HDF5 format, the transmutation matrices are chunked by nuclide so
+that a single nuclide's row may be read without decompressing the rest.
+
+In the NPZ format, the library is a directory, ``<outdir>``, next to the
+per-run output directories.  Each group is its own archive,
+``<outdir>/<group>.npz``, whose members are the paths within the group, e.g.
+``fuel/NEUT_PROD``, and the index is ``<outdir>/index.npz`` with the members
+``names`` and ``params``.  Every run is thus written once, without touching
+the others.  The archives are not compressed, so their members are stored
+contiguously and may be memory-mapped at their offsets in the file.
+
+Binary library API
+==================
+"""
+from __future__ import print_function
+import os
+
+import numpy as np
+
+try:
+    import tables as tb
+except ImportError:
+    tb = None
+
+from xsgen.brightlite import ROWNAMES, _libfiles, trans_matrix
+
+
+def flatten_libs(libs, threshold):
+    """Flattens the libraries of a run into a dict of arrays keyed by path.
+
+    Parameters
+    ----------
+    libs : dict
+        The reactor libraries gleaned from buk.
+    threshold : float
+        Mass fraction above which a nuclide is added to the transmutation
+        matrices.
+
+    Returns
+    -------
+    arrays : dict
+        Maps slash-separated paths, relative to the state group, to arrays.
+    """
+    arrays = {}
+    for name, matlib in _libfiles(libs):
+        for row in ROWNAMES:
+            arrays[name + '/' + row] = np.asarray(matlib[row], dtype='f8')
+        names, masses = trans_matrix(matlib['material'], threshold)
+        arrays[name + '/trans_nucs'] = np.array(names, dtype='S')
+        arrays[name + '/trans'] = masses
+    xs = [np.asarray(x) for x in libs.get('xs', ())]
+    if len(xs) > 0:
+        arrays['xs/step'] = np.concatenate([np.full(len(x), i + 1, dtype='i4')
+                                            for i, x in enumerate(xs)])
+        xs = np.concatenate(xs)
+        arrays['xs/nuc'] = xs['nuc']
+        arrays['xs/rx'] = xs['rx']
+        arrays['xs/xs'] = xs['xs']
+    phi_g = libs.get('phi_g', {})
+    for ds, e_g in phi_g.get('E_g', {}).items():
+        arrays['phi_g/' + ds + '/E_g'] = np.asarray(e_g, dtype='f8')
+        steps = [step[ds] for step in phi_g.get('phi_g', ()) if step.get(ds) is not None]
+        if len(steps) > 0:
+            arrays['phi_g/' + ds + '/phi_g'] = np.array(steps, dtype='f8')
+    if len(libs.get('particles', ())) > 0:
+        arrays['particles'] = np.asarray(libs['particles'], dtype='i8')
+    return arrays
+
+
+def state_params(state):
+    """The names and values of the parameters of a state, except burn_times.
+
+    Parameters
+    ----------
+    state : namedtuple (State)
+
+    Returns
+    -------
+    names : list of str
+    values : array of floats
+    """
+    names = [f for f in state._fields if f != 'burn_times']
+    values = np.array([getattr(state, f) for f in names], dtype='f8')
+    return names, values
+
+
+def find_state(index, values):
+    """Finds the row of an index that matches the state parameter values.
+
+    Parameters
+    ----------
+    index : 2D array
+        The state parameters of each group, one row per group.
+    values : array
+        The state parameters to find.
+
+    Returns
+    -------
+    i : int or None
+        The row, or None if the state is not in the index.
+    """
+    if len(index) == 0:
+        return None
+    match = np.nonzero(np.all(np.isclose(index, values, rtol=1e-12, atol=0.0),
+                              axis=1))[0]
+    return int(match[0]) if len(match) > 0 else None
+
+
+def group_name(i, libs):
+    """The name of the group of libraries whose state is row i of the index.
+
+    Parameters
+    ----------
+    i : int
+        The row of the state in the index.
+    libs : dict
+        The reactor libraries gleaned from buk.
+
+    Returns
+    -------
+    name : str
+    """
+    k = libs.get('superposition')
+    return 'state{0}'.format(i) if k is None else 'state{0}_p{1}'.format(i, k)
+
+
+class _LibraryWriter(object):
+    """Base class for the writers that put every run in one library file."""
+
+    format = None
+    ext = None
+    tallies = ('eafflux', 'omcflux')
+    """Names of the OpenMC tallies whose results this format writes out."""
+
+    def __init__(self, rc):
+        self.rc = rc
+        self.outdir = rc.outdirs[list(rc.formats).index(self.format)]
+
+    def library_path(self, dirname):
+        """Path of the library file, next to the per-run output directories."""
+        return os.path.join(os.path.dirname(dirname), self.outdir + self.ext)
+
+
+class HDF5Writer(_LibraryWriter):
+    """Writes reactor libraries into one chunked, compressed HDF5 file."""
+
+    format = 'hdf5'
+    ext = '.h5'
+
+    def __init__(self, rc):
+        if tb is None:
+            raise ImportError("PyTables is required for the hdf5 output format.")
+        super(HDF5Writer, self).__init__(rc)
+        self.filters = tb.Filters(complevel=rc.binary_complevel,
+                                  complib='zlib', shuffle=True)
+
+    def write(self, libs, dirname):
+        """Write out the libraries of a run to their state's group.
+
+        Parameters
+        ----------
+        libs : dict
+            The reactor libraries gleaned from buk.
+        dirname : str
+            The output directory of the run; the library file is written next
+            to it.
+        """
+        names, values = state_params(libs['state'])
+        arrays = flatten_libs(libs, self.rc.track_nuc_threshold)
+        with tb.open_file(self.library_path(dirname), 'a') as f:
+            if '/index' in f:
+                index = f.root.index.params[:]
+            else:
+                index = np.empty((0, len(values)), dtype='f8')
+                f.create_group('/', 'index')
+                f.create_array('/index', 'names', np.array(names, dtype='S'))
+                f.create_earray('/index', 'params', tb.Float64Atom(),
+                                shape=(0, len(values)))
+            i = find_state(index, values)
+            if i is None:
+                i = len(index)
+                f.root.index.params.append(values[np.newaxis])
+            group = group_name(i, libs)
+            if '/' + group in f:
+                f.remove_node('/', group, recursive=True)
+            for path, arr in sorted(arrays.items()):
+                where, name = os.path.split('/' + group + '/' + path)
+                node = f.create_group(*os.path.split(where), createparents=True) \
+                       if where not in f else f.get_node(where)
+                self._save(f, node, name, arr)
+
+    def _save(self, f, where, name, arr):
+        if arr.size == 0 or arr.dtype.kind == 'S':
+            f.create_array(where, name, arr)
+            return
+        chunkshape = (1, arr.shape[1]) if arr.ndim == 2 else None
+        f.create_carray(where, name, obj=arr, filters=self.filters,
+                        chunkshape=chunkshape)
+
+
+class NPZWriter(_LibraryWriter):
+    """Writes reactor libraries into a directory of uncompressed NumPy NPZ
+    archives, one per group."""
+
+    format = 'npz'
+    ext = ''
+
+    def __init__(self, rc):
+        super(NPZWriter, self).__init__(rc)
+        self.index = None
+
+    def write(self, libs, dirname):
+        """Write out the libraries of a run to the archive of their group.  The
+        archives are written under temporary names first.
+
+        Parameters
+        ----------
+        libs : dict
+            The reactor libraries gleaned from buk.
+        dirname : str
+            The output directory of the run; the library directory is next to
+            it.
+        """
+        path = self.library_path(dirname)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        names, values = state_params(libs['state'])
+        if self.index is None:
+            self.index = self._read_index(path, names, len(values))
+        i = find_state(self.index['params'], values)
+        if i is None:
+            i = len(self.index['params'])
+            self.index['params'] = np.vstack([self.index['params'], values])
+            self._save(os.path.join(path, 'index.npz'), self.index)
+        arrays = flatten_libs(libs, self.rc.track_nuc_threshold)
+        self._save(os.path.join(path, group_name(i, libs) + '.npz'), arrays)
+
+    def _read_index(self, path, names, nparams):
+        fname = os.path.join(path, 'index.npz')
+        if os.path.isfile(fname):
+            with np.load(fname) as npz:
+                return dict(npz.items())
+        return {'names': np.array(names, dtype='S'),
+                'params': np.empty((0, nparams), dtype='f8')}
+
+    def _save(self, fname, arrays):
+        tmp = fname + '.tmp.npz'
+        np.savez(tmp, **arrays)
+        os.rename(tmp, fname)
@@ -1,21 +1,49 @@
+"""Writing and reading of Brightlite reactor libraries.  A Brightlite output
+directory has a ``fuel.txt`` library and a ``<zzaaam>.txt`` library for each
+tracked nuclide, along with the ``manifest.txt``, ``params.txt``,
+``structural.txt``, and ``TAPE9.INP`` metadata files.
+
+Brightlite API
+==============
+"""
 from __future__ import print_function
 import os
+import sys
+import gzip
 import json
 import shutil
 from math import pi
+from collections import namedtuple, OrderedDict
 
 import numpy as np
 
 from pyne import rxname
 from pyne import nucname
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ROWNAMES = ["TIME", "phi_tot", "NEUT_PROD", "NEUT_DEST", "BUd"]
+JOURNAL_EXT = ".journal"
+COMPRESSION_EXTS = OrderedDict([(None, ""), ("gzip", ".gz"), ("zstd", ".zst")])
+"""Extensions that are added to library files by each compression."""
+
+
 class BrightliteWriter(object):
 
+    tallies = ()
+    """Names of the OpenMC tallies whose results this format writes out."""
+
     def __init__(self, rc):
         self.rc = rc
+        self._journals = {}
 
     def write(self, libs, dirname):
-        """Write out libraries to a directory.
+        """Write out libraries to a directory.  If columns have been appended
+        to journals in this directory with ``append()``, they are compacted
+        into the library files instead of rebuilding every file from libs.
 
         Parameters
         ----------
@@ -26,40 +54,226 @@ class BrightliteWriter(object):
         """
         if not os.path.isdir(dirname):
             os.makedirs(dirname)
-        rownames = ["TIME", "phi_tot", "NEUT_PROD", "NEUT_DEST", "BUd"]
-        for mat, matlib in libs.items():
-            if isinstance(mat, int):
-                fname = str(nucname.zzaaam(mat))
-            elif mat == 'fuel':
-                fname = mat
-            else:
-                continue
-            trans_matrix = {}
-            if os.path.isdir(os.path.join(dirname, fname + ".txt")):
-                libs, trans_matrix = self.update(libs, dirname, fname)
-            else:
-                i = 0 
-                while i < len(matlib['material']):
-                    for temp_nuc in matlib['material'][i].comp:
-                        nuc_name = str(nucname.name(temp_nuc))
-                        try:
-                            trans_matrix[nuc_name].append(matlib['material'][i].comp[temp_nuc]*1000)
-                        except KeyError:
-                            if matlib['material'][i].comp[temp_nuc] > self.rc.track_nuc_threshold:
-                                zero_array = [0.]*i
-                                trans_matrix[nuc_name] = zero_array
-                                trans_matrix[nuc_name].append(matlib['material'][i].comp[temp_nuc]*1000)
-                    i+=1
-            lines = [row + "   " + "   ".join(map(str, matlib[row]))
-                for row in rownames]
-            lines.extend(sorted([n + "   " + "   ".
-                                 join(["{:.4g}".format(f) for f in trans_matrix[n]])
-                                 for n in trans_matrix]))
-            with open(os.path.join(dirname, fname + ".txt"), "w") as f:
-                f.write("\n".join(lines))
-            nucs = matlib["tracked_nucs"]
+        if self.has_journals(dirname):
+            self.compact(libs, dirname)
+            return
+        def write_file(item):
+            fname, matlib = item
+            names, masses = trans_matrix(matlib['material'], self.rc.track_nuc_threshold)
+            rows = [(row, list(map(str, matlib[row]))) for row in ROWNAMES]
+            self._write_table(dirname, fname, rows, names, masses)
+        self._map(write_file, _libfiles(libs))
         if not os.path.isfile(os.path.join(dirname, "manifest.txt")):
-            self.write_metadata(nucs, libs, dirname)
+            self.write_metadata(libs['fuel']['tracked_nucs'], libs, dirname)
+        if len(libs.get('particles', ())) > 0:
+            self.write_particles(libs, dirname)
+
+    def _write_table(self, dirname, fname, rows, names, masses):
+        """Writes the rows and transmutation matrix of one library file,
+        compressed according to the compression run control parameter.
+
+        Parameters
+        ----------
+        dirname : str
+            The output directory.
+        fname : str
+            Name of the library file, without extension.
+        rows : list of (str, list of str) tuples
+            The TIME, phi_tot, NEUT_PROD, NEUT_DEST, and BUd rows.
+        names : list of str
+            Sorted nuclide names of the transmutation matrix rows.
+        masses : 2D array
+            The transmutation matrix, with shape (len(names), number of steps).
+        """
+        compression = self.rc.get("compression")
+        path = os.path.join(dirname, fname + ".txt")
+        for c, ext in COMPRESSION_EXTS.items():
+            if c != compression and os.path.isfile(path + ext):
+                os.remove(path + ext)
+        path += COMPRESSION_EXTS[compression]
+        with open_text(path, "w", self.rc.get("compression_level")) as f:
+            f.write("\n".join([row + "   " + "   ".join(values) for row, values in rows]))
+            f.write("\n")
+            if len(names) > 0:
+                table = np.empty((len(names), masses.shape[1] + 1), dtype=object)
+                table[:, 0] = names
+                table[:, 1:] = masses
+                np.savetxt(f, table, fmt="%s" + "   %.4g" * masses.shape[1])
+
+    def _map(self, func, items):
+        """Calls func on every item, fanned out across the threads of the
+        run control's I/O pool if there is one."""
+        pool = self.rc.get('iopool')
+        if pool is None:
+            return list(map(func, items))
+        return pool.map(func, list(items))
+
+    #
+    # incremental writing
+    #
+
+    def append(self, libs, dirname):
+        """Appends the timesteps in libs that have not been written yet to a
+        journal per library file, rather than rewriting every file.  Each
+        timestep is a single line in each journal.  Call ``write()`` (or
+        ``compact()``) at the end of the run to turn the journals into the
+        library files.
+
+        Parameters
+        ----------
+        libs : dict
+            The reactor libraries gleaned from buk.
+        dirname : str
+            The output directory.
+        """
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        threshold = self.rc.track_nuc_threshold
+
+        def append_file(item):
+            fname, matlib = item
+            path = os.path.join(dirname, fname + JOURNAL_EXT)
+            key = os.path.abspath(path)
+            if key not in self._journals:
+                self._journals[key] = self._read_journal_state(dirname, fname)
+            ncols, started = self._journals[key]
+            lines = []
+            for i in range(ncols, len(matlib['TIME'])):
+                column = {}
+                for nuc, frac in matlib['material'][i].comp.items():
+                    nuc_name = str(nucname.name(nuc))
+                    if nuc_name in started or frac > threshold:
+                        started.add(nuc_name)
+                        column[nuc_name] = frac * 1000
+                rows = [str(matlib[row][i]) for row in ROWNAMES]
+                lines.append(json.dumps({'rows': rows, 'trans': column}) + "\n")
+            with open(path, "a") as f:
+                f.writelines(lines)
+            self._journals[key] = (len(matlib['TIME']), started)
+        self._map(append_file, _libfiles(libs))
+
+    def _read_journal_state(self, dirname, fname):
+        """Finds how many timesteps of a library file are already on disk and
+        which nuclides have rows, from its library file and journal."""
+        ncols = 0
+        started = set()
+        txt = find_table(dirname, fname)
+        if txt is not None:
+            rows, names, _ = self.read_table(txt)
+            ncols = len(rows[0][1])
+            started.update(names)
+        path = os.path.join(dirname, fname + JOURNAL_EXT)
+        if os.path.isfile(path):
+            for column in _read_journal(path):
+                ncols += 1
+                started.update(column['trans'])
+        return ncols, started
+
+    def has_journals(self, dirname):
+        """Whether there are journals to compact in a directory."""
+        return os.path.isdir(dirname) and \
+            any(f.endswith(JOURNAL_EXT) for f in os.listdir(dirname))
+
+    def compact(self, libs, dirname):
+        """Merges the journals in a directory into their library files, removes
+        the journals, and writes the metadata files.
+
+        Parameters
+        ----------
+        libs : dict
+            The reactor libraries gleaned from buk.
+        dirname : str
+            The output directory.
+        """
+        def compact_file(item):
+            fname, matlib = item
+            path = os.path.join(dirname, fname + JOURNAL_EXT)
+            if not os.path.isfile(path):
+                return
+            rows, names, masses = self.update(dirname, fname, _read_journal(path))
+            self._write_table(dirname, fname, rows, names, masses)
+            os.remove(path)
+            self._journals.pop(os.path.abspath(path), None)
+        self._map(compact_file, _libfiles(libs))
+        self.write_metadata(libs['fuel']['tracked_nucs'], libs, dirname)
+        if len(libs.get('particles', ())) > 0:
+            self.write_particles(libs, dirname)
+
+    def read_table(self, path):
+        """Reads a library file.
+
+        Parameters
+        ----------
+        path : str
+            Path to the library file.
+
+        Returns
+        -------
+        rows : list of (str, list of str) tuples
+            The TIME, phi_tot, NEUT_PROD, NEUT_DEST, and BUd rows.
+        names : list of str
+            Nuclide names of the transmutation matrix rows.
+        masses : 2D array
+            The transmutation matrix, with shape (len(names), number of steps).
+        """
+        return read_table(path)
+
+    def update(self, dirname, fname, columns):
+        """Merges new timesteps into a library file's rows by nuclide.  Rows of
+        the transmutation matrix which are new are padded with zeros for the
+        timesteps before they appear, and existing rows which are missing from
+        a timestep get a zero for it.
+
+        Parameters
+        ----------
+        dirname : str
+            The output directory.
+        fname : str
+            Name of the library file, without extension.
+        columns : iterable of dicts
+            The timesteps to merge, as read from a journal.  The 'rows' key
+            holds the formatted TIME, phi_tot, NEUT_PROD, NEUT_DEST, and BUd
+            values and the 'trans' key maps nuclide names to masses.
+
+        Returns
+        -------
+        rows : list of (str, list of str) tuples
+            The merged TIME, phi_tot, NEUT_PROD, NEUT_DEST, and BUd rows.
+        names : list of str
+            Sorted nuclide names of the merged transmutation matrix rows.
+        masses : 2D array
+            The merged transmutation matrix.
+        """
+        txt = find_table(dirname, fname)
+        if txt is not None:
+            rows, old_names, old_masses = self.read_table(txt)
+        else:
+            rows = [(row, []) for row in ROWNAMES]
+            old_names, old_masses = [], np.empty((0, 0), dtype='f8')
+        columns = list(columns)
+        nold = len(rows[0][1])
+        names = set(old_names)
+        for column in columns:
+            for (row, values), value in zip(rows, column['rows']):
+                values.append(value)
+            names.update(column['trans'])
+        names = sorted(names)
+        index = {name: i for i, name in enumerate(names)}
+        masses = np.zeros((len(names), nold + len(columns)), dtype='f8')
+        if len(old_names) > 0:
+            masses[[index[name] for name in old_names], :nold] = old_masses
+        for j, column in enumerate(columns, nold):
+            trans = column['trans']
+            masses[[index[name] for name in trans], j] = list(trans.values())
+        return rows, names, masses
+
+    def write_particles(self, libs, dirname):
+        """Write out the number of transport particles per cycle used for
+        each timestep, next to the fuel's times."""
+        particles = [0] + list(libs['particles'])
+        with open(os.path.join(dirname, "particles.txt"), "w") as f:
+            f.write("TIME   " + "   ".join(map(str, libs['fuel']['TIME'])) + "\n")
+            f.write("PARTICLES   " + "   ".join(map(str, particles)) + "\n")
     
     def write_metadata(self, nucs, libs, dirname):
         track_actinides = [n for n in nucs if nucname.znum(n) in nucname.act]
@@ -89,41 +303,332 @@ class BrightliteWriter(object):
                         for n, f in self.rc.clad_material.comp.items()]
             f.write("\n".join(cladrows))
             f.write("\n")
-        shutil.copyfile("TAPE9.INP", os.path.join(dirname, "TAPE9.INP"))
-
-    def update(self, libs, dirname, fname):
-        rownames = ["TIME", "phi_tot", "NEUT_PROD", "NEUT_DEST", "BUd"]
-        trans_matrix = {}
-        for mat, matlib in libs.items():
-            if isinstance(mat, int):
-                fname = str(nucname.zzaaam(mat))
-            elif mat == 'fuel':
-                fname = mat
-            else:
-                continue
-            f = open(os.path.join(dirname, fname + ".txt"), "r")         
-            lines = f.readlines()
-            time_steps = len(lines[0].split())
-            i = 5
-            while i < range(len(lines)):
-                nuc_array = lines[i].split()
-                nuc_name = nuc_array[0]
-                nuc_values = nuc_array[1:]
-                if len(nuc_array) == time_steps:
-                    trans_matrix[nuc_name] = nuc_values
-                    trans_matrix[nuc_name].append(matlib['material'][-1].comp[temp_nuc]*1000)
-                else:
-                    if matlib['material'][-1].comp[nuc_name] > self.rc.track_nuc_threshold:
-                        zero_array = [0.]*(time_steps-1)
-                        trans_matrix[nuc_name] = zero_array
-                        trans_matrix[nuc_name].append(matlib['material'][-1].comp[temp_nuc]*1000)
-                i+=1;
-            if time_steps == len(matlib['TIME']):
-                return libs, trans_matrix
-            for j in range(len(rownames)):
-                store = matlib[rownames[j]][-1]
-                matlib[rownames[j]] = lines[j].split()[1:]
-                matlib[rownames[j]].append(store)
-
-        return libs, trans_matrix    
+        tape9 = os.path.join(dirname, "TAPE9.INP")
+        if 'tape9' in libs:
+            with open(tape9, "w") as f:
+                f.write(libs['tape9'])
+        else:
+            shutil.copyfile("TAPE9.INP", tape9)
+
+
+Library = namedtuple('Library', ['rows', 'names', 'masses'])
+"""A parsed library file: a dict of the TIME, phi_tot, NEUT_PROD, NEUT_DEST,
+and BUd rows as float arrays, the nuclide names of the transmutation matrix
+rows, and the transmutation matrix itself."""
+
+
+class BrightliteReader(object):
+    """Reads the libraries in a Brightlite output directory.  The directory is
+    indexed once, and library files are only parsed when they are first asked
+    for.  The most recently used parsed libraries are kept in a cache.
+    """
+
+    def __init__(self, dirname, cache_size=32):
+        """Parameters
+        ----------
+        dirname : str
+            The output directory, as written by ``BrightliteWriter``.
+        cache_size : int, optional
+            Maximum number of parsed libraries to keep in memory.
+
+        """
+        self.dirname = dirname
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._files = {}
+        for f in os.listdir(dirname):
+            name = _table_name(f)
+            if name == 'fuel':
+                self._files[name] = f
+            elif name is not None and name.isdigit():
+                self._files[int(name)] = f
+        if 'fuel' not in self._files:
+            raise ValueError("{0} is not a Brightlite library directory: "
+                             "fuel.txt is missing".format(dirname))
+
+    @property
+    def nucs(self):
+        """Sorted zzaaam ids of the nuclides that have libraries."""
+        return sorted(k for k in self._files if k != 'fuel')
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(['fuel'] + self.nucs)
+
+    def __contains__(self, key):
+        return self._key(key) in self._files
+
+    def __getitem__(self, key):
+        """The parsed library of 'fuel' or of a nuclide, as a ``Library``."""
+        key = self._key(key)
+        if key in self._cache:
+            self.hits += 1
+            self._cache[key] = lib = self._cache.pop(key)
+            return lib
+        if key not in self._files:
+            raise KeyError(key)
+        self.misses += 1
+        rows, names, masses = read_table(os.path.join(self.dirname, self._files[key]))
+        lib = Library({row: np.array(values, dtype='f8') for row, values in rows},
+                      names, masses)
+        self._cache[key] = lib
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return lib
+
+    def _key(self, key):
+        if key in self._files:
+            return key
+        try:
+            return nucname.zzaaam(key)
+        except Exception:
+            return key
+
+    def clear(self):
+        """Empties the cache of parsed libraries."""
+        self._cache.clear()
+
+    def _read_keyvalues(self, fname, conv):
+        path = os.path.join(self.dirname, fname)
+        if not os.path.isfile(path):
+            return {}
+        with open(path, "r") as f:
+            pairs = [line.split() for line in f if line.strip()]
+        return {conv(k): float(v) for k, v in pairs}
+
+    @property
+    def manifest(self):
+        """The zzaaam ids of the tracked actinides, from manifest.txt."""
+        path = os.path.join(self.dirname, "manifest.txt")
+        if not os.path.isfile(path):
+            return []
+        with open(path, "r") as f:
+            return [int(line) for line in f if line.strip()]
+
+    @property
+    def params(self):
+        """The ENRICHMENT, BATCHES, PNL, BURNUP, and FLUX parameters that were
+        written, from params.txt."""
+        return self._read_keyvalues("params.txt", str)
+
+    @property
+    def structural(self):
+        """The structural material, as zzaaam ids to mass fractions relative
+        to the fuel, from structural.txt."""
+        return self._read_keyvalues("structural.txt", int)
+
+    @property
+    def tape9(self):
+        """Path to the TAPE9.INP decay and cross section library."""
+        return os.path.join(self.dirname, "TAPE9.INP")
+
+    def burnup(self):
+        """The cumulative burnup of the fuel at each timestep, in the units of
+        the BUd row."""
+        return np.cumsum(self['fuel'].rows['BUd'])
+
+    def interpolate(self, burnup, keys=None):
+        """Interpolates libraries to a fuel burnup.  The burnup is converted to
+        a time along the fuel library, and every library is linearly
+        interpolated to that time, so that the libraries of all of the
+        nuclides describe the same point of the irradiation.
+
+        Parameters
+        ----------
+        burnup : float
+            The cumulative fuel burnup, see ``burnup()``.  This is clipped to the
+            burnups of the libraries.
+        keys : list or None, optional
+            'fuel' and the nuclides to interpolate.  If None, all of them.
+
+        Returns
+        -------
+        libs : dict
+            Maps the keys to dicts of the row names to values and of the
+            nuclide names of the transmutation matrix to masses.
+        """
+        fuel = self['fuel']
+        time = np.interp(burnup, self.burnup(), fuel.rows['TIME'])
+        libs = {}
+        for key in (self if keys is None else keys):
+            lib = self[key]
+            t = lib.rows['TIME']
+            values = {row: float(np.interp(time, t, lib.rows[row])) for row in ROWNAMES}
+            if len(lib.names) > 0:
+                masses = np.array([np.interp(time, t, m) for m in lib.masses])
+                values.update(zip(lib.names, masses.tolist()))
+            libs[key] = values
+        return libs
+
+
+def attach_tape9(libs, path="TAPE9.INP"):
+    """Reads the TAPE9 now and attaches its contents to a shallow copy of libs
+    as 'tape9', so that a write in the background neither depends on the
+    working directory nor sees a TAPE9 that is being rewritten for the next
+    step.
+
+    Parameters
+    ----------
+    libs : dict
+        The reactor libraries gleaned from buk.
+    path : str, optional
+        The TAPE9 that the libraries were made with.
+
+    Returns
+    -------
+    libs : dict
+        libs itself if there is no TAPE9 at path.
+    """
+    if not os.path.isfile(path):
+        return libs
+    with open(path, "r") as f:
+        return dict(libs, tape9=f.read())
+
+
+def _libfiles(libs):
+    """Yields the library file names, without extension, and the libraries
+    that are written to them."""
+    for mat, matlib in libs.items():
+        if isinstance(mat, int):
+            yield str(nucname.zzaaam(mat)), matlib
+        elif mat == 'fuel':
+            yield mat, matlib
+
+
+def read_table(path):
+    """Reads a library file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the library file.
+
+    Returns
+    -------
+    rows : list of (str, list of str) tuples
+        The TIME, phi_tot, NEUT_PROD, NEUT_DEST, and BUd rows.
+    names : list of str
+        Nuclide names of the transmutation matrix rows.
+    masses : 2D array
+        The transmutation matrix, with shape (len(names), number of steps).
+    """
+    with open_text(path, "r") as f:
+        lines = [line.split() for line in f.read().splitlines() if line.strip()]
+    nrows = len(ROWNAMES)
+    rows = [(line[0], line[1:]) for line in lines[:nrows]]
+    names = [line[0] for line in lines[nrows:]]
+    masses = np.array([line[1:] for line in lines[nrows:]], dtype='f8')
+    masses.shape = (len(names), len(rows[0][1]))
+    return rows, names, masses
+
+
+def open_text(path, mode="r", level=None):
+    """Opens a library file as text, through a streaming compressor or
+    decompressor if its extension is one of ``COMPRESSION_EXTS``.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+    mode : str, optional
+        'r', 'w', or 'a'.
+    level : int or None, optional
+        Compression level when writing, defaults to that of the compressor.
+
+    Returns
+    -------
+    f : file-like
+    """
+    if path.endswith(COMPRESSION_EXTS["gzip"]):
+        mode = mode if sys.version_info[0] < 3 else mode + "t"
+        return gzip.open(path, mode, compresslevel=6 if level is None else level)
+    elif path.endswith(COMPRESSION_EXTS["zstd"]):
+        if zstandard is None:
+            raise ImportError("zstandard is required for zstd compressed "
+                              "libraries: " + path)
+        if mode == "r":
+            return zstandard.open(path, "rt")
+        cctx = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return zstandard.open(path, mode + "t", cctx=cctx)
+    return open(path, mode)
+
+
+def find_table(dirname, fname):
+    """Finds a library file, whichever compression it was written with.
+
+    Parameters
+    ----------
+    dirname : str
+        The output directory.
+    fname : str
+        Name of the library file, without extension.
+
+    Returns
+    -------
+    path : str or None
+        Path to the library file, or None if there is none.
+    """
+    path = os.path.join(dirname, fname + ".txt")
+    for ext in COMPRESSION_EXTS.values():
+        if os.path.isfile(path + ext):
+            return path + ext
+    return None
+
+
+def _table_name(f):
+    """The name of a library file, without the .txt and compression
+    extensions, or None if f is not a library file."""
+    for ext in COMPRESSION_EXTS.values():
+        if f.endswith(".txt" + ext):
+            return f[:-len(".txt" + ext)]
+    return None
+
+
+def _read_journal(path):
+    """Reads the timesteps in a journal written by ``BrightliteWriter.append()``."""
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def trans_matrix(materials, threshold):
+    """Builds the transmutation matrix of a library from the materials at each
+    timestep.  A nuclide gets a row once its mass fraction exceeds the
+    threshold, and its row is zero for the timesteps before that.
+
+    Parameters
+    ----------
+    materials : list of pyne.material.Material
+        The material at each timestep.
+    threshold : float
+        Mass fraction above which a nuclide is added to the matrix.
 
+    Returns
+    -------
+    names : list of str
+        Sorted nuclide names of the rows.
+    masses : 2D array
+        The masses [g] per 1 kg of initial material, with shape
+        (len(names), len(materials)).
+    """
+    nsteps = len(materials)
+    nucs, steps, fracs = [], [], []
+    for i, mat in enumerate(materials):
+        comp = mat.comp
+        nucs.append(np.fromiter(comp.keys(), dtype='i8', count=len(comp)))
+        fracs.append(np.fromiter(comp.values(), dtype='f8', count=len(comp)))
+        steps.append(np.full(len(comp), i, dtype='i8'))
+    if nsteps == 0 or sum(map(len, nucs)) == 0:
+        return [], np.empty((0, nsteps), dtype='f8')
+    ids, rows = np.unique(np.concatenate(nucs), return_inverse=True)
+    masses = np.zeros((len(ids), nsteps), dtype='f8')
+    masses[rows, np.concatenate(steps)] = np.concatenate(fracs)
+    started = np.logical_or.accumulate(masses > threshold, axis=1)
+    keep = started[:, -1]
+    masses = np.where(started, masses, 0.0)[keep] * 1000
+    names = [str(nucname.name(nuc)) for nuc in ids[keep].tolist()]
+    order = sorted(range(len(names)), key=names.__getitem__)
+    return [names[i] for i in order], masses[order]
@@ -3,6 +3,10 @@
 Provides the following command-line arguments:
   - ``--openmc-cross-sections``: Path to the cross_sections.xml file for OpenMC
   - ``--origen``: ORIGEN 2.2 command
+  - ``--xs-store``: Directory of the shared, memory-mapped fine-group cross section store
+  - ``--io-threads``: Number of background threads that write out libraries
+  - ``--dry-run``: Print the estimated cost of the calculation and exit
+  - ``--plan-trace``: Trace of a pilot execution that calibrates the dry run's wall time
   - ``--solver``: The physics codes that are used to solve the burnup-criticality problem and compute cross sections and transmutation matrices.
 
 Burnup-criticality plugin API
@@ -10,61 +14,26 @@ Burnup-criticality plugin API
 """
 from __future__ import print_function
 import os
+import sys
 import shutil
-
-import numpy as np
-
-from xsgen.plugins import Plugin
-from xsgen.utils import RunControl, NotSpecified
-from xsgen.openmc_origen import OpenMCOrigen
+from warnings import warn
+
+from xsgen.buk_meta import XSGenPluginMeta
+from xsgen.utils import NotSpecified
+from xsgen.openmc_origen import OpenMCOrigen, required_tallies
+from xsgen.planner import make_plan, calibrate
+from xsgen.tracing import load_trace
+from xsgen.iopool import IOPool
+from xsgen.brightlite import attach_tape9
+from xsgen.states import StateSpace, group_runs
+from xsgen.superposition import LINEAR_ROWS, superpose, linearity_error
 
 SOLVER_ENGINES = {'openmc+origen': OpenMCOrigen}
 
 
-class XSGenPlugin(Plugin):
-    """The plugin class, inheriting from xsgen.plugins.Plugin."""
-
-    requires = ('xsgen.pre',)
-    """The burnup-criticality plugin requires :mod:`xsgen.pre`."""
-
-    defaultrc = RunControl(
-        solver=NotSpecified,
-        openmc_cross_sections=NotSpecified,
-        openmc_group_struct=np.logspace(1, -9, 1001),
-        )
-
-    rcdocs = {
-        'openmc_cross_sections': ('Path to the cross_sections.xml file '
-                                  'for OpenMC'),
-        'openmc_group_struct': 'Group structure for OpenMC data source.',
-        'origen': 'ORIGEN 2.2 command',
-        'threads': 'Number of threads to use',
-        'solver': ('The physics codes that are used to solve the '
-                   'burnup-criticality problem and compute cross sections and '
-                   'transmutation matrices.'),
-        'plot_group_flux': 'Output plots of group flux for each OpenMC run.',
-        }
-
-    def update_argparser(self, parser):
-        """Adds plugin-specific command-line arguments.
-
-        Parameters
-        ----------
-        parser : argparse.ArgumentParser
-            The parser that belongs to xsgen. We update this.
-
-        Returns
-        -------
-        None
-        """
-        parser.add_argument('--threads', '-j', dest='threads', help=self.rcdocs['threads'],
-                            type=int)
-        parser.add_argument('--solver', dest='solver', help=self.rcdocs['solver'])
-        parser.add_argument('--origen', dest='origen_call', help=self.rcdocs['origen'])
-        parser.add_argument("--openmc-cross-sections", dest="openmc_cross_sections",
-                            help=self.rcdocs['openmc_cross_sections'])
-        parser.add_argument("--plot-group-flux", dest="plot_group_flux", action="store_true",
-                            help=self.rcdocs["plot_group_flux"])
+class XSGenPlugin(XSGenPluginMeta):
+    """The plugin class, inheriting from the light
+    :class:`xsgen.buk_meta.XSGenPluginMeta`."""
 
     def setup(self, rc):
         """Check if we have OpenMC cross-section data in the RC and set the appropriate
@@ -80,6 +49,12 @@ class XSGenPlugin(Plugin):
         None
         """
         self._ensure_omcxs(rc)
+        if rc.dry_run:
+            self.dry_run(rc)
+        if rc.xs_store is not None:
+            rc.xs_store = os.path.abspath(rc.xs_store)
+        rc.iopool = IOPool(threads=rc.io_threads, maxsize=rc.io_queue_size,
+                           tracer=rc.tracer)
 
         # do after all other values have been setup
         if rc.solver is NotSpecified:
@@ -89,27 +64,30 @@ class XSGenPlugin(Plugin):
             shutil.rmtree(rc.engine.builddir, ignore_errors=True)
             print("removing builddir")
 
-    def same_except_burnup_time(self, state1, state2):
-        """Check if two different states are equivalent except for their burnup time.
+    def dry_run(self, rc):
+        """Prints the plan of the calculation and exits, before any cross
+        sections are loaded.
 
         Parameters
         ----------
-        state1, state2 : namedtuple (State)
-            The states to compare.
+        rc : xsgen.utils.RunControl
+            The RunControl that controls this instance of xsgen.
 
         Returns
         -------
-        bool
-            True if the two state are the same except burnup time, else False.
+        None
         """
-        if len(state1) != len(state2):
-            raise ValueError("States have unequal number of perturbation paramaters.")
-        for index in range(len(state1)):
-            if state1._fields[index] == 'burn_times':
-                continue
-            if state1[index] != state2[index]:
-                return False
-        return True
+        states = rc.states
+        if 'xsgen.surrogate' in rc.get('plugins', ()):
+            # the surrogate thins the states out in its setup, after this one
+            from xsgen.surrogate import anchor_states
+            states = anchor_states(states, rc.surrogate_stride)
+        plan = make_plan(rc, required_tallies(rc), states)
+        timings = None
+        if rc.plan_trace is not None:
+            timings = calibrate(load_trace(rc.plan_trace))
+        print(plan.summary(timings, rc.threads))
+        sys.exit()
 
     def execute(self, rc):
         """Sort states into runs by initial parameters, then generate libraries
@@ -124,25 +102,108 @@ class XSGenPlugin(Plugin):
         -------
         None
         """
-        runs = []
-        for state in rc.states:
-            already_existed = False
-            for run in runs:
-                if self.same_except_burnup_time(run[0], state):
-                    run.append(state)
-                    already_existed = True
-            if not already_existed:
-                runs.append([state])
-        rc.runs = runs
+        if isinstance(rc.states, StateSpace):
+            rc.runs = rc.states.runs()
+        else:
+            rc.runs = group_runs(rc.states)
 
+        rc.run_outputs = []
+        rc.superposition_outputs = []
         for run_num, run in enumerate(rc.runs):
-            basepath = os.path.join(rc.engine.builddir, rc.outdirs[0])
-            fname = basepath + str(run_num)
-            libs = rc.engine.generate_run(run, fname)
-            for i, writer in enumerate(rc.writers):
+            with rc.tracer.span('run', run=run_num):
                 basepath = os.path.join(rc.engine.builddir, rc.outdirs[0])
                 fname = basepath + str(run_num)
-                writer.write(libs, fname)
+                libs = rc.engine.generate_run(run, fname)
+                outputs = self.write_libs(rc, libs, str(run_num), run_num)
+                rc.run_outputs.append((run[0], outputs))
+                if len(rc.superpositions) > 0:
+                    self.write_superpositions(rc, libs, run, run_num)
+        rc.iopool.flush()
+        for writer in rc.writers:
+            # formats that gather every run into one file write it out here
+            if hasattr(writer, 'close'):
+                writer.close()
+        if rc.verbose or rc.profile:
+            print(rc.iopool.summary())
+
+    def write_libs(self, rc, libs, suffix, run_num):
+        """Submits libraries to every output format.
+
+        Parameters
+        ----------
+        rc : xsgen.utils.RunControl
+            The RunControl controlling this instance of xsgen.
+        libs : dict
+            The reactor libraries.
+        suffix : str
+            Appended to the output directory of each format.
+        run_num : int
+            The run that the libraries come from.
+
+        Returns
+        -------
+        outputs : dict
+            Maps formats to the absolute paths that they are written to.
+        """
+        outputs = {}
+        # the writes run in the background, while the engine changes the
+        # working directory and rewrites the TAPE9
+        libs = attach_tape9(libs)
+        for i, writer in enumerate(rc.writers):
+            fname = os.path.abspath(os.path.join(rc.engine.builddir, rc.outdirs[i]) + suffix)
+            rc.iopool.submit(rc.formats[i], writer.write, libs, fname,
+                             run=run_num)
+            outputs[rc.formats[i]] = fname
+        return outputs
+
+    def write_superpositions(self, rc, libs, run, run_num):
+        """Writes the libraries of the initial nuclide perturbations of a run,
+        superposed from its tracked nuclide libraries.  Warns if the fuel of
+        the run is not reproduced by its tracked nuclides to within
+        rc.superposition_tolerance.
+
+        Parameters
+        ----------
+        rc : xsgen.utils.RunControl
+            The RunControl controlling this instance of xsgen.
+        libs : dict
+            The reactor libraries of the run.
+        run : list of States
+            The states of the run.
+        run_num : int
+            The index of the run.
+
+        Returns
+        -------
+        None
+        """
+        errors = linearity_error(libs, rc.track_nuc_threshold)
+        worst = max(errors[key] for key in LINEAR_ROWS + ('trans',))
+        if worst > rc.superposition_tolerance:
+            warn("run {0} superposes its fuel from the tracked nuclides with a "
+                 "relative error of {1:.3g}, above the tolerance of {2:.3g}; its "
+                 "superposed libraries may be inaccurate".format(
+                 run_num, worst, rc.superposition_tolerance), RuntimeWarning)
+        for k, perturbation in enumerate(rc.superpositions):
+            suffix = "{0}_p{1}".format(run_num, k)
+            outputs = self.write_libs(rc, superpose(libs, perturbation, k), suffix,
+                                      run_num)
+            rc.superposition_outputs.append((run[0], perturbation, outputs))
+
+    def teardown(self, rc):
+        """Waits for any pending library writes and stops the I/O threads.
+
+        Parameters
+        ----------
+        rc : xsgen.utils.RunControl
+            The RunControl controlling this instance of xsgen.
+
+        Returns
+        -------
+        None
+        """
+        if rc.get('iopool') is not None:
+            rc.iopool.close()
 
     #
     # ensure functions
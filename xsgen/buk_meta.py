@@ -0,0 +1,96 @@
+"""Run control defaults and command-line interface of :mod:`xsgen.buk`.
+
+This module is light to import, so that the command-line interface of xsgen may
+be built without importing OpenMC, PyNE, or matplotlib; see
+:mod:`xsgen.plugins`.
+
+Burnup-criticality Plugin Metadata API
+======================================
+"""
+import numpy as np
+
+from xsgen.plugins import Plugin
+from xsgen.utils import RunControl, NotSpecified
+
+
+class XSGenPluginMeta(Plugin):
+    """The metadata of the burnup-criticality plugin."""
+
+    requires = ('xsgen.pre',)
+    """The burnup-criticality plugin requires :mod:`xsgen.pre`."""
+
+    defaultrc = RunControl(
+        solver=NotSpecified,
+        openmc_cross_sections=NotSpecified,
+        openmc_group_struct=np.logspace(1, -9, 1001),
+        xs_store=None,
+        tallies=None,
+        io_threads=4,
+        io_queue_size=8,
+        dry_run=False,
+        plan_trace=None,
+        )
+
+    rcdocs = {
+        'openmc_cross_sections': ('Path to the cross_sections.xml file '
+                                  'for OpenMC'),
+        'openmc_group_struct': 'Group structure for OpenMC data source.',
+        'origen': 'ORIGEN 2.2 command',
+        'threads': 'Number of threads to use',
+        'solver': ('The physics codes that are used to solve the '
+                   'burnup-criticality problem and compute cross sections and '
+                   'transmutation matrices.'),
+        'plot_group_flux': 'Output plots of group flux for each OpenMC run.',
+        'xs_store': ('Directory of the shared, memory-mapped store of the '
+                     'fine-group cross sections loaded by the solver. The first '
+                     'run exports the tables, later runs and workers attach to '
+                     'them read-only. If None, every run loads its own tables.'),
+        'tallies': ("Names of the OpenMC tallies to score, from 'flux', "
+                    "'eafflux', 'omcflux', and 's_gh'. The tallies that the "
+                    "solver and the output formats need are always added, so "
+                    "this only has to list extra ones."),
+        'io_threads': ('Number of background threads that write out libraries '
+                       'while the simulation goes on. Each output format is '
+                       'written in order by its own thread, and the files of '
+                       'a format are fanned out across this many threads. If '
+                       '0, libraries are written synchronously.'),
+        'io_queue_size': ('Number of pending writes per output format after '
+                          'which the simulation waits for the writes to '
+                          'catch up.'),
+        'dry_run': ('Print the number of runs, burnup steps, OpenMC and ORIGEN '
+                    'calls, and the expected statepoint and output sizes, then '
+                    'exit without running anything.'),
+        'plan_trace': ('Trace file (see trace_file) of a short pilot execution '
+                       'whose timings calibrate the wall time that a dry run '
+                       'estimates for the threads budget.'),
+        }
+
+    def update_argparser(self, parser):
+        """Adds plugin-specific command-line arguments.
+
+        Parameters
+        ----------
+        parser : argparse.ArgumentParser
+            The parser that belongs to xsgen. We update this.
+
+        Returns
+        -------
+        None
+        """
+        parser.add_argument('--threads', '-j', dest='threads', help=self.rcdocs['threads'],
+                            type=int)
+        parser.add_argument('--solver', dest='solver', help=self.rcdocs['solver'])
+        parser.add_argument('--origen', dest='origen_call', help=self.rcdocs['origen'])
+        parser.add_argument("--openmc-cross-sections", dest="openmc_cross_sections",
+                            help=self.rcdocs['openmc_cross_sections'])
+        parser.add_argument("--plot-group-flux", dest="plot_group_flux", action="store_true",
+                            help=self.rcdocs["plot_group_flux"])
+        parser.add_argument("--xs-store", dest="xs_store", help=self.rcdocs["xs_store"])
+        parser.add_argument("--tallies", dest="tallies", nargs="+",
+                            help=self.rcdocs["tallies"])
+        parser.add_argument("--io-threads", dest="io_threads", type=int,
+                            help=self.rcdocs["io_threads"])
+        parser.add_argument("--dry-run", dest="dry_run", action="store_true",
+                            help=self.rcdocs["dry_run"])
+        parser.add_argument("--plan-trace", dest="plan_trace",
+                            help=self.rcdocs["plan_trace"])
@@ -0,0 +1,148 @@
+"""A compact, array-backed material composition.
+
+The physics engines repeatedly prune and slice material compositions, e.g. to
+drop nuclides below ``track_nuc_threshold`` or to keep only the nuclides that
+OpenMC has data for.  Doing this through ``pyne.material.Material`` means a
+Python loop over a mapping for every operation.  A ``Composition`` instead
+holds sorted nuclide ids and their mass fractions in two NumPy arrays so that
+these operations are vectorized.  Conversion to and from ``Material`` should
+only happen at the boundaries, i.e. when reading ORIGEN output or writing
+inputs.
+
+Composition API
+===============
+"""
+import numpy as np
+
+
+class Composition(object):
+    """Sorted int64 nuclide ids with float64 mass fractions."""
+
+    __slots__ = ('nucs', 'fracs')
+
+    def __init__(self, nucs=(), fracs=(), sort=True):
+        """Parameters
+        ----------
+        nucs : sequence of ints
+            Nuclide ids.
+        fracs : sequence of floats
+            Mass fractions, in the same order as nucs.
+        sort : bool, optional
+            Whether the nuclides need to be sorted.  Only pass False if they
+            are already sorted and unique.
+
+        """
+        nucs = np.asarray(nucs, dtype='i8')
+        fracs = np.asarray(fracs, dtype='f8')
+        if nucs.shape != fracs.shape:
+            raise ValueError("nucs and fracs must have the same shape, got "
+                             "{0} and {1}".format(nucs.shape, fracs.shape))
+        if sort:
+            order = np.argsort(nucs, kind='mergesort')
+            nucs = nucs[order]
+            fracs = fracs[order]
+        self.nucs = nucs
+        self.fracs = fracs
+
+    @classmethod
+    def from_items(cls, items):
+        """Makes a composition from (nuc, frac) pairs."""
+        items = list(items)
+        if len(items) == 0:
+            return cls()
+        nucs, fracs = zip(*items)
+        return cls(nucs, fracs)
+
+    @classmethod
+    def from_dict(cls, comp):
+        """Makes a composition from a mapping of nuclide ids to mass fractions."""
+        return cls.from_items(comp.items())
+
+    @classmethod
+    def from_material(cls, mat):
+        """Makes a composition from a ``pyne.material.Material``."""
+        return cls.from_items(mat.comp.items())
+
+    def to_dict(self):
+        """The composition as a dict of nuclide ids to mass fractions."""
+        return dict(self.items())
+
+    def to_material(self, mass=-1.0, **kwargs):
+        """Converts the composition to a ``pyne.material.Material``.
+
+        Parameters
+        ----------
+        mass : float, optional
+            Mass of the material, see ``Material``.
+        kwargs : optional
+            Other arguments to ``Material``, e.g. ``attrs``.
+
+        Returns
+        -------
+        mat : pyne.material.Material
+        """
+        from pyne.material import Material
+        return Material(self.to_dict(), mass, **kwargs)
+
+    def items(self):
+        """List of (nuc, frac) pairs, with Python ints and floats."""
+        return list(zip(self.nucs.tolist(), self.fracs.tolist()))
+
+    def __len__(self):
+        return len(self.nucs)
+
+    def __contains__(self, nuc):
+        i = np.searchsorted(self.nucs, nuc)
+        return i < len(self.nucs) and self.nucs[i] == nuc
+
+    def __reduce__(self):
+        return (Composition, (self.nucs, self.fracs, False))
+
+    def __repr__(self):
+        return "Composition({0!r})".format(self.to_dict())
+
+    def get(self, nuc, default=0.0):
+        """The mass fraction of a nuclide, or default if it is not present."""
+        i = np.searchsorted(self.nucs, nuc)
+        if i < len(self.nucs) and self.nucs[i] == nuc:
+            return float(self.fracs[i])
+        return default
+
+    def _select(self, mask):
+        return Composition(self.nucs[mask], self.fracs[mask], sort=False)
+
+    def prune(self, threshold):
+        """A new composition without the nuclides whose mass fractions are below
+        the threshold."""
+        return self._select(self.fracs >= threshold)
+
+    def nonzero(self):
+        """A new composition without the nuclides whose mass fractions are zero."""
+        return self._select(self.fracs != 0.0)
+
+    def intersect(self, nucs):
+        """A new composition with only the nuclides that are also in nucs.
+
+        Parameters
+        ----------
+        nucs : sorted array of ints or collection of ints
+            The nuclides to keep.  Sorted int64 arrays are the fastest.
+        """
+        if not isinstance(nucs, np.ndarray):
+            nucs = np.array(sorted(nucs), dtype='i8')
+        if len(nucs) == 0:
+            return Composition()
+        i = np.searchsorted(nucs, self.nucs)
+        i[i == len(nucs)] = 0
+        return self._select(nucs[i] == self.nucs)
+
+    def normalize(self):
+        """A new composition whose mass fractions sum to one."""
+        total = self.fracs.sum()
+        if total == 0.0:
+            return Composition(self.nucs, self.fracs, sort=False)
+        return Composition(self.nucs, self.fracs / total, sort=False)
+
+    def mass_fraction(self):
+        """The sum of the mass fractions."""
+        return float(self.fracs.sum())
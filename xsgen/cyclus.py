@@ -0,0 +1,201 @@
+"""Writer for Cyclus simulation inputs that use the libraries as Bright-lite
+ReactorFacility prototypes.
+
+Every run gets a ReactorFacility prototype whose ``libraries`` point to the
+Bright-lite libraries of the run.  If the ``brightlite`` format is also being
+written, those libraries are referenced, otherwise they are written into the
+run's ``cyclus`` output directory.  By default (``cyclus_batch``), the
+prototypes of all of the runs are batched into one simulation input next to
+the output directories, ``<outdir>.json``, so that a whole perturbation sweep
+can be deployed in a single Cyclus simulation.  The batched input is written
+once, by ``close()``, after every run has been added.
+
+The rest of the simulation comes from the ``cyclus_template`` input file, or
+from a minimal skeleton with null regions and institutions.  The
+ReactorFacility configuration starts from the LWR of ``cyclus-example.json``
+and may be overridden with ``cyclus_reactor``.
+
+Cyclus API
+==========
+"""
+from __future__ import print_function
+import os
+import json
+from collections import OrderedDict
+
+from xsgen.brightlite import BrightliteWriter
+
+ARCHETYPE = {"lib": "Brightlite", "name": "ReactorFacility"}
+
+REACTOR_DEFAULTS = {
+    "CR_fissile": {"val": ["922350", "942380", "942390", "942400", "942410",
+                           "942420"]},
+    "DA_mode": 0,
+    "batches": 3,
+    "burnupcalc_timestep": 200,
+    "core_mass": 1000,
+    "cylindrical_delta": 5,
+    "disadv_a": 0.4095,
+    "disadv_b": 0.70749,
+    "disadv_fuel_sigs": 0.43,
+    "disadv_mod_siga": 0.222,
+    "disadv_mod_sigs": 3.44,
+    "efficiency": 0.33,
+    "flux_mode": 1,
+    "fuel_Sig_tr": 3.94,
+    "fuel_area": "89197",
+    "generated_power": 1000.0,
+    "in_commods": {"val": "LWR Fuel"},
+    "max_inv_size": 1e+299,
+    "mod_Sig_a": 0.0222,
+    "mod_Sig_f": 0.0,
+    "mod_Sig_tr": 3.46,
+    "mod_thickness": 100,
+    "nonleakage": 0.96,
+    "out_commod": "LWR Spent Fuel",
+    "reactor_life": 960,
+    "target_burnup": 45,
+    "tolerence": 0.001,
+    }
+"""ReactorFacility configuration of the LWR in cyclus-example.json."""
+
+
+def skeleton():
+    """A minimal Cyclus simulation, without any facilities."""
+    return {"simulation": {
+        "archetypes": {"spec": [dict(ARCHETYPE),
+                                {"lib": "agents", "name": "NullRegion"},
+                                {"lib": "agents", "name": "NullInst"}]},
+        "control": {"duration": 240, "startmonth": 1, "startyear": 2005},
+        "facility": [],
+        "region": {"config": {"NullRegion": None},
+                   "institution": {"config": {"NullInst": None},
+                                   "initialfacilitylist": {"entry": []},
+                                   "name": "xsgen"},
+                   "name": "xsgen"},
+        }}
+
+
+class CyclusWriter(object):
+    """Writes Cyclus inputs with a Bright-lite ReactorFacility per run."""
+
+    tallies = ()
+    """Names of the OpenMC tallies whose results this format writes out."""
+
+    def __init__(self, rc):
+        self.rc = rc
+        formats = list(rc.formats)
+        self.outdir = rc.outdirs[formats.index('cyclus')]
+        if 'brightlite' in formats:
+            self.libdir = rc.outdirs[formats.index('brightlite')]
+            self.brightlite = None
+        else:
+            self.libdir = None
+            self.brightlite = BrightliteWriter(rc)
+        self.facilities = OrderedDict()
+        self.path = None
+        # the simulation is written in the background, while the engine
+        # changes the working directory
+        self.template = rc.cyclus_template
+        if self.template is not None:
+            self.template = os.path.abspath(self.template)
+
+    def write(self, libs, dirname):
+        """Adds the ReactorFacility of a run.  Without ``cyclus_batch``, the
+        simulation of the run is written out right away.
+
+        Parameters
+        ----------
+        libs : dict
+            The reactor libraries gleaned from buk.
+        dirname : str
+            The output directory of the run.
+        """
+        if self.brightlite is None:
+            run = os.path.basename(dirname)[len(self.outdir):]
+            library = self.libdir + run
+        else:
+            self.brightlite.write(libs, dirname)
+            library = os.path.basename(dirname)
+        facility = self.facility(libs, library)
+        if self.rc.cyclus_batch:
+            self.facilities[facility["name"]] = facility
+            self.path = os.path.join(os.path.dirname(dirname), self.outdir + ".json")
+        else:
+            self.dump([facility], dirname + ".json")
+
+    def close(self):
+        """Writes out the batched simulation with the facilities of every run
+        that has been written."""
+        if self.path is not None and len(self.facilities) > 0:
+            self.dump(list(self.facilities.values()), self.path)
+
+    def facility(self, libs, library):
+        """The ReactorFacility prototype of a run.
+
+        Parameters
+        ----------
+        libs : dict
+            The reactor libraries gleaned from buk.
+        library : str
+            Name of the Bright-lite library directory of the run.
+
+        Returns
+        -------
+        facility : dict
+        """
+        rc = self.rc
+        config = dict(REACTOR_DEFAULTS)
+        if rc.get("batches") is not None:
+            config["batches"] = rc.batches
+        config["interpol_pairs"] = {"key": "BURNUP",
+                                    "val": float(sum(libs["fuel"]["BUd"]))}
+        config.update(rc.cyclus_reactor)
+        config["libraries"] = {"val": library}
+        return {"config": {"ReactorFacility": config},
+                "lifetime": config["reactor_life"],
+                "name": "{0}_{1}".format(rc.reactor, library)}
+
+    def simulation(self, facilities):
+        """The simulation input, with the facilities added to the template.
+
+        Parameters
+        ----------
+        facilities : list of dicts
+            ReactorFacility prototypes, see ``facility()``.
+
+        Returns
+        -------
+        sim : dict
+        """
+        if self.template is None:
+            sim = skeleton()
+        else:
+            with open(self.template, "r") as f:
+                sim = json.load(f)
+        s = sim["simulation"]
+        spec = s.setdefault("archetypes", {}).setdefault("spec", [])
+        if ARCHETYPE not in spec:
+            spec.append(dict(ARCHETYPE))
+        names = set(fac["name"] for fac in facilities)
+        s["facility"] = [fac for fac in s.get("facility", [])
+                         if fac["name"] not in names] + facilities
+        insts = s["region"]["institution"]
+        inst = insts[0] if isinstance(insts, list) else insts
+        entries = inst.setdefault("initialfacilitylist", {}).setdefault("entry", [])
+        if isinstance(entries, dict):
+            entries = inst["initialfacilitylist"]["entry"] = [entries]
+        deployed = set(e["prototype"] for e in entries)
+        entries.extend({"number": 1, "prototype": fac["name"]}
+                       for fac in facilities if fac["name"] not in deployed)
+        return sim
+
+    def dump(self, facilities, path):
+        """Streams the simulation input to a file, which is written under a
+        temporary name first."""
+        tmp = path + ".tmp"
+        encoder = json.JSONEncoder(indent=1, sort_keys=True)
+        with open(tmp, "w") as f:
+            for chunk in encoder.iterencode(self.simulation(facilities)):
+                f.write(chunk)
+        os.rename(tmp, path)
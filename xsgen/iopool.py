@@ -0,0 +1,199 @@
+"""A background I/O pool for writing out libraries while the simulation goes on.
+
+Writes are submitted to a lane, one per output format.  Each lane is served by
+its own thread, in submission order, so that the timesteps appended to a
+format's libraries never overtake each other, while the formats are written
+concurrently.  Lane queues are bounded: once a format falls that many writes
+behind, ``submit()`` blocks until it catches up, which caps the memory held by
+pending library snapshots.  Independent files within a single write, like the
+per-nuclide Brightlite files, may be fanned out with ``map()``.
+
+Errors raised by a write are re-raised in the submitting thread on the next
+``submit()`` or ``flush()``.
+
+I/O pool API
+============
+"""
+from __future__ import print_function
+import sys
+import time
+import threading
+from multiprocessing.pool import ThreadPool
+
+if sys.version_info[0] > 2:
+    import queue
+else:
+    import Queue as queue
+
+_STOP = object()
+
+
+class IOPool(object):
+    """Runs writes in background threads, one ordered lane per key."""
+
+    def __init__(self, threads=4, maxsize=8, tracer=None):
+        """Parameters
+        ----------
+        threads : int, optional
+            Number of threads that ``map()`` fans files out to.  If 0, writes
+            are run in the submitting thread as they are submitted.
+        maxsize : int, optional
+            Maximum number of pending writes per lane.
+        tracer : xsgen.tracing.Tracer or None, optional
+            Tracer that write spans are recorded to.
+
+        """
+        self.threads = threads
+        self.maxsize = maxsize
+        self.tracer = tracer
+        self.latencies = {}
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._errors = []
+        self._pool = None
+
+    @property
+    def synchronous(self):
+        return self.threads < 1
+
+    def submit(self, key, func, *args, **tags):
+        """Queues func(*args) on the lane for key.
+
+        Parameters
+        ----------
+        key : str
+            The lane, usually the output format.
+        func : callable
+        args : optional
+            Positional arguments to func.  These should not be mutated after
+            submission; pass copies of anything the caller keeps changing.
+        tags : optional
+            Tags of the write span, in addition to 'format'.
+        """
+        self._raise()
+        task = (func, args, tags, time.time())
+        if self.synchronous:
+            self._run(key, task)
+            self._raise()
+            return
+        self._lane(key).put(task)
+
+    def map(self, func, iterable):
+        """Calls func on every item, fanned out across the pool's threads.
+
+        Returns
+        -------
+        results : list
+            The return values, in the order of the items.
+        """
+        if self.synchronous:
+            return list(map(func, iterable))
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.threads)
+        return self._pool.map(func, iterable)
+
+    def flush(self):
+        """Blocks until every submitted write has finished, then re-raises the
+        first error that any of them raised."""
+        for q, _ in list(self._lanes.values()):
+            q.join()
+        self._raise()
+
+    def close(self):
+        """Flushes all of the lanes and stops the threads."""
+        try:
+            self.flush()
+        finally:
+            for q, thread in self._lanes.values():
+                q.put(_STOP)
+                thread.join()
+            self._lanes.clear()
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+    def summary(self):
+        """Returns a table of the write latency of each lane."""
+        if len(self.latencies) == 0:
+            return "No writes were made."
+        width = max(len(key) for key in self.latencies)
+        template = "{0:<{w}}  {1:>8}  {2:>12}  {3:>12}  {4:>12}"
+        lines = [template.format("format", "writes", "total [s]", "mean [s]",
+                                 "max wait [s]", w=width)]
+        for key, (count, total, wait) in sorted(self.latencies.items()):
+            lines.append(template.format(key, count, "{0:.4f}".format(total),
+                                         "{0:.4f}".format(total / count),
+                                         "{0:.4f}".format(wait), w=width))
+        return "\n".join(lines)
+
+    def _lane(self, key):
+        with self._lock:
+            if key not in self._lanes:
+                q = queue.Queue(self.maxsize)
+                thread = threading.Thread(target=self._serve, args=(key, q),
+                                          name='xsgen-io-' + str(key))
+                thread.daemon = True
+                thread.start()
+                self._lanes[key] = (q, thread)
+            return self._lanes[key][0]
+
+    def _serve(self, key, q):
+        while True:
+            task = q.get()
+            try:
+                if task is _STOP:
+                    return
+                self._run(key, task)
+            finally:
+                q.task_done()
+
+    def _run(self, key, task):
+        func, args, tags, submitted = task
+        start = time.time()
+        try:
+            func(*args)
+        except Exception as e:
+            with self._lock:
+                self._errors.append(e)
+        duration = time.time() - start
+        with self._lock:
+            count, total, wait = self.latencies.get(key, (0, 0.0, 0.0))
+            self.latencies[key] = (count + 1, total + duration,
+                                   max(wait, start - submitted))
+        if self.tracer is not None:
+            self.tracer.add('write', start, duration, format=key, **tags)
+
+    def _raise(self):
+        with self._lock:
+            if len(self._errors) == 0:
+                return
+            e = self._errors[0]
+            del self._errors[:]
+        raise e
+
+
+def snapshot(libs):
+    """Copies the lists of a set of libraries so that a background write sees
+    them as they are now, while the simulation keeps appending timesteps.  The
+    values in the lists themselves are not copied.
+
+    Parameters
+    ----------
+    libs : dict
+        The reactor libraries gleaned from buk.
+
+    Returns
+    -------
+    libs : dict
+    """
+    return _copy(libs)
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return dict((k, _copy(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [_copy(v) if isinstance(v, (dict, list)) else v for v in value]
+    return value
@@ -1,8 +1,7 @@
+from __future__ import print_function
 import os
 import argparse
 import warnings
-from pyne.utils import QAWarning
-warnings.simplefilter("ignore", QAWarning)
 
 try:
     import argcomplete
@@ -13,6 +12,13 @@ from xsgen.plugins import Plugins
 from xsgen.utils import NotSpecified, RunControl, exec_file, \
     DEFAULT_RC_FILE, DEFAULT_PLUGINS
 
+def ignore_qa_warnings():
+    """Silences PyNE's QA warnings, which are raised when the plugins that use
+    PyNE are imported."""
+    from pyne.utils import QAWarning
+    warnings.simplefilter("ignore", QAWarning)
+
+
 def main():
     base = Plugins(["xsgen.base"])
     preparser = base.build_cli()
@@ -37,9 +43,15 @@ def main():
     rc = plugins.merge_rcs()
     rc._update(rcdict)
     rc._update([(k, v) for k, v in ns.__dict__.items()])
+    ignore_qa_warnings()
     plugins.setup()
     plugins.execute()
     plugins.teardown()
+    rc.tracer.dump()
+    if rc.profile:
+        print(plugins.import_summary())
+        print(plugins.phase_summary())
+        print(rc.tracer.summary())
 
 
 if __name__ == "__main__":
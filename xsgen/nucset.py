@@ -0,0 +1,229 @@
+"""Building the set of tracked nuclides.
+
+The tracked nuclides may be given as a list or as a file with one, which is
+read with ``read_nuc_file()``.  Their names are resolved to nuclide ids once
+per distinct name, and nuclides whose half-lives are too short to matter over
+a burnup step are cut in one vectorized comparison.
+
+Half-lives and other decay data come from a table that is precomputed from
+the decay libraries of the Bright-lite TAPE9 (``xsgen.tape9``) and shipped
+with xsgen as ``xsgen/data/decay.npz``.  Only the nuclides that are missing
+from the table fall back to a slower per-nuclide lookup, such as
+``pyne.data.half_life``.  To regenerate the table, call
+``build_decay_table()``.
+
+Nuclide Set API
+===============
+"""
+from __future__ import print_function
+import os
+import sys
+import ast
+import json
+
+import numpy as np
+
+if sys.version_info[0] > 2:
+    basestring = str
+
+DECAY_TABLE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'decay.npz')
+"""Path of the decay table that is shipped with xsgen."""
+
+HALF_LIFE_UNITS = {1: 1.0, 2: 60.0, 3: 3600.0, 4: 86400.0, 5: 3.15576e7,
+                   6: np.inf, 7: 3.15576e10, 8: 3.15576e13, 9: 3.15576e16}
+"""Seconds per ORIGEN half-life unit code.  Code 6 means stable."""
+
+_decay_table = None
+_ids = {}
+
+
+def parse_tape9_decay(text):
+    """Parses the decay libraries of an ORIGEN 2.2 TAPE9.
+
+    Parameters
+    ----------
+    text : str
+        Contents of the TAPE9.
+
+    Returns
+    -------
+    table : dict of arrays
+        With the sorted nuclide ids 'nucs', their 'half_life' [s] (inf if
+        stable), 'decay_const' [1/s], recoverable decay energy 'q' [MeV], and
+        natural abundance 'abund' [atom %].
+    """
+    data = {}
+    in_decay = False
+    nuc = None
+    for line in text.splitlines():
+        tokens = line.split()
+        if len(tokens) == 0:
+            continue
+        if tokens[0] == '-1':
+            in_decay = False
+        elif 'DECAY LIBRARY' in line:
+            in_decay = True
+        elif not in_decay:
+            continue
+        elif len(tokens) == 9:
+            # NLB NUCLID IU THALF FB1 FP FP1 FA FT
+            zzaaai = int(tokens[1])
+            nuc = (zzaaai // 10) * 10000 + zzaaai % 10
+            unit = HALF_LIFE_UNITS[int(tokens[2])]
+            half_life = unit if np.isinf(unit) else float(tokens[3]) * unit
+            data.setdefault(nuc, [half_life, 0.0, 0.0])
+        elif len(tokens) == 7 and nuc is not None:
+            # NLB FSF FN QREC ABUND ARCG WRCG
+            data[nuc][1:] = [float(tokens[3]), float(tokens[4])]
+            nuc = None
+    nucs = np.array(sorted(data), dtype='i8')
+    values = np.array([data[n] for n in nucs.tolist()], dtype='f8').reshape(-1, 3)
+    half_life = values[:, 0]
+    with np.errstate(divide='ignore'):
+        decay_const = np.where(half_life > 0.0, np.log(2.0) / half_life, np.inf)
+    return {'nucs': nucs, 'half_life': half_life, 'decay_const': decay_const,
+            'q': values[:, 1], 'abund': values[:, 2]}
+
+
+def build_decay_table(path=DECAY_TABLE_PATH):
+    """Writes the decay table from the Bright-lite TAPE9 to an NPZ file."""
+    from xsgen.tape9 import brightlitetape9
+    table = parse_tape9_decay(brightlitetape9)
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    np.savez_compressed(path, **table)
+    return table
+
+
+def decay_table():
+    """The decay table, loaded once.  If the shipped NPZ file is missing, the
+    table is parsed from the TAPE9 instead.
+
+    Returns
+    -------
+    table : dict of arrays
+        See ``parse_tape9_decay()``.
+    """
+    global _decay_table
+    if _decay_table is None:
+        if os.path.isfile(DECAY_TABLE_PATH):
+            with np.load(DECAY_TABLE_PATH) as f:
+                _decay_table = dict((key, f[key]) for key in f.files)
+        else:
+            from xsgen.tape9 import brightlitetape9
+            _decay_table = parse_tape9_decay(brightlitetape9)
+    return _decay_table
+
+
+def lookup(nucs, key='half_life', default=np.nan):
+    """Looks up decay data of many nuclides at once.
+
+    Parameters
+    ----------
+    nucs : array of ints
+        Nuclide ids.
+    key : str, optional
+        Column of the decay table.
+    default : float, optional
+        Value for the nuclides that are not in the table.
+
+    Returns
+    -------
+    values : array of floats
+    """
+    table = decay_table()
+    nucs = np.asarray(nucs, dtype='i8')
+    known = table['nucs']
+    idx = np.minimum(np.searchsorted(known, nucs), max(len(known) - 1, 0))
+    found = (known[idx] == nucs) if len(known) > 0 else np.zeros(nucs.shape, bool)
+    return np.where(found, table[key][idx], default)
+
+
+def read_nuc_file(path):
+    """Reads a list of nuclides from a file.  The file may hold a JSON list, a
+    Python list, or plain nuclide names or ids separated by whitespace or
+    commas, with ``#`` comments.
+
+    Parameters
+    ----------
+    path : str
+        The path to the nuc file.
+
+    Returns
+    -------
+    nucs : list of str or int
+        The nuclides, as they are given in the file.
+    """
+    with open(path, 'r') as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return ast.literal_eval(text)
+    nucs = []
+    for line in text.splitlines():
+        for token in line.split('#', 1)[0].replace(',', ' ').split():
+            nucs.append(int(token) if token.isdigit() else token)
+    return nucs
+
+
+def resolve(nucs, idfunc=None):
+    """Resolves nuclide names to ids, calling idfunc once per distinct name
+    over the whole session.
+
+    Parameters
+    ----------
+    nucs : sequence of str or int
+        Nuclide names or ids.
+    idfunc : callable, optional
+        Converts one name to an id, ``pyne.nucname.id`` by default.
+
+    Returns
+    -------
+    ids : array of ints
+        The sorted, unique nuclide ids.
+    """
+    if idfunc is None:
+        from pyne.nucname import id as idfunc
+    cache = _ids.setdefault(idfunc, {})
+    ids = set()
+    for nuc in nucs:
+        nucid = cache.get(nuc)
+        if nucid is None:
+            nucid = cache[nuc] = idfunc(nuc)
+        ids.add(nucid)
+    return np.array(sorted(ids), dtype='i8')
+
+
+def build_nucset(nucs, min_half_life=0.0, idfunc=None, half_life=None):
+    """Builds the set of tracked nuclides.
+
+    Parameters
+    ----------
+    nucs : str or sequence of str or int
+        Nuclide names or ids, or the path to a file of them.
+    min_half_life : float, optional
+        Nuclides with half-lives [s] at or below this are cut.
+    idfunc : callable, optional
+        Converts one name to an id, see ``resolve()``.
+    half_life : callable, optional
+        Half-life [s] of one nuclide id, for the nuclides that are not in the
+        decay table.  If None, those are kept.
+
+    Returns
+    -------
+    nucs : list of ints
+        The sorted nuclide ids.
+    """
+    if isinstance(nucs, basestring):
+        nucs = read_nuc_file(nucs)
+    ids = resolve(nucs, idfunc)
+    half_lives = lookup(ids)
+    missing = np.isnan(half_lives)
+    if half_life is None:
+        half_lives[missing] = np.inf
+    else:
+        half_lives[missing] = [half_life(nuc) for nuc in ids[missing].tolist()]
+    return ids[half_lives > min_half_life].tolist()
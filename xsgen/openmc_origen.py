@@ -2,6 +2,7 @@ from __future__ import print_function
 import os
 import shutil
 import json
+import time
 import subprocess
 from pprint import pformat
 from multiprocessing import Pool
@@ -21,8 +22,12 @@ from pyne.bins import stair_step
 from matplotlib import pyplot as plt
 
 from xsgen.utils import indir, NotSpecified
+from xsgen.composition import Composition
 from xsgen.tape9 import brightlitetape9
-from xsgen.brightlite import BrightliteWriter
+from xsgen.xsstore import load_data_sources, store_key
+from xsgen.brightlite import BrightliteWriter, attach_tape9
+from xsgen.iopool import snapshot
+from xsgen.rcsnapshot import RCSnapshot
 
 # templates are from openmc/examples/lattice/simple
 
@@ -93,28 +98,35 @@ GEOMETRY_TEMPLATE = """<?xml version="1.0"?>
 
 TALLIES_TEMPLATE = """<?xml version="1.0"?>
 <tallies>
-  <tally id="1">
+{_tallies}</tallies>
+"""
+
+TALLY_TEMPLATES = {
+    'flux': """  <tally id="{id}">
     <label>flux</label>
     <filter type="energy" bins="{_egrid}" />
     <filter type="material" bins="1" />
     <scores>flux</scores>
     <nuclides>total</nuclides>
   </tally>
-  <tally id="2">
+""",
+    'eafflux': """  <tally id="{id}">
     <label>eafflux</label>
     <filter type="energy" bins="{_eafds_egrid}" />
     <filter type="material" bins="1" />
     <scores>flux</scores>
     <nuclides>total</nuclides>
   </tally>
-  <tally id="3">
+""",
+    'omcflux': """  <tally id="{id}">
     <label>omcflux</label>
     <filter type="energy" bins="{_omcds_egrid}" />
     <filter type="material" bins="1" />
     <scores>flux</scores>
     <nuclides>total</nuclides>
   </tally>
-  <tally id="4">
+""",
+    's_gh': """  <tally id="{id}">
     <label>s_gh</label>
     <filter type="energy" bins="{_egrid}" />
     <filter type="energyout" bins="{_egrid}" />
@@ -122,8 +134,14 @@ TALLIES_TEMPLATE = """<?xml version="1.0"?>
     <scores>scatter</scores>
     <nuclides>total</nuclides>
   </tally>
-</tallies>
-"""
+""",
+    }
+"The tallies that may be scored, by name."
+
+TALLY_IDS = {'flux': 1, 'eafflux': 2, 'omcflux': 3, 's_gh': 4}
+"Fixed ids of the tallies, so that statepoints are read the same way regardless of the tally set."
+
+FLUX_TALLIES = ('flux', 'eafflux', 'omcflux')
 
 PLOTS_TEMPLATE = """<?xml version="1.0"?>
 <plots>
@@ -146,6 +164,10 @@ class OpenMCOrigen(object):
 
     def __init__(self, rc):
         self.rc = rc
+        self._params = None
+        self.tracer = rc.tracer
+        self.tallies = self.required_tallies()
+        self._valid_nucs = None
         self.statelibs = {}
         self.builddir = 'build-' + rc.reactor
         if not os.path.isdir(self.builddir):
@@ -159,10 +181,16 @@ class OpenMCOrigen(object):
             data_sources.append(self.eafds)
         data_sources += [data_source.SimpleDataSource(),
                          data_source.NullDataSource()]
-        for ds in data_sources[:]:
-            ds.load(rc.temperature)
         self.xscache = XSCache(data_sources=data_sources, scalars={922380000: 1.05})
-        self.xscache.load()
+        key = None if rc.xs_store is None else store_key(rc)
+        start = time.time()
+        stats = load_data_sources(data_sources, rc.temperature, self.xscache,
+                                  store_dir=rc.xs_store, key=key)
+        self.tracer.add('xs_load', start, stats['time'], source=stats['source'],
+                        rss=stats['rss'])
+        if rc.verbose:
+            print("loaded cross sections ({source}) in {time:.3f} s, "
+                  "peak RSS {rss} MB".format(**stats))
         self.tape9 = None
 
         if self.rc.origen_call is NotSpecified:
@@ -173,6 +201,20 @@ class OpenMCOrigen(object):
         else:
             self.origen_call = self.rc.origen_call
 
+    @property
+    def params(self):
+        """A frozen snapshot of the run control parameters that the engine
+        reads in its hot paths, see ``xsgen.rcsnapshot``.  It is taken the first
+        time it is needed, which is after all of the plugins have been set up.
+        """
+        if self._params is None:
+            self._params = RCSnapshot(self.rc)
+        return self._params
+
+    def required_tallies(self):
+        """The tallies to score, see the ``required_tallies()`` function."""
+        return required_tallies(self.rc)
+
     def pwd(self, state, directory):
         """Path to directory we will be running specific physics codes in.
 
@@ -202,11 +244,13 @@ class OpenMCOrigen(object):
         Returns
         -------
         ctx : dict
-            A dictionary with all relevant perturbation parameters.
+            A dictionary with the engine parameters of the run control, see
+            ``xsgen.rcsnapshot.ENGINE_PARAMS``, and the perturbation parameters
+            of the state.
         """
-        rc = self.rc
-        ctx = dict(rc._dict)
-        ctx.update(zip(rc.perturbation_params, state))
+        params = self.params
+        ctx = params.as_dict()
+        ctx.update(zip(params.perturbation_params, state))
         return ctx
 
     def generate_run(self, run, fname):
@@ -225,7 +269,7 @@ class OpenMCOrigen(object):
         libs : list of dicts
             Libraries to write out - one for the full fuel and one for each tracked nuclide.
         """
-        self.libs = {'xs': [], 'phi_g': {
+        self.libs = {'state': run[0], 'xs': [], 'particles': [], 'k': [], 'phi_g': {
             'E_g': {'EAF': self.eafds.src_group_struct,
                     'OpenMC': self.omcds.src_group_struct},
             'phi_g': []},
@@ -236,11 +280,11 @@ class OpenMCOrigen(object):
             "BUd":  [0],
             "material": [self.rc.fuel_material],
             "tracked_nucs": {nucname.name(n): [self.rc.fuel_material.comp.get(n, 0) * 1000]
-                             for n in self.rc.track_nucs},
+                             for n in self.params.track_nucs},
             "phi_tot": [0]
             }}
 
-        for nuc in self.rc.track_nucs:
+        for nuc in self.params.track_nucs:
             self.libs[nuc] = {
                 "TIME": [0],
                 "NEUT_PROD": [0],
@@ -248,18 +292,98 @@ class OpenMCOrigen(object):
                 "BUd": [0],
                 "material": [Material({nuc: 1}, 1000)],
                 "tracked_nucs": {nucname.name(n): [0]
-                	                 for n in self.rc.track_nucs},
+                	                 for n in self.params.track_nucs},
                 "phi_tot": [0]
                 }
             self.libs[nuc]["tracked_nucs"][nucname.name(nuc)] = [1000]
 
         print([state.burn_times for state in run])
+        if self.params.adaptive_burn:
+            return self._generate_adaptive_run(run, fname)
         for i, state in enumerate(run):
             if i > 0:
-                transmute_time = state.burn_times - run[i-1].burn_times
-                results = self.generate(state, transmute_time)
+                with self.tracer.span('step', step=i, state=state):
+                    transmute_time = state.burn_times - run[i-1].burn_times
+                    results = self.generate(state, transmute_time)
+                    self.libs = self._update_libs_with_results(self.libs, results)
+                    self._submit_step(self.libs, fname, i)
+        return self.libs
+
+    def _submit_step(self, libs, fname, step):
+        """Hands the libraries so far to the first output format, so that the
+        output of a run grows as it goes."""
+        writer = self.rc.writers[0]
+        if self.params.incremental_writes and hasattr(writer, 'append'):
+            write = writer.append
+        else:
+            write = writer.write
+        self.rc.iopool.submit(self.params.formats[0], write,
+                              attach_tape9(snapshot(libs)), os.path.abspath(fname),
+                              step=step)
+
+    def _generate_adaptive_run(self, run, fname):
+        """Depletes a run in steps that are sized by how fast the fuel changes,
+        rather than at its burn times.  After every step, the next one is
+        scaled by the ratio of rc.burn_step_tol to the largest relative change
+        of k and of the rc.adaptive_nucs in the fuel, within rc.min_burn_step
+        and rc.max_burn_step.  The change of a nuclide is relative to the
+        larger of its mass and rc.adaptive_nuc_floor of the initial fuel mass.
+        The libraries are then interpolated onto the burn times of the run,
+        see ``interpolate_libs()``.
+
+        Parameters
+        ----------
+        run : list of States
+            A list of States that has the same initial conditions at increasing
+            burnup times.
+        fname : str
+            The output directory of the run.
+
+        Returns
+        -------
+        libs : dict
+            The libraries at the burn times of the run.  The libraries at the
+            steps that were actually taken are kept in self.step_libs.
+        """
+        rc = self.params
+        times = [state.burn_times for state in run]
+        max_step = rc.max_burn_step
+        if max_step is None:
+            max_step = max(np.diff(times)) if len(times) > 1 else rc.min_burn_step
+        names = [nucname.name(nuc) for nuc in rc.adaptive_nucs
+                 if nuc in rc.track_nucs]
+        tracked = self.libs['fuel']['tracked_nucs']
+        # the tracked masses are per kg of initial fuel [g]
+        floor = 1000.0 * rc.adaptive_nuc_floor
+        t = times[0]
+        dt = rc.min_burn_step
+        step = 0
+        done = 1
+        while done < len(times):
+            if times[-1] - (t + dt) < rc.min_burn_step:
+                dt = times[-1] - t
+            state = run[0]._replace(burn_times=t + dt)
+            step += 1
+            with self.tracer.span('step', step=step, state=state):
+                results = self.generate(state, dt)
                 self.libs = self._update_libs_with_results(self.libs, results)
-                self.rc.writers[0].write(self.libs, fname)
+            t = state.burn_times
+            change = [_rel_change(tracked[name][-2], tracked[name][-1], floor)
+                      for name in names]
+            if len(self.libs['k']) > 1:
+                change.append(_rel_change(self.libs['k'][-2], self.libs['k'][-1]))
+            dt = next_burn_step(dt, max(change) if len(change) > 0 else 0.0,
+                                rc.burn_step_tol, rc.min_burn_step, max_step)
+            if rc.verbose:
+                print("burn step {0} to {1} days, next step {2:.4g} "
+                      "days".format(step, t, dt))
+            covered = sum(1 for bt in times if bt <= t * (1 + 1e-12))
+            if covered > done:
+                done = covered
+                self._submit_step(interpolate_libs(self.libs, times[:done]),
+                                  fname, done - 1)
+        self.step_libs = self.libs
+        self.libs = interpolate_libs(self.step_libs, times)
         return self.libs
 
     def _update_libs_with_results(self, matlibs, newlibs):
@@ -278,14 +402,14 @@ class OpenMCOrigen(object):
             The updated library.
         """
         for mat, newlib in newlibs.items():
-            if mat == 'xs':
+            if mat in ('xs', 'particles', 'k'):
                 matlibs[mat].append(newlib)
                 continue
             elif mat == 'phi_g':
                 matlibs[mat][mat].append(newlib)
                 continue
             oldlib = matlibs[mat]
-            for nuc in self.rc.track_nucs:
+            for nuc in self.params.track_nucs:
                 name = nucname.name(nuc)
                 nuc_frac = newlib["material"].comp.get(nuc, 0)
                 mass = newlib["material"].mass
@@ -318,9 +442,10 @@ class OpenMCOrigen(object):
         if state in self.statelibs:
             return self.statelibs[state]
         rc = self.rc
-        k, phi_g, xstab = self.openmc(state)
+        k, phi_g, xstab, particles = self.openmc(state)
         results = {"fuel": {}}
-        results.update(dict(zip(rc.track_nucs, [{} for _ in rc.track_nucs])))
+        track_nucs = self.params.track_nucs
+        results.update(dict(zip(track_nucs, [{} for _ in track_nucs])))
         if 'flux' in rc:
             phi_tot = state.flux
         elif 'fuel_specific_power' in rc:
@@ -350,11 +475,17 @@ class OpenMCOrigen(object):
             phi_tot = sum(3.125e16*fuel_specific_power_mwcc/sum_N_i_sig_fi)
         results = self.run_all_the_origens(state, transmute_time, phi_tot, results)
         results['xs'] = xstab
+        results['particles'] = particles
+        results['k'] = k
         results['phi_g'] = {'EAF': self.eafds.src_phi_g,
                             'OpenMC': self.omcds.src_phi_g}
         self.statelibs[state] = results
         statedir = os.path.join(self.builddir, str(hash(state)))
         for dir in os.listdir(self.builddir):
+            # only the directories of other states, not the libraries that
+            # may still be being written out in the background
+            if not dir.lstrip('-').isdigit():
+                continue
             if(os.path.join(self.builddir, dir) != statedir):
                 shutil.rmtree(os.path.join(self.builddir, dir))
         return results
@@ -379,28 +510,31 @@ class OpenMCOrigen(object):
         dict
            A dict of all the ORIGEN results.
         """
-        if self.rc.verbose:
+        params = self.params
+        if params.verbose:
             print("making tape9 for {0} with phi={1}".format(state, phi_tot))
         mat = self.libs['fuel']['material'][-1]
-        mat.density = self.rc.fuel_density
+        mat.density = params.fuel_density
         mat.atoms_per_molecule = 3.0
         atom_dens = mat.to_atom_dens()
         for ds in self.xscache.data_sources:
             ds.atom_dens = atom_dens
-        self.tape9 = origen22.make_tape9(self.rc.track_nucs, self.xscache, nlb=(219, 220, 221))
-        self.tape9 = origen22.merge_tape9((self.tape9,
-                                          origen22.loads_tape9(brightlitetape9)))
-        origen22.write_tape9(self.tape9)
+        with self.tracer.span('tape9'):
+            self.tape9 = origen22.make_tape9(params.track_nucs, self.xscache,
+                                             nlb=(219, 220, 221))
+            self.tape9 = origen22.merge_tape9((self.tape9,
+                                              origen22.loads_tape9(brightlitetape9)))
+            origen22.write_tape9(self.tape9)
         for mat_id in results.keys():
             pwd = self.pwd(state, "origen{}".format(mat_id))
             mat = self.libs[mat_id]["material"][-1]
             if not os.path.isdir(pwd):
                 os.makedirs(pwd)
-            with indir(pwd):
+            with indir(pwd), self.tracer.span('origen_input', mat=mat_id):
                 if not os.path.isfile("TAPE6.OUT"):
                     self._make_origen_input(transmute_time, phi_tot, mat)
         origen_results = []
-        if self.rc.threads == 1:
+        if params.threads == 1:
             for mat_id in results.keys():
                 pwd = self.pwd(state, "origen{}".format(mat_id))
                 origen_params = (state.burn_times,
@@ -420,15 +554,16 @@ class OpenMCOrigen(object):
                                  self.pwd(state, "origen{}".format(mat_id)),
                                  self.origen_call)
                                 for mat_id in results]
-            pool = Pool(self.rc.threads)
+            pool = Pool(params.threads)
             origen_results = pool.map(_origen, origen_params_ls)
             pool.close()
             pool.join()
-        for result in origen_results:
-            result[1]["material"] = Material(dict(result[1]["material"]),
-                                             1000,
-                                             attrs={"units": "g"})
-        return dict(origen_results)
+        for mat_id, result, timings in origen_results:
+            for name, (start, duration) in timings.items():
+                self.tracer.add(name, start, duration, mat=mat_id)
+            result["material"] = result["material"].to_material(1000,
+                                                               attrs={"units": "g"})
+        return dict((mat_id, result) for mat_id, result, _ in origen_results)
 
     def openmc(self, state):
         """Runs OpenMC for a given state.
@@ -446,32 +581,98 @@ class OpenMCOrigen(object):
             Group flux.
         xstab : list of tuples
             A list of tuples of the format (nuc, rx, xs).
+        particles : int
+            The number of particles per cycle that were run.
+        """
+        rc = self.params
+        particles = self._size_particles(state) if rc.adaptive_particles \
+                    else rc.k_particles
+        statepoint = self._run_openmc(state, "omc", k_particles=particles)
+        # parse & prepare results
+        with self.tracer.span('statepoint'):
+            k, phi_g, e_g = self._parse_statepoint(statepoint)
+        if rc.plot_group_flux:
+            plot_e_g, plot_phi_g = self._find_plot_data(statepoint)
+            pwd = self.pwd(state, "omc")
+            with indir(pwd):
+                self._plot_group_flux(plot_e_g, plot_phi_g)
+        with self.tracer.span('xs'):
+            xstab = self._generate_xs(e_g, phi_g)
+        return k, phi_g, xstab, particles
+
+    def _run_openmc(self, state, directory, **overrides):
+        """Writes the inputs for and runs OpenMC in a sub-directory of the
+        state's directory, unless a statepoint is already there.
+
+        Parameters
+        ----------
+        state : namedtuple (State)
+            A namedtuple containing the state parameters.
+        directory : str
+            Name of the sub-directory to run in.
+        overrides : optional
+            Settings to use instead of those in the run control, e.g.
+            ``k_particles``.
+
+        Returns
+        -------
+        statepoint : str
+            Path to the resulting statepoint file.
         """
-        # make inputs
-        pwd = self.pwd(state, "omc")
+        pwd = self.pwd(state, directory)
         if not os.path.isdir(pwd):
             os.makedirs(pwd)
-        self._make_omc_input(state)
+        with self.tracer.span('omc_input', run_type=directory):
+            self._make_omc_input(state, directory, **overrides)
         statepoint = _find_statepoint(pwd)
         if statepoint is None:
-            with indir(pwd):
-                subprocess.check_call(['openmc', '-s', '{}'.format(self.rc.threads)])
+            params = self.params
+            particles = overrides.get('k_particles', params.k_particles)
+            with indir(pwd), self.tracer.span('openmc', run_type=directory,
+                                              threads=params.threads,
+                                              particles=particles,
+                                              cycles=params.k_cycles):
+                subprocess.check_call(['openmc', '-s', '{}'.format(params.threads)])
             statepoint = _find_statepoint(pwd)
-        # parse & prepare results
-        k, phi_g, e_g = self._parse_statepoint(statepoint)
-        if self.rc.plot_group_flux:
-            plot_e_g, plot_phi_g = self._find_plot_data(statepoint)
-            with indir(pwd):
-                self._plot_group_flux(plot_e_g, plot_phi_g)
-        xstab = self._generate_xs(e_g, phi_g)
-        return k, phi_g, xstab
+        return statepoint
+
+    def _size_particles(self, state):
+        """Runs a short pilot calculation and sizes the number of particles per
+        cycle of the production run such that the flux tallies reach the
+        target relative error.  The relative error falls off as one over the
+        square root of the number of active histories.
+
+        Parameters
+        ----------
+        state : namedtuple (State)
+            A namedtuple containing the state parameters.
+
+        Returns
+        -------
+        particles : int
+            Number of particles per cycle for the production run.
+        """
+        rc = self.params
+        statepoint_path = self._run_openmc(state, "omc_pilot",
+                                           k_particles=rc.pilot_particles)
+        sp = statepoint.StatePoint(statepoint_path)
+        rel_err = max(_tally_rel_err(sp.tallies[TALLY_IDS[name]])
+                      for name in self.tallies if name in FLUX_TALLIES)
+        particles = rc.pilot_particles * (rel_err / rc.target_rel_err)**2
+        particles = int(np.ceil(particles))
+        particles = min(max(particles, rc.min_particles), rc.max_particles)
+        if rc.verbose:
+            print("pilot relative error {0:.3g}, running {1} particles per "
+                  "cycle".format(rel_err, particles))
+        return particles
 
     def _find_plot_data(self, statepoint_path):
         sp = statepoint.StatePoint(statepoint_path)
-        tally = sp.tallies[3].get_values(['flux'])
+        tally_id = TALLY_IDS['omcflux']
+        tally = sp.tallies[tally_id].get_values(['flux'])
         phi_g = tally.flatten()
         phi_g /= phi_g.sum()
-        e_g = sp.tallies[3].find_filter('energy').bins
+        e_g = sp.tallies[tally_id].find_filter('energy').bins
         return e_g, phi_g
 
 
@@ -493,37 +694,39 @@ class OpenMCOrigen(object):
         plt.savefig("flux")
         plt.close()
 
-    def _make_omc_input(self, state):
+    def _make_omc_input(self, state, directory="omc", **overrides):
         """Make OpenMC input files for a given state.
 
         Parameters
         ----------
         state : namedtuple (State)
             A namedtuple containing the state parameters.
+        directory : str, optional
+            Name of the sub-directory of the state to write to.
+        overrides : optional
+            Context values to use instead of those in the run control.
 
         Returns
         -------
         None
         """
-        pwd = self.pwd(state, "omc")
+        pwd = self.pwd(state, directory)
         ctx = self.context(state)
+        ctx.update(overrides)
         rc = self.rc
         # settings
         settings = SETTINGS_TEMPLATE.format(**ctx)
         with open(os.path.join(pwd, 'settings.xml'), 'w') as f:
             f.write(settings)
         # materials
-        valid_nucs = self.nucs_in_cross_sections()
-        # discard Cd-119m1 as a valid nuc
-        valid_nucs.discard(481190001)
-        ctx['_fuel_nucs'] = _mat_to_nucs(rc.fuel_material[valid_nucs])
-        curr_fuel = self.libs['fuel']['material'][-1][valid_nucs]
-        for nuc in curr_fuel.comp:
-            if curr_fuel.comp[nuc] < self.rc.track_nuc_threshold:
-                del curr_fuel.comp[nuc]
-        ctx['_fuel_nucs'] = _mat_to_nucs(curr_fuel[valid_nucs])        
-        ctx['_clad_nucs'] = _mat_to_nucs(rc.clad_material[valid_nucs])
-        ctx['_cool_nucs'] = _mat_to_nucs(rc.cool_material[valid_nucs])
+        valid_nucs = self.valid_nucs()
+        curr_fuel = Composition.from_material(self.libs['fuel']['material'][-1])
+        curr_fuel = curr_fuel.intersect(valid_nucs).normalize()
+        curr_fuel = curr_fuel.prune(self.params.track_nuc_threshold).normalize()
+        ctx['_fuel_nucs'] = _mat_to_nucs(curr_fuel)
+        for name in ('clad', 'cool'):
+            comp = Composition.from_material(getattr(rc, name + '_material'))
+            ctx['_' + name + '_nucs'] = _mat_to_nucs(comp.intersect(valid_nucs).normalize())
         materials = MATERIALS_TEMPLATE.format(**ctx)
         with open(os.path.join(pwd, 'materials.xml'), 'w') as f:
             f.write(materials)
@@ -543,6 +746,8 @@ class OpenMCOrigen(object):
         ctx['_eafds_egrid'] = " ".join(map(str, sorted(self.eafds.src_group_struct)))
         ctx['_omcds_egrid'] = " ".join(map(str, sorted(self.omcds.src_group_struct)))
         # nucs = core_nucs & valid_nucs
+        ctx['_tallies'] = "".join([TALLY_TEMPLATES[name].format(id=TALLY_IDS[name], **ctx)
+                                   for name in self.tallies])
         tallies = TALLIES_TEMPLATE.format(**ctx)
         with open(os.path.join(pwd, 'tallies.xml'), 'w') as f:
             f.write(tallies)
@@ -551,6 +756,22 @@ class OpenMCOrigen(object):
         with open(os.path.join(pwd, 'plots.xml'), 'w') as f:
             f.write(plots)
 
+    def valid_nucs(self):
+        """The nuclides that may be put into OpenMC materials, i.e. those in the
+        cross_sections.xml file except for Cd-119m1.
+
+        Returns
+        -------
+        nucs : sorted int64 array
+            Nuclides in ID form.
+        """
+        if self._valid_nucs is None:
+            nucs = self.nucs_in_cross_sections()
+            # discard Cd-119m1 as a valid nuc
+            nucs.discard(481190001)
+            self._valid_nucs = np.array(sorted(nucs), dtype='i8')
+        return self._valid_nucs
+
     def nucs_in_cross_sections(self):
         """Returns the set of nuclides present in the cross_sections.xml file.
 
@@ -583,11 +804,11 @@ class OpenMCOrigen(object):
             Group structure.
         """
         sp = statepoint.StatePoint(statepoint_path)
-        temp_tally = []
-        temp_tally.append(sp.tallies[2].get_values(['flux']).flatten())
-        temp_tally.append(sp.tallies[3].get_values(['flux']).flatten())
         # compute group fluxes for data sources
-        for tally, ds in zip(temp_tally[:2], (self.eafds, self.omcds)):
+        for name, ds in (('eafflux', self.eafds), ('omcflux', self.omcds)):
+            if name not in self.tallies:
+                continue
+            tally = sp.tallies[TALLY_IDS[name]].get_values(['flux']).flatten()
             ds.src_phi_g = np.array(tally[::-1])
             ds.src_phi_g /= tally.sum()
         # compute return values
@@ -614,7 +835,7 @@ class OpenMCOrigen(object):
         data : list of tuples
             A list of tuples of the format (nuc, rx, xs).
         """
-        rc = self.rc
+        rc = self.params
         verbose = rc.verbose
         xscache = self.xscache
         xscache.clear()
@@ -639,7 +860,7 @@ class OpenMCOrigen(object):
                     print("OpenMC XS:", nucname.name(nuc), rxname.name(rx), xs, type(xs), temp)
                 data[i] = nuc, rx, xs
                 i += 1
-        return data
+        return data[:i]
 
     def _make_origen_input(self, transmute_time, phi_tot, mat):
         """Make ORIGEN input files for a given state.
@@ -658,25 +879,24 @@ class OpenMCOrigen(object):
         """
         # may need to filter tape4 for Bad Nuclides
         # if sum(mat.comp.values()) > 1:
-        for nuc in mat.comp:
-            if mat.comp[nuc] < self.rc.track_nuc_threshold:
-                del mat.comp[nuc]
-        origen22.write_tape4(mat)
+        threshold = self.params.track_nuc_threshold
+        comp = Composition.from_material(mat).prune(threshold)
+        origen22.write_tape4(comp.to_material(mat.mass * comp.mass_fraction()))
         origen22.write_tape5_irradiation("IRF",
                                          transmute_time,
                                          phi_tot,
                                          xsfpy_nlb=(219, 220, 221),
-                                         cut_off=self.rc.track_nuc_threshold)
+                                         cut_off=threshold)
         origen22.write_tape9(self.tape9)
 
 
 def _mat_to_nucs(mat):
-    """Convert a ``pyne.material.Material`` into OpenMC ``materials.xml`` format.
+    """Convert a composition into OpenMC ``materials.xml`` format.
 
     Parameters
     ----------
-    mat : ``pyne.material.Material``
-        Material to convert.
+    mat : xsgen.composition.Composition
+        Composition to convert.
 
     Returns
     -------
@@ -685,12 +905,167 @@ def _mat_to_nucs(mat):
     """
     nucs = []
     template = '<nuclide name="{nuc}" wo="{mass}" />'
-    for nuc, mass in mat.comp.items():
+    for nuc, mass in mat.items():
         nucs.append(template.format(nuc=nucname.serpent(nuc), mass=mass*100))
     nucs = "\n    ".join(nucs)
     return nucs
 
 
+def required_tallies(rc):
+    """Determines the tallies to score: those requested with the ``tallies``
+    run control parameter, plus those that this engine and the enabled
+    writers need.
+
+    Parameters
+    ----------
+    rc : xsgen.utils.RunControl
+        The run control, whose writers have been made.
+
+    Returns
+    -------
+    tallies : list of str
+        Tally names, ordered by tally id.
+    """
+    tallies = set(rc.tallies or ())
+    # the group flux and the flux on the OpenMC data source's groups
+    # are always needed to collapse cross sections
+    tallies.update(['flux', 'omcflux'])
+    if not rc.is_thermal:
+        tallies.add('eafflux')
+    for writer in rc.writers:
+        tallies.update(getattr(writer, 'tallies', ()))
+    unknown = tallies - set(TALLY_TEMPLATES)
+    if len(unknown) > 0:
+        raise ValueError("unknown tallies {0}, must be from {1}".format(
+                         sorted(unknown), sorted(TALLY_TEMPLATES)))
+    return sorted(tallies, key=TALLY_IDS.get)
+
+
+def _rel_change(old, new, floor=0.0):
+    """The change between two values relative to the larger of them and
+    floor."""
+    scale = max(abs(old), abs(new), floor)
+    return 0.0 if scale == 0.0 else abs(new - old) / scale
+
+
+def next_burn_step(dt, change, tol, min_step, max_step):
+    """The length of the next burnup step.  The step is scaled by how far the
+    relative change over the last one was from the tolerance, damped by a
+    safety factor of 0.9 and by at most halving or doubling it.
+
+    Parameters
+    ----------
+    dt : float
+        Length of the last step [days].
+    change : float
+        Largest relative change over the last step.
+    tol : float
+        Relative change that steps aim for.
+    min_step, max_step : float
+        Bounds of the step [days].
+
+    Returns
+    -------
+    dt : float
+        Length of the next step [days].
+    """
+    factor = 2.0 if change == 0.0 else min(max(0.9 * tol / change, 0.5), 2.0)
+    return min(max(dt * factor, min_step), max_step)
+
+
+def interpolate_libs(libs, times):
+    """Interpolates the libraries of a run onto other burn times.
+
+    Rates, fluxes, and the tracked nuclide masses and compositions are
+    linearly interpolated in time.  BUd, the burnup of each step, is the
+    difference of the interpolated cumulative burnup so that the total burnup
+    is kept.  The per-step xs, particles, k, and group fluxes are those of the
+    step that each burn time falls in.
+
+    Parameters
+    ----------
+    libs : dict
+        The libraries of a run, whose TIME rows start at times[0].
+    times : sequence of floats
+        The burn times, in increasing order, within the TIME of libs.
+
+    Returns
+    -------
+    libs : dict
+        The libraries at the burn times.
+    """
+    steps = np.asarray(libs['fuel']['TIME'], dtype='f8')
+    times = np.asarray(times, dtype='f8')
+    # the step that each burn time ends, whose per-step values it gets
+    ends = np.minimum(np.searchsorted(steps, times * (1 - 1e-12)),
+                      len(steps) - 1)
+    out = dict(libs)
+    for key in ('xs', 'particles', 'k'):
+        if key in libs:
+            out[key] = [libs[key][i - 1] for i in ends[1:]]
+    out['phi_g'] = dict(libs['phi_g'])
+    out['phi_g']['phi_g'] = [libs['phi_g']['phi_g'][i - 1] for i in ends[1:]]
+    for mat, matlib in libs.items():
+        if mat != 'fuel' and not isinstance(mat, int):
+            continue
+        lib = {'TIME': times.tolist()}
+        for row in ('phi_tot', 'NEUT_PROD', 'NEUT_DEST'):
+            lib[row] = np.interp(times, steps, matlib[row]).tolist()
+        burnup = np.interp(times, steps, np.cumsum(matlib['BUd']))
+        lib['BUd'] = [float(burnup[0])] + np.diff(burnup).tolist()
+        lib['tracked_nucs'] = dict((name, np.interp(times, steps, masses).tolist())
+                                   for name, masses in matlib['tracked_nucs'].items())
+        lib['material'] = [_interpolate_material(matlib['material'], steps, t)
+                           for t in times.tolist()]
+        out[mat] = lib
+    return out
+
+
+def _interpolate_material(materials, steps, t):
+    """The material at time t, linearly interpolated between those at the
+    two steps around it."""
+    j = int(np.searchsorted(steps, t))
+    if j < len(steps) and np.isclose(steps[j], t, rtol=1e-12, atol=0.0):
+        return materials[j]
+    w = (t - steps[j-1]) / (steps[j] - steps[j-1])
+    a = Composition.from_material(materials[j-1])
+    b = Composition.from_material(materials[j])
+    nucs = np.union1d(a.nucs, b.nucs)
+    fracs = np.zeros(len(nucs))
+    fracs[np.searchsorted(nucs, a.nucs)] += (1 - w) * a.fracs
+    fracs[np.searchsorted(nucs, b.nucs)] += w * b.fracs
+    mass = (1 - w) * materials[j-1].mass + w * materials[j].mass
+    return Composition(nucs, fracs, sort=False).to_material(mass,
+                                                           attrs={"units": "g"})
+
+
+def _tally_rel_err(tally):
+    """The flux-weighted mean relative error of a tally, computed from the
+    sum and sum of squares of its realizations.  Bins with no score are
+    ignored.
+
+    Parameters
+    ----------
+    tally : openmc.Tally
+        A tally read from a statepoint.
+
+    Returns
+    -------
+    rel_err : float
+        The mean relative error of the tally.
+    """
+    n = tally.num_realizations
+    s = np.asarray(tally.sum, dtype='f8').ravel()
+    s2 = np.asarray(tally.sum_sq, dtype='f8').ravel()
+    mean = s / n
+    std_dev = np.sqrt(np.maximum(s2 / n - mean**2, 0.0) / (n - 1))
+    nonzero = mean > 0.0
+    if not nonzero.any():
+        return np.inf
+    mean = mean[nonzero]
+    return np.sum(std_dev[nonzero]) / np.sum(mean)
+
+
 def _find_statepoint(pwd):
     """Find a statepoint in a directory. Returns None if none found.
 
@@ -737,17 +1112,24 @@ def _origen(origen_params):
 
     Returns
     -------
+    mat_id : str or int
+        The material identifier that was passed in.
     results : dict
         Dictionary with neutron production and destruction rates, burnup, and
         transmutation results.
+    timings : dict
+        Maps the phases run here, 'origen' and 'tape6', to (start, duration)
+        tuples so that the parent process may trace them.
 
     """
     abs_time, transmute_time, phi_tot, mat_id, mat, pwd, origen_call = origen_params
     mat.mass = 1000
     mat.attrs = {"units": "g"}
+    timings = {}
 
     with indir(pwd):
         if not os.path.isfile("TAPE6.OUT"):
+            start = time.time()
             times_called = 0
             while times_called < 3:
                 times_called += 1
@@ -756,13 +1138,12 @@ def _origen(origen_params):
                     break
                 except subprocess.CalledProcessError:
                     print("Warning: ORIGEN2.2 in " + pwd + "failed. Retrying.")
+            timings['origen'] = (start, time.time() - start)
         print("Parsing " + pwd + "/TAPE6.OUT...")
+        start = time.time()
         tape6 = origen22.parse_tape6("TAPE6.OUT")
-    out_mat = tape6["materials"][-1]
-    out_mat.mass = 1000
-    out_mat.comp = {n: frac for n, frac in out_mat.comp.items() if frac != 0}
-    if mat_id == "fuel":
-        out_mat.atoms_per_molecule = 3
+        timings['tape6'] = (start, time.time() - start)
+    out_mat = Composition.from_material(tape6["materials"][-1]).nonzero()
     burnup = tape6["burnup_MWD"][-1]
     neutron_prod = tape6["neutron_production_rate"][-1]
     neutron_dest = tape6["neutron_destruction_rate"][-1]
@@ -772,9 +1153,9 @@ def _origen(origen_params):
         "NEUT_PROD": neutron_prod,
         "NEUT_DEST": neutron_dest,
         "BUd": burnup,
-        "material": list(out_mat.comp.items()),
+        "material": out_mat,
         "phi_tot": phi_tot
-        })
+        }, timings)
     if burnup < 0.0:
         msg = 'Negative burnup found for {0}:\n{1}'
         msg = msg.format(mat_id, pformat(results[1]))
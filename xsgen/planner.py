@@ -0,0 +1,342 @@
+"""Estimates of what an xsgen execution will cost, without running it.
+
+A dry run (``--dry-run``) stops after the states have been made and prints a
+``Plan``: how many runs and burnup steps there are, how many times OpenMC and
+ORIGEN will be called, how large the OpenMC statepoints are expected to be
+from the shapes of the tallies that are scored, and how many output files of
+roughly what size each format writes.  With the :mod:`xsgen.surrogate`
+plugin, only the anchor states that it simulates are counted.
+
+The wall time of the execution can also be estimated from per-call timings
+that are calibrated from the trace (see ``trace_file``) of a short pilot
+execution with ``calibrate()``.  OpenMC time is taken to scale with the
+number of particle histories over the number of threads, and ORIGEN calls for
+the fuel and each tracked nuclide are spread over the threads.
+
+Sizes are estimates: statepoints are counted as their tally results and
+source bank plus a fixed header, and library files as their values.
+
+Planner API
+===========
+"""
+from __future__ import print_function
+import math
+
+import numpy as np
+
+EAF_GROUPS = 175
+"""Number of groups of the EAF data source's group structure."""
+
+STATEPOINT_HEADER_BYTES = 16 * 1024
+"""Bytes of a statepoint besides its tally results and source bank."""
+
+SOURCE_SITE_BYTES = 64
+"""Bytes per particle of the source bank that is stored in a statepoint."""
+
+TALLY_BIN_BYTES = 16
+"""Bytes per tally bin, for its sum and sum of squares."""
+
+TEXT_VALUE_BYTES = 20
+"""Bytes per formatted value in a text library file."""
+
+BINARY_VALUE_BYTES = 8
+"""Bytes per value in a binary library file, before compression."""
+
+BRIGHTLITE_METADATA_FILES = 5
+"""The manifest, params, structural, TAPE9.INP, and particles files of a
+Bright-lite library directory."""
+
+STEP_SPANS = ('omc_input', 'statepoint', 'xs', 'tape9')
+"""Traced spans that run once per burnup step besides OpenMC and ORIGEN."""
+
+ORIGEN_SPANS = ('origen_input', 'origen', 'tape6')
+"""Traced spans that run once per ORIGEN call."""
+
+
+def tally_bins(names, group_structure, openmc_group_struct):
+    """The number of bins of each OpenMC tally.
+
+    Parameters
+    ----------
+    names : sequence of str
+        Tally names, from 'flux', 'eafflux', 'omcflux', and 's_gh'.
+    group_structure : sequence of floats
+        Group boundaries of the libraries.
+    openmc_group_struct : sequence of floats
+        Group boundaries of the OpenMC data source.
+
+    Returns
+    -------
+    bins : dict
+        Maps tally names to their number of bins.
+    """
+    G = len(group_structure) - 1
+    sizes = {'flux': G, 'eafflux': EAF_GROUPS,
+             'omcflux': len(openmc_group_struct) - 1, 's_gh': G * G}
+    return dict((name, sizes[name]) for name in names)
+
+
+def statepoint_bytes(bins, particles, cycles):
+    """The expected size of an OpenMC statepoint.
+
+    Parameters
+    ----------
+    bins : dict
+        Maps tally names to their number of bins, see ``tally_bins()``.
+    particles : int
+        Particles per cycle.
+    cycles : int
+        Number of cycles.
+
+    Returns
+    -------
+    size : int
+        Bytes.
+    """
+    return int(STATEPOINT_HEADER_BYTES + TALLY_BIN_BYTES * sum(bins.values()) +
+               SOURCE_SITE_BYTES * particles + 16 * cycles)
+
+
+def output_sizes(formats, nruns, nburn, ntrack, cyclus_batch=True):
+    """The number of files and bytes that each output format writes.
+
+    Parameters
+    ----------
+    formats : sequence of str
+        The output formats.
+    nruns : int
+        Number of runs, including any superposed ones.
+    nburn : int
+        Number of burn times per run.
+    ntrack : int
+        Number of tracked nuclides.
+    cyclus_batch : bool, optional
+        Whether the cyclus format batches all runs into one input.
+
+    Returns
+    -------
+    sizes : dict
+        Maps formats to (files, bytes) tuples.
+    """
+    nlibs = 1 + ntrack
+    # the rows and the transmutation matrix, at most every tracked nuclide
+    values = nlibs * (5 + ntrack) * nburn
+    brightlite = (nruns * (nlibs + BRIGHTLITE_METADATA_FILES),
+                  nruns * values * TEXT_VALUE_BYTES)
+    sizes = {}
+    for format in formats:
+        if format == 'brightlite':
+            sizes[format] = brightlite
+        elif format == 'hdf5':
+            sizes[format] = (1, nruns * values * BINARY_VALUE_BYTES)
+        elif format == 'npz':
+            # an archive per run and the index
+            sizes[format] = (nruns + 1, nruns * values * BINARY_VALUE_BYTES)
+        elif format == 'cyclus':
+            files = 1 if cyclus_batch else nruns
+            if 'brightlite' in formats:
+                sizes[format] = (files, 0)
+            else:
+                sizes[format] = (files + brightlite[0], brightlite[1])
+        else:
+            sizes[format] = (0, 0)
+    return sizes
+
+
+def calibrate(events):
+    """Per-call timings from the spans of a traced pilot execution.
+
+    Parameters
+    ----------
+    events : list of dicts
+        Spans, as returned by ``xsgen.tracing.load_trace()``.
+
+    Returns
+    -------
+    timings : dict
+        With the keys 'openmc', in thread-seconds per particle history,
+        'origen', in seconds per ORIGEN call, 'step', in seconds of other
+        work per burnup step, and 'xs_load' and 'write', in seconds.  Keys
+        whose spans were not traced are missing.
+    """
+    durations = {}
+    for event in events:
+        durations.setdefault(event['name'], []).append(event)
+    timings = {}
+    if 'openmc' in durations:
+        costs = []
+        for event in durations['openmc']:
+            tags = event.get('tags', {})
+            histories = tags.get('particles', 1) * tags.get('cycles', 1)
+            costs.append(event['duration'] * tags.get('threads', 1) / histories)
+        timings['openmc'] = float(np.mean(costs))
+    if 'origen' in durations:
+        ncalls = len(durations['origen'])
+        timings['origen'] = sum(e['duration'] for name in ORIGEN_SPANS
+                                for e in durations.get(name, ())) / ncalls
+    if 'step' in durations:
+        nsteps = len(durations['step'])
+        timings['step'] = sum(e['duration'] for name in STEP_SPANS
+                              for e in durations.get(name, ())) / nsteps
+    for name in ('xs_load', 'write'):
+        if name in durations:
+            timings[name] = float(np.mean([e['duration'] for e in durations[name]]))
+    return timings
+
+
+class Plan(object):
+    """The work that an execution is expected to do."""
+
+    def __init__(self, nruns, nsteps, nmats, histories, statepoint_size,
+                 outputs, openmc_per_step=1, adaptive=False):
+        """Parameters
+        ----------
+        nruns : int
+            Number of runs.
+        nsteps : int
+            Total number of burnup steps over all runs.
+        nmats : int
+            Materials depleted by ORIGEN per step: the fuel and each tracked
+            nuclide.
+        histories : int
+            Particle histories per burnup step, over all OpenMC calls.
+        statepoint_size : int
+            Expected bytes per statepoint.
+        outputs : dict
+            Maps formats to (files, bytes) tuples, see ``output_sizes()``.
+        openmc_per_step : int, optional
+            OpenMC calls per burnup step, 2 with a pilot calculation.
+        adaptive : bool, optional
+            Whether the steps are adaptive, in which case nsteps is an upper
+            bound.
+
+        """
+        self.nruns = nruns
+        self.nsteps = nsteps
+        self.nmats = nmats
+        self.histories = histories
+        self.statepoint_size = statepoint_size
+        self.outputs = outputs
+        self.openmc_per_step = openmc_per_step
+        self.adaptive = adaptive
+
+    @property
+    def openmc_calls(self):
+        """Number of OpenMC calls."""
+        return self.nsteps * self.openmc_per_step
+
+    @property
+    def origen_calls(self):
+        """Number of ORIGEN calls."""
+        return self.nsteps * self.nmats
+
+    @property
+    def statepoint_bytes(self):
+        """Bytes of all of the statepoints that are written."""
+        return self.openmc_calls * self.statepoint_size
+
+    def wall_time(self, timings, threads=1):
+        """Estimates the wall time of the execution.
+
+        Parameters
+        ----------
+        timings : dict
+            Per-call timings, see ``calibrate()``.
+        threads : int, optional
+            Number of threads that OpenMC and ORIGEN run on.
+
+        Returns
+        -------
+        seconds : float or None
+            None if the timings lack OpenMC or ORIGEN.
+        """
+        if 'openmc' not in timings or 'origen' not in timings:
+            return None
+        threads = max(threads, 1)
+        step = timings.get('step', 0.0)
+        step += timings['openmc'] * self.histories / threads
+        step += math.ceil(self.nmats / float(threads)) * timings['origen']
+        return timings.get('xs_load', 0.0) + self.nsteps * step
+
+    def summary(self, timings=None, threads=1):
+        """A report of the plan, with the wall time if timings are given."""
+        bound = "at most " if self.adaptive else ""
+        lines = ["runs              {0}".format(self.nruns),
+                 "burnup steps      {0}{1}".format(bound, self.nsteps),
+                 "OpenMC calls      {0}{1}".format(bound, self.openmc_calls),
+                 "ORIGEN calls      {0}{1}".format(bound, self.origen_calls),
+                 "statepoints       {0} each, {1} in total".format(
+                    _human(self.statepoint_size), _human(self.statepoint_bytes))]
+        for format, (files, size) in sorted(self.outputs.items()):
+            lines.append("{0:<17} {1} files, {2}".format(format, files, _human(size)))
+        if timings:
+            wall = self.wall_time(timings, threads)
+            if wall is None:
+                lines.append("wall time         not calibrated")
+            else:
+                lines.append("wall time         {0} on {1} threads".format(
+                             _duration(wall), threads))
+        return "\n".join(lines)
+
+
+def _duration(seconds):
+    if seconds < 60.0:
+        return "{0:.1f} s".format(seconds)
+    elif seconds < 3600.0:
+        return "{0:.1f} min".format(seconds / 60.0)
+    return "{0:.1f} h".format(seconds / 3600.0)
+
+
+def _human(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024.0 or unit == 'GB':
+            break
+        size /= 1024.0
+    return "{0:.1f} {1}".format(size, unit)
+
+
+def make_plan(rc, tallies, states=None):
+    """Plans the execution of a run control whose states have been made.
+
+    Parameters
+    ----------
+    rc : xsgen.utils.RunControl
+        The run control, after ``xsgen.pre`` has been set up.
+    tallies : sequence of str
+        The names of the tallies that the solver scores.
+    states : StateSpace or sequence of states, optional
+        The states that will be simulated, if not all of ``rc.states``, such
+        as the anchor states of :mod:`xsgen.surrogate`.
+
+    Returns
+    -------
+    plan : Plan
+    """
+    if states is None:
+        states = rc.states
+    nstates = len(states)
+    if hasattr(states, 'nruns'):
+        nruns = states.nruns
+    else:
+        from xsgen.states import group_runs
+        nruns = len(group_runs(states))
+    nburn = len(rc.burn_times)
+    adaptive = rc.get('adaptive_burn', False)
+    if adaptive:
+        span = float(np.max(rc.burn_times) - np.min(rc.burn_times))
+        nsteps = nruns * int(math.ceil(span / rc.min_burn_step))
+    else:
+        # a run of n states is n - 1 steps
+        nsteps = nstates - nruns
+    pilot = rc.get('adaptive_particles', False)
+    histories = rc.k_particles * rc.k_cycles
+    if pilot:
+        histories += rc.pilot_particles * rc.k_cycles
+    bins = tally_bins(tallies, rc.group_structure, rc.openmc_group_struct)
+    ntrack = len(rc.track_nucs)
+    nout = nruns * (1 + len(rc.get('superpositions', ())))
+    outputs = output_sizes(rc.formats, nout, nburn, ntrack,
+                           rc.get('cyclus_batch', True))
+    return Plan(nruns, nsteps, 1 + ntrack, histories,
+                statepoint_bytes(bins, rc.k_particles, rc.k_cycles), outputs,
+                openmc_per_step=2 if pilot else 1, adaptive=adaptive)
@@ -91,7 +91,57 @@ Interface
 :report_debug(rc):  Generates and returns a message to report in the ``debug.txt``
     file in the event that execute() fails and additional debugging information is
     requested.  This message is a string.
-
+:parallel_safe: Whether the execute() of this plugin may run at the same time as
+    that of other parallel-safe plugins, see Concurrent Execution.  False by
+    default.
+:on_phase_start(modname, phase, rc): Optional.  Called before the setup,
+    execute, or teardown phase (the ``phase`` string) of every plugin runs,
+    including this one.
+:on_phase_end(modname, phase, metrics, rc): Optional.  Called after a phase of
+    every plugin has run, or failed, with the dict of its metrics (see Phase
+    Metrics).  These two hooks allow a plugin to export the metrics to a
+    monitoring system.
+
+Phase Metrics
+-------------
+The setup, execute, and teardown of each plugin are measured by ``Plugins``.
+For every phase of every plugin, the metrics record the wall time and CPU time
+[s], by how much the peak resident set size of the process grew [MB], and,
+if ``tracemalloc`` is tracing (e.g. with ``--trace-malloc``), the peak of the
+memory allocated by Python during the phase [MB].  The metrics are kept in
+``Plugins.phase_metrics``, printed with ``--profile``, and written to
+``debug.txt`` when a phase fails.
+
+
+Concurrent Execution
+--------------------
+``Plugins`` keeps the graph of which plugins require which.  Plugins are
+executed in the order that they are listed, except that a run of consecutive
+plugins that are all ``parallel_safe`` is executed on a pool of
+``plugin_threads`` threads: each of them starts as soon as the plugins that it
+requires have finished.  A plugin that is not parallel-safe waits for all
+plugins before it and is executed on its own, so it may freely modify the run
+control or the working directory.  Parallel-safe plugins should only add their
+own keys to the run control.  Setup and teardown are always serial.
+
+If parallel-safe plugins fail, the plugins that are already running are
+finished but no more are started, and the error of the failed plugin that is
+listed first is raised, so that the error that is reported does not depend on
+the timing of the threads.  All of the errors are written to ``debug.txt``.
+The phase hooks of parallel-safe plugins are called from the worker threads.
+
+Lazy Loading
+------------
+Building the command line interface and the default run control only needs
+the ``requires``, ``defaultrc``, ``rcupdaters``, ``rcdocs``, and
+``update_argparser()`` of each plugin, but importing a plugin's module may
+import heavy dependencies such as OpenMC or PyNE.  A plugin may therefore put
+these in a light ``XSGenPluginMeta`` class in the module ``<modname>_meta``,
+which ``XSGenPlugin`` then inherits from.  ``Plugins`` reads the metadata from
+that module and only imports the plugin's own module when it is set up.
+Plugins without a metadata module are imported right away, as before.  The
+time spent importing each module is reported with ``--profile`` and in
+``debug.txt``.
 
 Example
 -------
@@ -144,15 +194,98 @@ Plugins API
 import os
 import io
 import sys
+import time
 import importlib
 import argparse
 import textwrap
+from multiprocessing.pool import ThreadPool
+
+if sys.version_info[0] > 2:
+    import queue
+else:
+    import Queue as queue
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
 
 from xsgen.utils import RunControl, NotSpecified, nyansep
 
 if sys.version_info[0] >= 3:
     basestring = str
 
+METADATA_SUFFIX = '_meta'
+"""Suffix of the name of the light metadata module of a plugin."""
+
+PHASES = ('setup', 'execute', 'teardown')
+"""The phases of a plugin that are measured."""
+
+_cpu_time = getattr(time, 'process_time', time.clock if hasattr(time, 'clock') else time.time)
+
+
+def _max_rss():
+    """The peak resident set size of this process [MB], or None."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on OS X, kilobytes elsewhere
+    return rss / (1024.0 ** 2 if sys.platform == 'darwin' else 1024.0)
+
+
+def _malloc_start():
+    if tracemalloc is None or not tracemalloc.is_tracing():
+        return None
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _malloc_peak(current):
+    if current is None or not tracemalloc.is_tracing():
+        return None
+    return max(tracemalloc.get_traced_memory()[1] - current, 0) / 1024.0 ** 2
+
+
+def _format_metric(value):
+    return "-" if value is None else "{0:.4f}".format(value)
+
+
+class PhaseTimer(object):
+    """Measures the resources used by one phase of one plugin."""
+
+    def __init__(self, modname, phase):
+        self.modname = modname
+        self.phase = phase
+        self.start = time.time()
+        self.cpu = _cpu_time()
+        self.rss = _max_rss()
+        self.malloc = _malloc_start()
+
+    def stop(self, ok=True):
+        """Returns the metrics of the phase.
+
+        Returns
+        -------
+        metrics : dict
+            With the keys 'plugin', 'phase', 'ok', 'start', 'wall' and 'cpu'
+            [s], 'rss', the growth of the peak resident set size [MB], and
+            'malloc', the peak of the memory allocated by Python [MB].  The
+            last two are None when they are not available.
+        """
+        rss = _max_rss()
+        return {'plugin': self.modname, 'phase': self.phase, 'ok': ok,
+                'start': self.start, 'wall': time.time() - self.start,
+                'cpu': _cpu_time() - self.cpu,
+                'rss': None if self.rss is None else rss - self.rss,
+                'malloc': _malloc_peak(self.malloc)}
+
+
 class Plugin(object):
     """A base plugin for other xsgen pluigins to inherit.
     """
@@ -188,6 +321,11 @@ class Plugin(object):
     are docstrings for the rc parameters.
     """
 
+    parallel_safe = False
+    """Whether execute() may run concurrently with that of other parallel-safe
+    plugins whose requirements have finished.
+    """
+
     def __init__(self):
         """The __init__() method may take no arguments or keyword arguments."""
         pass
@@ -273,7 +411,7 @@ class Plugins(object):
 
     """
 
-    def __init__(self, modnames, loaddeps=True):
+    def __init__(self, modnames, loaddeps=True, hooks=()):
         """Parameters
         ----------
         modnames : list of str
@@ -282,26 +420,73 @@ class Plugins(object):
         loaddeps: bool, optional
             Flag for automatically loading dependencies, should only be False in
             a limited set of circumstances.
+        hooks : sequence, optional
+            Extra objects with ``on_phase_start()`` and/or ``on_phase_end()``
+            methods, which are called like those of the plugins.
 
         """
         self.plugins = []
         self.modnames = []
+        self.requires = {}
+        self.errors = []
+        self.loaded = []
+        self.import_times = []
+        self.phase_metrics = []
+        self.hooks = list(hooks)
         self._load(modnames, loaddeps=loaddeps)
         self.parser = None
         self.rc = None
         self.rcdocs = {}
 
+    def _import(self, modname):
+        """Imports a module and records how long it took."""
+        start = time.time()
+        mod = importlib.import_module(modname)
+        self.import_times.append((modname, start, time.time() - start))
+        return mod
+
     def _load(self, modnames, loaddeps=True):
         for modname in modnames:
             if modname in self.modnames:
                 continue
-            mod = importlib.import_module(modname)
-            plugin = mod.XSGenPlugin()
+            try:
+                meta = self._import(modname + METADATA_SUFFIX)
+            except ImportError as e:
+                if getattr(e, 'name', None) not in (None, modname + METADATA_SUFFIX):
+                    raise
+                meta = None
+            if meta is None:
+                plugin = self._import(modname).XSGenPlugin()
+            else:
+                plugin = meta.XSGenPluginMeta()
             req = plugin.requires() if callable(plugin.requires) else plugin.requires
             req = req if loaddeps else ()
             self._load(req, loaddeps=loaddeps)
+            self.requires[modname] = tuple(req)
             self.modnames.append(modname)
             self.plugins.append(plugin)
+            self.loaded.append(meta is None)
+
+    def load(self):
+        """Imports the modules of the plugins that have only had their
+        metadata read, and replaces the metadata with the plugins themselves.
+        """
+        for i, modname in enumerate(self.modnames):
+            if not self.loaded[i]:
+                self.plugins[i] = self._import(modname).XSGenPlugin()
+                self.loaded[i] = True
+
+    def import_summary(self):
+        """Returns a table of the time spent importing each plugin module."""
+        if len(self.import_times) == 0:
+            return "No plugin modules were imported."
+        width = max(len(modname) for modname, _, _ in self.import_times)
+        template = "{0:<{w}}  {1:>12}"
+        lines = [template.format("module", "import [s]", w=width)]
+        for modname, _, duration in self.import_times:
+            lines.append(template.format(modname, "{0:.4f}".format(duration),
+                                         w=width))
+        return "\n".join(lines)
 
     def build_cli(self):
         """Builds and returns a command line interface based on the plugins.
@@ -339,30 +524,130 @@ class Plugins(object):
         self.rc = rc
         return rc
 
+    def _notify(self, hook, *args):
+        """Calls a phase hook of every plugin and extra hook that has it."""
+        for obj in self.plugins + self.hooks:
+            func = getattr(obj, hook, None)
+            if func is not None:
+                func(*args)
+
+    def _run_plugin(self, i, phase):
+        """Runs a phase of the i-th plugin and records its metrics."""
+        rc = self.rc
+        modname, plugin = self.modnames[i], self.plugins[i]
+        self._notify('on_phase_start', modname, phase, rc)
+        timer = PhaseTimer(modname, phase)
+        try:
+            getattr(plugin, phase)(rc)
+        except Exception:
+            metrics = timer.stop(ok=False)
+            self.phase_metrics.append(metrics)
+            self._notify('on_phase_end', modname, phase, metrics, rc)
+            raise
+        metrics = timer.stop()
+        self.phase_metrics.append(metrics)
+        self._notify('on_phase_end', modname, phase, metrics, rc)
+
+    def _try_plugin(self, i, phase):
+        """Runs a phase of the i-th plugin, returning (i, error or None)."""
+        try:
+            self._run_plugin(i, phase)
+        except Exception as e:
+            e.exc_info = sys.exc_info()
+            return i, e
+        return i, None
+
+    def _run_concurrently(self, indices, phase, threads):
+        """Runs a phase of the plugins at indices on a thread pool, each once
+        the plugins that it requires have finished."""
+        block = set(self.modnames[i] for i in indices)
+        pending = list(indices)
+        done = set()
+        errors = {}
+        finished = queue.Queue()
+        pool = ThreadPool(min(threads, len(indices)))
+        running = 0
+        try:
+            while True:
+                ready = [i for i in pending if len(errors) == 0 and
+                         all(dep not in block or dep in done
+                             for dep in self.requires.get(self.modnames[i], ()))]
+                for i in ready:
+                    pending.remove(i)
+                    pool.apply_async(self._try_plugin, (i, phase),
+                                     callback=finished.put)
+                    running += 1
+                if running == 0:
+                    break
+                i, err = finished.get()
+                running -= 1
+                done.add(self.modnames[i])
+                if err is not None:
+                    errors[i] = err
+        finally:
+            pool.close()
+            pool.join()
+        if len(errors) > 0:
+            self.errors.extend((self.modnames[i], errors[i]) for i in sorted(errors))
+            raise errors[min(errors)]
+
+    def _run_phase(self, phase):
+        """Runs a phase of every plugin, in order.  During execution, runs of
+        consecutive parallel-safe plugins are run concurrently."""
+        threads = self.rc.get('plugin_threads', 1) if phase == 'execute' else 1
+        block = []
+        for i, plugin in enumerate(self.plugins + [None]):
+            if threads > 1 and getattr(plugin, 'parallel_safe', False):
+                block.append(i)
+                continue
+            if len(block) > 1:
+                self._run_concurrently(block, phase, threads)
+            elif len(block) == 1:
+                self._run_plugin(block[0], phase)
+            block = []
+            if plugin is not None:
+                self._run_plugin(i, phase)
+
+    def phase_summary(self):
+        """Returns a table of the resources used by each phase of each plugin."""
+        if len(self.phase_metrics) == 0:
+            return "No plugin phases were run."
+        width = max(len(m['plugin']) for m in self.phase_metrics)
+        template = "{0:<{w}}  {1:<9}  {2:>10}  {3:>10}  {4:>10}  {5:>11}"
+        lines = [template.format("plugin", "phase", "wall [s]", "cpu [s]",
+                                 "rss [MB]", "malloc [MB]", w=width)]
+        for m in self.phase_metrics:
+            phase = m['phase'] if m['ok'] else m['phase'] + '!'
+            values = [_format_metric(m[key]) for key in ('wall', 'cpu', 'rss', 'malloc')]
+            lines.append(template.format(m['plugin'], phase, *values, w=width))
+        return "\n".join(lines)
+
     def setup(self):
-        """Preforms all plugin setup tasks."""
+        """Imports the plugins, if needed, and preforms all plugin setup tasks.
+        The imports are added to the tracer as 'import' spans once the base
+        plugin has set it up."""
         rc = self.rc
         try:
-            for plugin in self.plugins:
-                plugin.setup(rc)
+            self.load()
+            self._run_phase('setup')
         except Exception as e:
             self.exit(e)
+        tracer = rc.get('tracer')
+        if tracer is not None:
+            for modname, start, duration in self.import_times:
+                tracer.add('import', start, duration, module=modname)
 
     def execute(self):
         """Preforms all plugin executions."""
-        rc = self.rc
         try:
-            for plugin in self.plugins:
-                plugin.execute(rc)
+            self._run_phase('execute')
         except Exception as e:
             self.exit(e)
 
     def teardown(self):
         """Preforms all plugin teardown tasks."""
-        rc = self.rc
         try:
-            for plugin in self.plugins:
-                plugin.teardown(rc)
+            self._run_phase('teardown')
         except Exception as e:
             self.exit(e)
 
@@ -376,6 +661,11 @@ class Plugins(object):
             msg += traceback.format_exc()
             msg += '\n{0}Run control run-time contents:\n\n{1}\n\n'.format(sep,
                                                                     rc._pformat())
+            msg += '{0}Plugin imports:\n\n{1}\n\n'.format(sep, self.import_summary())
+            msg += '{0}Plugin phases:\n\n{1}\n\n'.format(sep, self.phase_summary())
+            for modname, e in self.errors:
+                msg += '{0}Error in plugin {1}:\n\n{2}\n'.format(sep, modname,
+                        ''.join(traceback.format_exception(*e.exc_info)))
             for plugin in self.plugins:
                 plugin_msg = plugin.report_debug(rc) or ''
                 if 0 < len(plugin_msg):
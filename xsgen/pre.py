@@ -5,13 +5,17 @@ Provides the following command-line arguments:
   - ``--formats``: The output formats to write out.
   - ``--is-thermal``: Whether the reactor is a thermal system (True) or a fast one (False)
   - ``--outdirs``: Names of output files to write out. Must correspond with formats.
+  - ``--compression``: Streaming compressor for the brightlite library files
+  - ``--compression-level``: Compression level of the brightlite library files
+  - ``--sampler``: How states are drawn from the perturbation parameters
+  - ``--n-samples``: Number of initial conditions drawn by the samplers
 """
 
 from __future__ import print_function
 import re
 import sys
-from itertools import product
 from collections import namedtuple
+from warnings import warn
 
 import numpy as np
 from pyne import nucname
@@ -20,9 +24,16 @@ from pyne.material import Material, from_atom_frac
 from pyne.utils import failure
 
 from xsgen.utils import NotSpecified
-from xsgen.nuc_track import transmute
-from xsgen.plugins import Plugin
-from xsgen.brightlite import BrightliteWriter
+from xsgen.nucset import build_nucset, read_nuc_file, resolve
+from xsgen.states import StateSpace
+from xsgen.sampling import sample_states
+from xsgen.superposition import perturbations
+from xsgen.rccache import rc_key, changed_params, removed_params, load_snapshot, \
+    dump_snapshot
+from xsgen.pre_meta import XSGenPluginMeta
+from xsgen.brightlite import BrightliteWriter, COMPRESSION_EXTS, zstandard
+from xsgen.binarylib import HDF5Writer, NPZWriter
+from xsgen.cyclus import CyclusWriter
 
 if sys.version_info[0] > 2:
     basestring = str
@@ -31,63 +42,17 @@ INITIAL_NUC_RE = re.compile('initial_([A-Za-z]{0,2}\d{1,7}[Mm]?)')
 
 FORMAT_WRITERS = {
     'brightlite': BrightliteWriter,
+    'hdf5': HDF5Writer,
+    'npz': NPZWriter,
+    'cyclus': CyclusWriter,
     }
 
 ensure_mat = lambda m: m if isinstance(m, Material) else Material(m)
 
 
-class XSGenPlugin(Plugin):
+class XSGenPlugin(XSGenPluginMeta):
     "The plugin itself."
 
-    requires = ('xsgen.base',)
-
-    defaultrc = {'formats': ('brightlite',),
-                 'is_thermal': True,
-                 'group_structure': [10 ** x for x in range(1, -3, -1)],
-                 'track_nucs': transmute,
-                 'track_nuc_threshold': 1.e-5,
-                 'energy_grid': 'nuclide',
-                 'sab': 'HH2O',
-                 'sab_xs': '71t',
-                 'fuel_density': 19.1,
-                 'clad_density': 6.56,
-                 'cool_density': 1.0,
-                 'fuel_cell_radius': 0.7,
-                 'void_cell_radius': 0.8,
-                 'clad_cell_radius': 0.9,
-                 'unit_cell_pitch': 1.5,
-                 'unit_cell_height': 2,
-                 'burn_regions': 1,
-                 'flux': NotSpecified,
-                 'fuel_specific_power': NotSpecified,
-                 'solver': "openmc+origen",
-                 'reactor': "lwr",
-                 'k_cycles': 20,
-                 'k_cycles_skip': 10,
-                 'k_particles': 1000,
-                 'threads': 1
-                 }
-    "A default run control for all the parameters one may desire."
-
-    rcdocs = {
-        'formats': 'The output formats to write out.',
-        'is_thermal': ('Whether the reactor is a thermal system (True) or a '
-                       'fast one (False)'),
-        'outdirs': ('Names of output files to write out. Must correspond '
-                    'with formats.'),
-        'flux': 'in units of [n/cm2/s].',
-        }
-
-    def update_argparser(self, parser):
-        parser.add_argument("-c", "--clean", action="store_true", dest="clean", default=False,
-                            help="Cleans the reactor directory of current files.")
-        parser.add_argument('--formats', dest='formats', help=self.rcdocs['formats'],
-                            nargs='+')
-        parser.add_argument('--outdirs', dest='outdirs', type=list, help=self.rcdocs['outdirs'],
-                            nargs='+')
-        parser.add_argument('--is-thermal', dest='is_thermal', type=bool,
-                            help=self.rcdocs['is_thermal'])
-
     def setup(self, rc):
         """Validate input; generate reactor states.
 
@@ -100,7 +65,10 @@ class XSGenPlugin(Plugin):
         -------
         None
         """
-        self.ensure_rc(rc)
+        if rc.rc_cache is None:
+            self.ensure_rc(rc)
+        else:
+            self.cached_ensure_rc(rc)
         if rc.debug:
             print("making states...")
         self.make_states(rc)
@@ -121,14 +89,50 @@ class XSGenPlugin(Plugin):
         self._ensure_bt(rc)
         self._ensure_gs(rc)
         self._ensure_nl(rc)
+        self._ensure_ab(rc)
         self._ensure_temp(rc)
         self._ensure_smf(rc)
         self._ensure_av(rc)
         self._ensure_inp(rc)
         self._ensure_pp(rc)
         self._ensure_mats(rc)
+        self._ensure_sup(rc)
         self._ensure_lattice(rc)
         self._ensure_outdirs(rc)
+        self._ensure_compression(rc)
+
+    def cached_ensure_rc(self, rc):
+        """Validate the run control parameters, or load them from the snapshot
+        in ``rc.rc_cache`` if this run control has been validated before.
+
+        Parameters
+        ----------
+        rc : xsgen.utils.RunControl
+            The run control that has been read in.
+
+        Returns
+        -------
+        None
+        """
+        key = rc_key(rc)
+        snapshot = load_snapshot(rc.rc_cache, key)
+        if snapshot is not None:
+            if rc.verbose:
+                print("loaded the validated run control {0}".format(key))
+            for name, value in snapshot['params'].items():
+                setattr(rc, name, value)
+            for name in snapshot['removed']:
+                if name in rc:
+                    delattr(rc, name)
+            return
+        before = dict(rc._dict)
+        self.ensure_rc(rc)
+        try:
+            dump_snapshot(rc.rc_cache, key, changed_params(before, rc),
+                          removed_params(before, rc))
+        except Exception as e:
+            warn("the validated run control could not be cached: {0}".format(e),
+                 RuntimeWarning)
 
     def _ensure_bt(self, rc):
         "Get or make the burn times in the run control."
@@ -150,7 +154,8 @@ class XSGenPlugin(Plugin):
         rc.group_structure = gs
 
     def load_nuc_file(self, path):
-        """Load list nucs from a file. Should be a file containing just a Python list.
+        """Load list nucs from a file, which may hold a JSON or Python list or
+        plain whitespace separated nuclides, see ``xsgen.nucset.read_nuc_file()``.
 
         Parameters
         ----------
@@ -162,25 +167,26 @@ class XSGenPlugin(Plugin):
         nucs : list of ints
             The nuclides listed in the file, in nuc ID form.
         """
-        with open(path, 'r') as f:
-            text = f.read()
-            if text[0] == "[" and text[-1] == "]":
-                nucs = exec(text)
-        nucs = [nucname.id(nuc) for nuc in nucs]
-        return nucs
+        return resolve(read_nuc_file(path), nucname.id).tolist()
 
     def _ensure_nl(self, rc):
         "Validate the tracked nuclides in the run control."
-        if isinstance(rc.track_nucs, basestring):
-            track_nucs = self.load_nuc_file(rc.track_nucs)
-        else:
-            track_nucs = [nucname.id(nuc) for nuc in rc.track_nucs]
-
         avg_timestep = 60*60*24*np.mean(rc.burn_times[1:]-rc.burn_times[:-1])
         min_halflife = rc.track_nuc_threshold * avg_timestep
-        track_nucs = [nucid for nucid in track_nucs
-                      if half_life(nucid) > min_halflife]
-        rc.track_nucs = sorted(set(track_nucs))
+        rc.track_nucs = build_nucset(rc.track_nucs, min_halflife,
+                                     idfunc=nucname.id, half_life=half_life)
+
+    def _ensure_ab(self, rc):
+        "Validate the adaptive burnup step parameters."
+        if rc.min_burn_step <= 0.0:
+            raise ValueError("min_burn_step must be positive, got "
+                             "{0}".format(rc.min_burn_step))
+        if rc.max_burn_step is not None and rc.max_burn_step < rc.min_burn_step:
+            raise ValueError("max_burn_step may not be less than min_burn_step")
+        if rc.adaptive_nuc_floor < 0.0:
+            raise ValueError("adaptive_nuc_floor may not be negative, got "
+                             "{0}".format(rc.adaptive_nuc_floor))
+        rc.adaptive_nucs = [nucname.id(nuc) for nuc in rc.adaptive_nucs]
 
     def _ensure_temp(self, rc):
         """Get the temperature from the run control file or set it to 600 K.
@@ -253,10 +259,28 @@ class XSGenPlugin(Plugin):
         else:
             rc.perturbation_params.append('fuel_specific_power')
 
-        rc.perturbation_params.extend(rc.initial_nuc_keys)
+        if not rc.superpose_initial_nucs:
+            rc.perturbation_params.extend(rc.initial_nuc_keys)
         # burn_times needs to be the last element
         rc.perturbation_params.append('burn_times')
 
+    def _ensure_sup(self, rc):
+        "Make the initial nuclide perturbations that are superposed, if any."
+        rc.superpositions = []
+        if not rc.superpose_initial_nucs:
+            return
+        initial = {}
+        for key in rc.initial_nuc_keys:
+            nuc = nucname.id(INITIAL_NUC_RE.match(key).group(1))
+            initial[nuc] = getattr(rc, key).tolist()
+        untracked = sorted(set(initial) - set(rc.track_nucs))
+        if len(untracked) > 0:
+            raise ValueError("initial nuclides {0} must be in track_nucs to be "
+                             "superposed".format(untracked))
+        nucs = [nuc for nuc in rc.track_nucs
+                if rc.fuel_material.comp.get(nuc, 0.0) > 0.0]
+        rc.superpositions = perturbations(initial, rc.get('deltam'), nucs)
+
     def _ensure_mats(self, rc):
         "Ensure we have a fuel material, clad material, and cooling material."
 
@@ -360,10 +384,23 @@ class XSGenPlugin(Plugin):
             raise ValueError("More formats defined than outdirs!")
         return
 
+    def _ensure_compression(self, rc):
+        "Ensure the compression of the library files is available."
+        if rc.compression not in COMPRESSION_EXTS:
+            raise ValueError("compression must be one of {0}, got {1!r}".format(
+                             list(COMPRESSION_EXTS), rc.compression))
+        if rc.compression == 'zstd' and zstandard is None:
+            print("zstandard is not installed, compressing with gzip instead...")
+            rc.compression = 'gzip'
+
     def make_states(self, rc):
         """Makes the reactor state table."""
 
         State = rc.State = namedtuple('State', rc.perturbation_params)
         data = [getattr(rc, a) for a in rc.perturbation_params]
-        rc.states = [State(*p) for p in product(*data)]
+        if rc.sampler == 'factorial':
+            rc.states = StateSpace(State, data)
+        else:
+            rc.states = sample_states(State, data, rc.sampler, n=rc.n_samples,
+                                      seed=rc.sampler_seed, level=rc.smolyak_level)
         rc.nstates = len(rc.states)
@@ -0,0 +1,178 @@
+"""Run control defaults and command-line interface of :mod:`xsgen.pre`.
+
+This module is light to import, so that the command-line interface of xsgen may
+be built without importing PyNE; see :mod:`xsgen.plugins`.
+
+Pre-processing Plugin Metadata API
+==================================
+"""
+from xsgen.utils import NotSpecified
+from xsgen.nuc_track import transmute
+from xsgen.sampling import SAMPLERS
+from xsgen.plugins import Plugin
+
+
+class XSGenPluginMeta(Plugin):
+    "The metadata of the pre-processing plugin."
+
+    requires = ('xsgen.base',)
+
+    defaultrc = {'formats': ('brightlite',),
+                 'is_thermal': True,
+                 'group_structure': [10 ** x for x in range(1, -3, -1)],
+                 'track_nucs': transmute,
+                 'track_nuc_threshold': 1.e-5,
+                 'energy_grid': 'nuclide',
+                 'sab': 'HH2O',
+                 'sab_xs': '71t',
+                 'fuel_density': 19.1,
+                 'clad_density': 6.56,
+                 'cool_density': 1.0,
+                 'fuel_cell_radius': 0.7,
+                 'void_cell_radius': 0.8,
+                 'clad_cell_radius': 0.9,
+                 'unit_cell_pitch': 1.5,
+                 'unit_cell_height': 2,
+                 'burn_regions': 1,
+                 'flux': NotSpecified,
+                 'fuel_specific_power': NotSpecified,
+                 'solver': "openmc+origen",
+                 'reactor': "lwr",
+                 'k_cycles': 20,
+                 'k_cycles_skip': 10,
+                 'k_particles': 1000,
+                 'adaptive_particles': False,
+                 'target_rel_err': 0.01,
+                 'pilot_particles': 200,
+                 'min_particles': 100,
+                 'max_particles': 100000,
+                 'threads': 1,
+                 'incremental_writes': True,
+                 'binary_complevel': 5,
+                 'cyclus_template': None,
+                 'cyclus_reactor': {},
+                 'cyclus_batch': True,
+                 'compression': None,
+                 'compression_level': None,
+                 'sampler': 'factorial',
+                 'n_samples': 100,
+                 'sampler_seed': None,
+                 'smolyak_level': 2,
+                 'superpose_initial_nucs': False,
+                 'superposition_tolerance': 0.01,
+                 'adaptive_burn': False,
+                 'burn_step_tol': 0.05,
+                 'min_burn_step': 1.0,
+                 'max_burn_step': None,
+                 'adaptive_nucs': ('Xe135', 'Sm149', 'U235', 'Pu239'),
+                 'adaptive_nuc_floor': 0.05,
+                 'rc_cache': None,
+                 }
+    "A default run control for all the parameters one may desire."
+
+    rcdocs = {
+        'formats': 'The output formats to write out.',
+        'is_thermal': ('Whether the reactor is a thermal system (True) or a '
+                       'fast one (False)'),
+        'outdirs': ('Names of output files to write out. Must correspond '
+                    'with formats.'),
+        'flux': 'in units of [n/cm2/s].',
+        'adaptive_particles': ('Size the number of particles per cycle of each '
+                               'state from the flux tally errors of a short '
+                               'pilot run, instead of using k_particles.'),
+        'target_rel_err': ('Flux-weighted mean relative error of the flux '
+                           'tallies that adaptive runs aim for.'),
+        'pilot_particles': 'Number of particles per cycle in the pilot run.',
+        'min_particles': 'Lower bound on the adaptive particles per cycle.',
+        'max_particles': 'Upper bound on the adaptive particles per cycle.',
+        'incremental_writes': ('Append only the newest timestep to the output '
+                               'libraries after each step, and compact them '
+                               'at the end of each run, instead of rewriting '
+                               'them after every step.'),
+        'binary_complevel': ('Compression level (0-9) of the hdf5 output '
+                             'format.'),
+        'cyclus_template': ('Cyclus input file (JSON) that the reactors of the '
+                            'cyclus output format are added to. If None, a '
+                            'minimal simulation is generated.'),
+        'cyclus_reactor': ('ReactorFacility parameters that override the '
+                           'defaults of the cyclus output format.'),
+        'cyclus_batch': ('Put the reactors of all of the runs into one Cyclus '
+                         'input, rather than writing an input per run.'),
+        'compression': ("Streaming compressor for the brightlite library "
+                        "files: None, 'gzip', or 'zstd'. zstd falls back to "
+                        "gzip if the zstandard package is not installed."),
+        'compression_level': ('Compression level of the brightlite library '
+                              'files. If None, the default of the compressor.'),
+        'sampler': ("How states are drawn from the perturbation parameters: "
+                    "'factorial' for every combination of their values, or "
+                    "'lhs', 'sobol', or 'smolyak' to sample between the "
+                    "smallest and largest value of each parameter."),
+        'n_samples': ("Number of initial conditions that the 'lhs' and 'sobol' "
+                      "samplers draw. Each is run through every burn time."),
+        'sampler_seed': 'Random seed of the samplers.',
+        'smolyak_level': "Level of the 'smolyak' sparse grid.",
+        'superpose_initial_nucs': ('Derive the libraries of the initial_<nuc> '
+                                   'perturbations, or of the '
+                                   'sensitivity_mass_fractions of each '
+                                   'tracked fuel nuclide, by superposing the '
+                                   'tracked nuclide libraries of each run, '
+                                   'rather than simulating them as separate '
+                                   'states.'),
+        'superposition_tolerance': ('Relative error of superposing the fuel '
+                                    'from its tracked nuclides above which a '
+                                    'run is warned about as too nonlinear to '
+                                    'superpose.'),
+        'adaptive_burn': ('Deplete each run in steps sized by how fast k and '
+                          'the adaptive_nucs change, rather than at the '
+                          'burn_times, and interpolate the libraries onto the '
+                          'burn_times.'),
+        'burn_step_tol': ('Relative change of k and of the adaptive_nucs over '
+                          'a burnup step that adaptive steps aim for.'),
+        'min_burn_step': 'Shortest adaptive burnup step [days].',
+        'max_burn_step': ('Longest adaptive burnup step [days]. If None, the '
+                          'longest interval between the burn_times.'),
+        'adaptive_nucs': ('Fuel nuclides whose relative change sizes the '
+                          'adaptive burnup steps. Those that are not tracked '
+                          'are ignored.'),
+        'adaptive_nuc_floor': ('Fraction of the initial fuel mass that the '
+                               'change of an adaptive nuclide is relative to '
+                               'while its mass is smaller, so that nuclides '
+                               'which build up from nothing do not hold every '
+                               'step to a fraction of the elapsed time.'),
+        'rc_cache': ('Directory of snapshots of validated run controls. If '
+                     'given, a run control that has been validated before '
+                     'is loaded from its snapshot instead. If None, the run '
+                     'control is always validated.'),
+        }
+
+    def update_argparser(self, parser):
+        parser.add_argument("-c", "--clean", action="store_true", dest="clean", default=False,
+                            help="Cleans the reactor directory of current files.")
+        parser.add_argument('--formats', dest='formats', help=self.rcdocs['formats'],
+                            nargs='+')
+        parser.add_argument('--outdirs', dest='outdirs', type=list, help=self.rcdocs['outdirs'],
+                            nargs='+')
+        parser.add_argument('--is-thermal', dest='is_thermal', type=bool,
+                            help=self.rcdocs['is_thermal'])
+        parser.add_argument('--adaptive-particles', dest='adaptive_particles',
+                            action='store_true', help=self.rcdocs['adaptive_particles'])
+        parser.add_argument('--target-rel-err', dest='target_rel_err', type=float,
+                            help=self.rcdocs['target_rel_err'])
+        parser.add_argument('--compression', dest='compression',
+                            choices=['gzip', 'zstd'],
+                            help=self.rcdocs['compression'])
+        parser.add_argument('--compression-level', dest='compression_level', type=int,
+                            help=self.rcdocs['compression_level'])
+        parser.add_argument('--sampler', dest='sampler',
+                            choices=['factorial'] + sorted(SAMPLERS),
+                            help=self.rcdocs['sampler'])
+        parser.add_argument('--n-samples', dest='n_samples', type=int,
+                            help=self.rcdocs['n_samples'])
+        parser.add_argument('--adaptive-burn', dest='adaptive_burn',
+                            action='store_true', help=self.rcdocs['adaptive_burn'])
+        parser.add_argument('--burn-step-tol', dest='burn_step_tol', type=float,
+                            help=self.rcdocs['burn_step_tol'])
+        parser.add_argument('--superpose-initial-nucs', dest='superpose_initial_nucs',
+                            action='store_true',
+                            help=self.rcdocs['superpose_initial_nucs'])
+        parser.add_argument('--rc-cache', dest='rc_cache', help=self.rcdocs['rc_cache'])
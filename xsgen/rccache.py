@@ -0,0 +1,189 @@
+"""A cache of validated run controls.
+
+Validating a run control in ``xsgen.pre`` resolves the tracked nuclides, looks
+up their half-lives, and builds the materials, which is slow for generated run
+control files with large compositions and nuclide lists.  When ``rc_cache`` is
+a directory, the parameters that validation sets, and the names of those that
+it deletes, are pickled there, under a key computed from the xsgen version,
+the contents of the run control file and of the nuclide file that
+``track_nucs`` may point to, and the values of all plain parameters of the run
+control before validation.  Later executions with the same key, such as the
+other tasks of an array job, load those parameters instead of validating again.
+
+Snapshots are written under temporary names and then moved into place, so that
+concurrent executions never read a partial snapshot.  A snapshot that cannot be
+read is ignored and rewritten.
+
+Run Control Cache API
+=====================
+"""
+from __future__ import print_function
+import os
+import sys
+import hashlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import numpy as np
+
+from xsgen.version import xsgen_version
+
+if sys.version_info[0] > 2:
+    basestring = str
+
+SNAPSHOT_EXT = '.rc.pkl'
+"""Extension of the run control snapshot files."""
+
+_PLAIN = (basestring, bool, int, float, complex, type(None))
+
+
+def _update_digest(h, value):
+    """Adds a plain value to the hash, returning whether it was plain data:
+    strings, numbers, None, NumPy arrays, and sequences and dicts of these."""
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return False
+        h.update(repr((value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+        return True
+    elif isinstance(value, _PLAIN) or isinstance(value, np.generic):
+        h.update(repr((type(value).__name__, value)).encode())
+        return True
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        h.update('{0}{1}('.format(type(value).__name__, len(items)).encode())
+        return all(_update_digest(h, item) for item in items)
+    elif isinstance(value, dict):
+        h.update('dict{0}('.format(len(value)).encode())
+        for key in sorted(value, key=repr):
+            if not (_update_digest(h, key) and _update_digest(h, value[key])):
+                return False
+        return True
+    return False
+
+
+def _file_digest(h, path):
+    with open(path, 'rb') as f:
+        h.update(f.read())
+
+
+def rc_key(rc):
+    """Computes the key of the snapshot of a run control.
+
+    Parameters
+    ----------
+    rc : xsgen.utils.RunControl
+        The run control, before it is validated.
+
+    Returns
+    -------
+    key : str
+        A hex digest.
+    """
+    h = hashlib.sha1()
+    h.update(xsgen_version.encode())
+    for path in (rc.get('rc'), rc.get('track_nucs')):
+        if isinstance(path, basestring) and os.path.isfile(path):
+            _file_digest(h, path)
+    for key in sorted(rc._dict):
+        sub = hashlib.sha1()
+        if _update_digest(sub, rc._dict[key]):
+            h.update(key.encode())
+            h.update(sub.digest())
+    return h.hexdigest()
+
+
+def snapshot_path(cache_dir, key):
+    """The path of the snapshot with a given key."""
+    return os.path.join(cache_dir, key + SNAPSHOT_EXT)
+
+
+def changed_params(before, rc):
+    """The parameters that were set or replaced since before was copied.
+
+    Parameters
+    ----------
+    before : dict
+        A copy of ``rc._dict``.
+    rc : xsgen.utils.RunControl
+
+    Returns
+    -------
+    params : dict
+    """
+    return dict((key, value) for key, value in rc._dict.items()
+                if key not in before or before[key] is not value)
+
+
+def removed_params(before, rc):
+    """The names of the parameters that were deleted since before was copied.
+
+    Parameters
+    ----------
+    before : dict
+        A copy of ``rc._dict``.
+    rc : xsgen.utils.RunControl
+
+    Returns
+    -------
+    names : list of str
+    """
+    return sorted(key for key in before if key not in rc._dict)
+
+
+def load_snapshot(cache_dir, key):
+    """Loads the validated parameters with a given key.
+
+    Returns
+    -------
+    snapshot : dict or None
+        With the parameters that were set as 'params' and the names of those
+        that were deleted as 'removed', or None if there is no readable
+        snapshot.
+    """
+    path = snapshot_path(cache_dir, key)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(snapshot, dict) or 'params' not in snapshot:
+        return None
+    snapshot.setdefault('removed', [])
+    return snapshot
+
+
+def dump_snapshot(cache_dir, key, params, removed=()):
+    """Writes validated parameters to the snapshot with a given key.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The cache directory, which is made if needed.
+    key : str
+        See ``rc_key()``.
+    params : dict
+        The parameters that were set, which must be picklable.
+    removed : sequence of str, optional
+        The names of the parameters that were deleted.
+
+    Returns
+    -------
+    path : str
+        The path of the snapshot.
+    """
+    data = pickle.dumps({'params': params, 'removed': list(removed)},
+                        pickle.HIGHEST_PROTOCOL)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    path = snapshot_path(cache_dir, key)
+    tmp = path + '.{0}.tmp'.format(os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.rename(tmp, path)
+    return path
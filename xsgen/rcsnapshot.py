@@ -0,0 +1,117 @@
+"""Frozen snapshots of the run control parameters that the physics engine needs.
+
+Looking a parameter up on a ``RunControl`` searches up to three dicts, and
+copying the whole run control to make the context of every OpenMC input
+copies the states, writers, and every other object that has been put on it.
+Once the plugins have been set up, the engine instead takes an
+``RCSnapshot``: a slotted, read-only object with only the plain parameters of
+``ENGINE_PARAMS``.  Sequences are stored as tuples and arrays as read-only
+views, so that the snapshot may be shared by threads, inherited by forked
+worker processes without being copied, and pickled cheaply.
+
+Run Control Snapshot API
+========================
+"""
+from __future__ import print_function
+import sys
+
+import numpy as np
+
+from xsgen.utils import NotSpecified
+
+if sys.version_info[0] > 2:
+    basestring = str
+
+ENGINE_PARAMS = (
+    # flags and sizes
+    'verbose', 'threads', 'is_thermal', 'temperature', 'formats',
+    'incremental_writes', 'plot_group_flux', 'perturbation_params',
+    # nuclides
+    'track_nucs', 'track_nuc_threshold',
+    # transport
+    'k_particles', 'k_cycles', 'k_cycles_skip', 'energy_grid',
+    'openmc_cross_sections', 'group_structure', 'adaptive_particles',
+    'pilot_particles', 'target_rel_err', 'min_particles', 'max_particles',
+    # geometry
+    'fuel_density', 'clad_density', 'cool_density', 'fuel_cell_radius',
+    'void_cell_radius', 'clad_cell_radius', 'unit_cell_pitch',
+    'unit_cell_height', 'lattice', 'lattice_shape',
+    # adaptive burnup
+    'adaptive_burn', 'burn_step_tol', 'min_burn_step', 'max_burn_step',
+    'adaptive_nucs', 'adaptive_nuc_floor',
+    )
+"""The run control parameters that are kept in a snapshot."""
+
+_SCALARS = (basestring, bool, int, float, complex, type(None), np.generic)
+
+
+def _freeze(name, value):
+    """A read-only version of a plain parameter value."""
+    if value is NotSpecified or isinstance(value, _SCALARS):
+        return value
+    elif isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("parameter {0!r} is an object array".format(name))
+        value = value.view()
+        value.flags.writeable = False
+        return value
+    elif isinstance(value, (list, tuple)):
+        return tuple(_freeze(name, v) for v in value)
+    raise TypeError("parameter {0!r} of type {1} may not be put in a run control "
+                    "snapshot".format(name, type(value).__name__))
+
+
+def _restore(items):
+    snapshot = RCSnapshot.__new__(RCSnapshot)
+    for name, value in items:
+        object.__setattr__(snapshot, name, _freeze(name, value))
+    return snapshot
+
+
+class RCSnapshot(object):
+    """A frozen snapshot of the ``ENGINE_PARAMS`` of a run control.
+    Parameters that are not in the run control are left unset, so that looking
+    them up raises an AttributeError as it would on the run control.
+    """
+
+    __slots__ = ENGINE_PARAMS
+
+    def __init__(self, rc):
+        """Parameters
+        ----------
+        rc : xsgen.utils.RunControl
+            The run control, after the plugins have been set up.
+
+        """
+        for name in ENGINE_PARAMS:
+            if name in rc:
+                object.__setattr__(self, name, _freeze(name, getattr(rc, name)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RCSnapshot is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("RCSnapshot is read-only")
+
+    def __contains__(self, name):
+        return name in ENGINE_PARAMS and hasattr(self, name)
+
+    def __reduce__(self):
+        return _restore, (tuple(self.items()),)
+
+    def items(self):
+        """The (name, value) pairs of the parameters that are set."""
+        return [(name, getattr(self, name)) for name in ENGINE_PARAMS
+                if hasattr(self, name)]
+
+    def get(self, name, default=None):
+        """The value of a parameter, or default if it is not set."""
+        return getattr(self, name, default) if name in ENGINE_PARAMS else default
+
+    def as_dict(self):
+        """A new dict of the parameters that are set."""
+        return dict(self.items())
+
+    def __repr__(self):
+        return "RCSnapshot({0})".format(", ".join("{0}={1!r}".format(name, value)
+                                                  for name, value in self.items()))
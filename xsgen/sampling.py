@@ -0,0 +1,165 @@
+"""Design-of-experiments samplers for perturbation sweeps.
+
+The full-factorial sweep over the perturbation parameters grows exponentially
+with the number of parameters that are perturbed.  The samplers here instead
+place a chosen number of points in the box spanned by the smallest and largest
+value of each perturbation parameter:
+
+* ``'lhs'``: a Latin hypercube, which stratifies every parameter,
+* ``'sobol'``: a scrambled Sobol' low-discrepancy sequence (requires SciPy),
+* ``'smolyak'``: a Smolyak sparse grid on nested Clenshaw-Curtis nodes, whose
+  size is set by its level rather than a number of points.
+
+Every sampled point is combined with each of the burn times, so the result is
+a list of the usual ``State`` namedtuples that groups into runs as before.
+
+Sampling API
+============
+"""
+from __future__ import print_function
+from itertools import product
+
+import numpy as np
+
+
+def latin_hypercube(n, d, seed=None):
+    """A Latin hypercube sample in the unit cube.
+
+    Parameters
+    ----------
+    n : int
+        Number of points.
+    d : int
+        Number of dimensions.
+    seed : int or None, optional
+        Random seed.
+
+    Returns
+    -------
+    points : array of shape (n, d)
+    """
+    rng = np.random.RandomState(seed)
+    strata = np.array([rng.permutation(n) for _ in range(d)]).T
+    return (strata + rng.uniform(size=(n, d))) / n
+
+
+def sobol(n, d, seed=None):
+    """The first n points of a scrambled Sobol' sequence in the unit cube.
+
+    Parameters
+    ----------
+    n : int
+        Number of points.  Powers of two have the best balance.
+    d : int
+        Number of dimensions.
+    seed : int or None, optional
+        Random seed of the scrambling.
+
+    Returns
+    -------
+    points : array of shape (n, d)
+    """
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        raise ImportError("SciPy >= 1.7 is required for the sobol sampler.")
+    return qmc.Sobol(d, scramble=True, seed=seed).random(n)
+
+
+def clenshaw_curtis(level):
+    """The nested Clenshaw-Curtis nodes of a level in [0, 1].  Level 1 is the
+    midpoint and level l > 1 has 2**(l - 1) + 1 nodes."""
+    if level == 1:
+        return np.array([0.5])
+    m = 2**(level - 1) + 1
+    return 0.5 * (1.0 - np.cos(np.pi * np.arange(m) / (m - 1)))
+
+
+def smolyak(d, level):
+    """The nodes of a Smolyak sparse grid in the unit cube.
+
+    Parameters
+    ----------
+    d : int
+        Number of dimensions.
+    level : int
+        Level of the grid, at least 1.  Level 1 is the center of the cube,
+        level 2 adds the centers of the faces, and so on.  The number of
+        points grows polynomially with d rather than exponentially.
+
+    Returns
+    -------
+    points : array of shape (number of nodes, d)
+    """
+    if level < 1:
+        raise ValueError("smolyak level must be at least 1, got {0}".format(level))
+    nodes = [clenshaw_curtis(l) for l in range(1, level + 1)]
+    points = set()
+    for index in _levels(d, level - 1):
+        for point in product(*[nodes[i] for i in index]):
+            points.add(tuple(np.round(point, 12)))
+    return np.array(sorted(points)).reshape(-1, d)
+
+
+def _levels(d, extra):
+    """Yields the tuples of d levels above the first, as 0-based node levels,
+    that add up to at most extra.  These are the tensor grids of a Smolyak
+    grid."""
+    if d == 0:
+        yield ()
+        return
+    for i in range(extra + 1):
+        for rest in _levels(d - 1, extra - i):
+            yield (i,) + rest
+
+
+SAMPLERS = {
+    'lhs': lambda n, d, seed, level: latin_hypercube(n, d, seed),
+    'sobol': lambda n, d, seed, level: sobol(n, d, seed),
+    'smolyak': lambda n, d, seed, level: smolyak(d, level),
+    }
+"""Maps sampler names to functions of (n, d, seed, level) that return points
+in the unit cube."""
+
+
+def sample_states(State, data, sampler, n=100, seed=None, level=2):
+    """Samples states over the ranges of the perturbation parameters.
+
+    Parameters
+    ----------
+    State : namedtuple class
+        The state type, whose last field is burn_times.
+    data : list of sequences
+        The values of each field of State.  Each perturbation parameter is
+        sampled between its smallest and largest value; those with a single
+        value are held fixed.
+    sampler : str
+        One of the keys of ``SAMPLERS``.
+    n : int, optional
+        Number of points to sample, for the samplers that take one.
+    seed : int or None, optional
+        Random seed.
+    level : int, optional
+        Level of the smolyak sparse grid.
+
+    Returns
+    -------
+    states : list of States
+        Each sampled point at each burn time, in run-major order.
+    """
+    if sampler not in SAMPLERS:
+        raise ValueError("sampler must be one of {0}, got {1!r}".format(
+                         sorted(SAMPLERS), sampler))
+    if State._fields[-1] != 'burn_times':
+        raise ValueError("burn_times must be the last field of the states")
+    lo = np.array([np.min(d) for d in data[:-1]], dtype='f8')
+    hi = np.array([np.max(d) for d in data[:-1]], dtype='f8')
+    varied = np.nonzero(hi > lo)[0]
+    if len(varied) == 0:
+        unit = np.empty((1, 0))
+    else:
+        unit = SAMPLERS[sampler](n, len(varied), seed, level)
+    points = np.tile(lo, (len(unit), 1))
+    points[:, varied] = lo[varied] + unit * (hi[varied] - lo[varied])
+    return [State(*(list(point) + [bt])) for point in points.tolist()
+            for bt in data[-1]]
@@ -0,0 +1,190 @@
+"""Tools for the reactor states of a perturbation sweep.
+
+A state is a ``State`` namedtuple with a field per perturbation parameter, the
+last of which is ``burn_times``.  States that only differ in their burn time
+belong to the same run: a single depletion calculation from the initial
+conditions through each of the burn times.
+
+The states of a full-factorial sweep are held lazily in a ``StateSpace``,
+which decodes them from their index on demand rather than keeping every
+combination of the perturbation parameters in memory.
+
+States API
+==========
+"""
+from __future__ import print_function
+from collections import OrderedDict
+
+
+def run_key(state):
+    """The initial conditions of a state, i.e. the state without its burn time.
+
+    Parameters
+    ----------
+    state : namedtuple (State)
+
+    Returns
+    -------
+    key : tuple
+    """
+    i = state._fields.index('burn_times')
+    return state[:i] + state[i+1:]
+
+
+def group_runs(states):
+    """Groups states into runs, in one pass.  States are grouped by their
+    initial conditions, see ``run_key()``.
+
+    Parameters
+    ----------
+    states : iterable of namedtuples (State)
+
+    Returns
+    -------
+    runs : list of lists of States
+        The runs, in the order their first state appears in states.  Within a
+        run, the states are sorted by burn time.
+    """
+    runs = OrderedDict()
+    for state in states:
+        key = run_key(state)
+        run = runs.get(key)
+        if run is None:
+            runs[key] = [state]
+        else:
+            run.append(state)
+    return [sorted(run, key=lambda s: s.burn_times) for run in runs.values()]
+
+
+class StateSpace(object):
+    """The full-factorial product of the values of the perturbation parameters,
+    as a lazy sequence of States.
+
+    States are ordered like ``itertools.product``, with the last parameter
+    varying the fastest.  Since ``burn_times`` is the last parameter, the
+    states of a run are contiguous: the space is in run-major order.  A state
+    is decoded from its index as a mixed-radix number, in constant time.
+    """
+
+    def __init__(self, State, data, indices=None):
+        """Parameters
+        ----------
+        State : namedtuple class
+            The state type, whose last field is burn_times.
+        data : list of sequences
+            The values of each field of State.
+        indices : range or None, optional
+            The indices into the full space that this space is made of, for
+            slices of a space.  If None, the full space.
+
+        """
+        if State._fields[-1] != 'burn_times':
+            raise ValueError("burn_times must be the last field of the states")
+        self.State = State
+        self.data = [list(d) for d in data]
+        self.shape = tuple(len(d) for d in self.data)
+        strides = [1] * len(self.shape)
+        for i in range(len(self.shape) - 2, -1, -1):
+            strides[i] = strides[i+1] * self.shape[i+1]
+        self.strides = tuple(strides)
+        size = strides[0] * self.shape[0] if len(self.shape) > 0 else 0
+        self.indices = range(size) if indices is None else indices
+
+    @property
+    def nburn(self):
+        """The number of burn times, i.e. of states per run."""
+        return self.shape[-1]
+
+    @property
+    def nruns(self):
+        """The number of whole or partial runs in this space."""
+        if len(self.indices) == 0:
+            return 0
+        return self.indices[-1] // self.nburn - self.indices[0] // self.nburn + 1
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __repr__(self):
+        return "StateSpace({0}, shape={1}, len={2})".format(
+            self.State.__name__, self.shape, len(self))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return StateSpace(self.State, self.data, self.indices[i])
+        return self.decode(self.indices[i])
+
+    def __iter__(self):
+        for i in self.indices:
+            yield self.decode(i)
+
+    def decode(self, i):
+        """The state at index i of the full space."""
+        values = []
+        for d, n, stride in zip(self.data, self.shape, self.strides):
+            values.append(d[(i // stride) % n])
+        return self.State(*values)
+
+    def index(self, state):
+        """The index of a state in the full space.
+
+        Raises
+        ------
+        ValueError
+            If the state is not in the space.
+        """
+        i = sum(d.index(v) * stride for d, v, stride in
+                zip(self.data, state, self.strides))
+        if i not in self.indices:
+            raise ValueError("{0} is not in this slice of the space".format(state))
+        return i
+
+    def runs(self):
+        """Yields the runs of the space, in order, as lists of States sorted by
+        burn time.  The runs at the edges of a slice may be partial."""
+        run = []
+        last = None
+        for i in self.indices:
+            r = i // self.nburn
+            if r != last and len(run) > 0:
+                yield sorted(run, key=lambda s: s.burn_times)
+                run = []
+            last = r
+            run.append(self.decode(i))
+        if len(run) > 0:
+            yield sorted(run, key=lambda s: s.burn_times)
+
+    def shard(self, k, n):
+        """The kth of n shards of the space, each with a contiguous block of
+        whole runs.  Runs are spread as evenly as possible over the shards.
+
+        Parameters
+        ----------
+        k : int
+            The shard, 0 <= k < n.
+        n : int
+            The number of shards.
+
+        Returns
+        -------
+        shard : StateSpace
+        """
+        if not 0 <= k < n:
+            raise ValueError("shard {0} is not in [0, {1})".format(k, n))
+        indices = self.indices
+        if len(indices) == 0:
+            return self[0:0]
+        if indices.step < 0:
+            raise ValueError("reversed state spaces may not be sharded")
+        first = indices[0] // self.nburn
+        nruns = self.nruns
+        start = self._position((first + k * nruns // n) * self.nburn)
+        stop = self._position((first + (k + 1) * nruns // n) * self.nburn)
+        return self[start:stop]
+
+    def _position(self, i):
+        """The position in this space of the first state whose index into the
+        full space is at least i."""
+        indices = self.indices
+        pos = -(-(i - indices.start) // indices.step)
+        return min(max(pos, 0), len(indices))
@@ -0,0 +1,162 @@
+"""Libraries of perturbed initial fuel compositions by linear superposition.
+
+At a fixed neutron spectrum, depletion is linear in the initial composition.
+The library of each tracked nuclide is the depletion of 1 kg of that nuclide
+alone, in the spectrum of the run, so the libraries of a run are a basis for
+small perturbations of the fuel.  A fuel in which a mass fraction ``m_n`` of
+each perturbed nuclide ``n`` replaces the base fuel has the library::
+
+    (1 - sum(m_n)) * fuel + sum(m_n * lib_n)
+
+for the NEUT_PROD, NEUT_DEST, and BUd rows, the tracked nuclide masses, and the
+transmutation matrix.  TIME and phi_tot are those of the base fuel, since the
+spectrum is held fixed.
+
+How well the basis describes a run is checked by superposing the base fuel
+from its own tracked nuclides and comparing that to the simulated fuel
+library, see ``linearity_error()``.
+
+Superposition API
+=================
+"""
+from __future__ import print_function
+from itertools import product
+
+import numpy as np
+
+from xsgen.composition import Composition
+
+LINEAR_ROWS = ("NEUT_PROD", "NEUT_DEST", "BUd")
+
+
+def perturbations(initial, deltam=None, nucs=()):
+    """The perturbations to superpose.
+
+    Parameters
+    ----------
+    initial : dict
+        Maps nuclide ids to the sequences of mass fractions that they are
+        perturbed by, from the ``initial_<nuc>`` run control parameters.  All
+        combinations of the values are superposed.
+    deltam : sequence of floats or None, optional
+        The sensitivity mass fractions.  If there are no initial perturbations,
+        each nuclide in nucs is perturbed by each of these, one at a time.
+    nucs : sequence of ints, optional
+        The nuclides of the one-at-a-time sensitivity perturbations.
+
+    Returns
+    -------
+    perturbations : list of dicts
+        Maps nuclide ids to mass fractions.
+    """
+    if len(initial) > 0:
+        keys = sorted(initial)
+        return [dict(zip(keys, p)) for p in product(*[initial[k] for k in keys])]
+    if deltam is None:
+        return []
+    return [{nuc: float(dm)} for nuc in nucs for dm in deltam]
+
+
+def superpose(libs, perturbation, index=None):
+    """The libraries of a run with a perturbed initial fuel.
+
+    Parameters
+    ----------
+    libs : dict
+        The reactor libraries of a run, gleaned from buk.
+    perturbation : dict
+        Maps the perturbed nuclide ids, which must be tracked, to the mass
+        fractions of the fuel that they replace.
+    index : int or None, optional
+        The index of the perturbation, which is kept as 'superposition' so
+        that writers can tell the libraries apart from those of the run.
+
+    Returns
+    -------
+    libs : dict
+        A shallow copy of libs whose 'fuel' library is that of the perturbed
+        fuel.
+    """
+    missing = [nuc for nuc in perturbation if nuc not in libs]
+    if len(missing) > 0:
+        raise ValueError("nuclides {0} must be tracked to be superposed".format(missing))
+    weights = [('fuel', 1.0 - sum(perturbation.values()))]
+    weights.extend(sorted(perturbation.items()))
+    return dict(libs, fuel=_combine(libs, weights), superposition=index)
+
+
+def linearity_error(libs, threshold=0.0):
+    """The relative error of superposing the fuel of a run from the libraries
+    of its tracked nuclides, with the fuel's initial composition as weights.
+
+    Parameters
+    ----------
+    libs : dict
+        The reactor libraries of a run, gleaned from buk.
+    threshold : float, optional
+        Mass fraction below which transmutation matrix entries are ignored.
+
+    Returns
+    -------
+    errors : dict
+        The largest relative error of each of NEUT_PROD, NEUT_DEST, and BUd
+        over the burn times, of the transmutation matrix as 'trans', and the
+        initial mass fraction of the fuel in untracked nuclides as
+        'untracked'.
+    """
+    fuel = libs['fuel']
+    initial = Composition.from_material(fuel['material'][0])
+    weights = [(nuc, frac) for nuc, frac in initial.items() if nuc in libs]
+    errors = {'untracked': max(0.0, 1.0 - sum(w for _, w in weights))}
+    combined = _combine(libs, weights)
+    for row in LINEAR_ROWS:
+        ref = np.asarray(fuel[row][1:], dtype='f8')
+        diff = np.asarray(combined[row][1:], dtype='f8') - ref
+        errors[row] = _relative(diff, ref)
+    worst = 0.0
+    for ref_mat, mat in zip(fuel['material'][1:], combined['material'][1:]):
+        ref = Composition.from_material(ref_mat)
+        comp = Composition.from_material(mat)
+        nucs = np.union1d(ref.nucs, comp.nucs)
+        a = np.array([ref.get(n) for n in nucs.tolist()])
+        b = np.array([comp.get(n) for n in nucs.tolist()])
+        keep = np.maximum(a, b) > threshold
+        worst = max(worst, _relative(b[keep] - a[keep], a[keep]))
+    errors['trans'] = worst
+    return errors
+
+
+def _relative(diff, ref):
+    scale = np.max(np.abs(ref)) if len(ref) > 0 else 0.0
+    if scale == 0.0:
+        return 0.0
+    return float(np.max(np.abs(diff)) / scale)
+
+
+def _combine(libs, weights):
+    """Linearly combines libraries with (key, weight) pairs."""
+    fuel = libs['fuel']
+    nsteps = len(fuel['TIME'])
+    combined = {"TIME": list(fuel["TIME"]), "phi_tot": list(fuel["phi_tot"])}
+    for row in LINEAR_ROWS:
+        values = np.zeros(nsteps)
+        for key, w in weights:
+            values += w * np.asarray(libs[key][row][:nsteps], dtype='f8')
+        combined[row] = values.tolist()
+    combined["tracked_nucs"] = {}
+    for name in fuel["tracked_nucs"]:
+        values = np.zeros(nsteps)
+        for key, w in weights:
+            values += w * np.asarray(libs[key]["tracked_nucs"][name][:nsteps], dtype='f8')
+        combined["tracked_nucs"][name] = values.tolist()
+    materials = []
+    for i in range(nsteps):
+        comps = [(w, Composition.from_material(libs[key]["material"][i]))
+                 for key, w in weights]
+        nucs = np.unique(np.concatenate([c.nucs for _, c in comps]))
+        fracs = np.zeros(len(nucs))
+        for w, c in comps:
+            fracs[np.searchsorted(nucs, c.nucs)] += w * c.fracs
+        materials.append(Composition(nucs, fracs, sort=False).to_material(1000))
+    combined["material"] = materials
+    return combined
@@ -0,0 +1,348 @@
+"""Plugin that serves the libraries of states that were not simulated by
+interpolating between the libraries of the states that were.
+
+Most of the points of a perturbation sweep lie between a few anchor states.
+With this plugin, only the anchor states are handed to :mod:`xsgen.buk`; the
+rest are interpolated afterwards.  For a full-factorial sweep, the anchors are
+every ``surrogate_stride``-th value of each perturbation parameter, along
+with its last value.  For sampled sweeps (see :mod:`xsgen.sampling`) every
+sampled state is an anchor and the surrogate serves states in between.
+
+Each library (``fuel`` and every tracked nuclide) is fit separately and only
+when it is first asked for.  The TIME, phi_tot, NEUT_PROD, NEUT_DEST, and BUd
+rows and the transmutation matrix are interpolated at every burn time, either
+multilinearly over the grid of anchors (``'linear'``, full-factorial sweeps
+only) or with a cubic radial basis function with a linear tail (``'rbf'``).
+
+The surrogate requires the ``brightlite`` output format, whose libraries it
+reads back.  It is not one of the default plugins; add it after them::
+
+    from xsgen.utils import DEFAULT_PLUGINS
+    plugins = list(DEFAULT_PLUGINS) + ['xsgen.surrogate']
+
+Provides the following command-line arguments:
+  - ``--surrogate-stride``: Simulate every this many values of each perturbation parameter
+  - ``--surrogate-method``: Interpolation method of the surrogate
+
+Surrogate Plugin API
+====================
+"""
+from __future__ import print_function
+import os
+import json
+from itertools import product
+
+import numpy as np
+
+from xsgen.surrogate_meta import XSGenPluginMeta, SURROGATE_METHODS
+from xsgen.states import StateSpace, run_key
+from xsgen.brightlite import BrightliteReader, Library, ROWNAMES
+
+
+def anchor_values(values, stride):
+    """Every stride-th value, along with the last one.
+
+    Parameters
+    ----------
+    values : sequence
+        The values of a perturbation parameter.
+    stride : int
+
+    Returns
+    -------
+    anchors : list
+    """
+    values = list(values)
+    anchors = values[::stride]
+    if anchors[-1] != values[-1]:
+        anchors.append(values[-1])
+    return anchors
+
+
+def anchor_states(states, stride):
+    """The states that are simulated when the surrogate serves the rest.
+
+    Parameters
+    ----------
+    states : StateSpace or sequence of states
+        All of the states of the sweep.
+    stride : int
+        See ``anchor_values()``.
+
+    Returns
+    -------
+    anchors : StateSpace or sequence of states
+        The space of the anchor values of a full-factorial sweep, or the
+        states themselves if they were sampled.
+    """
+    if not isinstance(states, StateSpace):
+        return states
+    data = [anchor_values(d, stride) for d in states.data[:-1]]
+    return StateSpace(states.State, data + [states.data[-1]])
+
+
+class Multilinear(object):
+    """Multilinear interpolation over a tensor grid."""
+
+    def __init__(self, axes, values):
+        """Parameters
+        ----------
+        axes : list of 1D arrays
+            The grid points along each dimension.
+        values : array of shape (len(axes[0]), ..., len(axes[-1]), q)
+            The q quantities at each grid point.
+
+        """
+        values = np.asarray(values, dtype='f8')
+        self.axes = []
+        for k, a in enumerate(axes):
+            a = np.asarray(a, dtype='f8')
+            order = np.argsort(a)
+            self.axes.append(a[order])
+            values = np.take(values, order, axis=k)
+        self.values = values
+
+    def __call__(self, x):
+        """The quantities at point x."""
+        corners = []
+        for a, xi in zip(self.axes, x):
+            if len(a) == 1:
+                corners.append(((0, 1.0),))
+                continue
+            i = min(max(np.searchsorted(a, xi) - 1, 0), len(a) - 2)
+            t = (xi - a[i]) / (a[i+1] - a[i])
+            corners.append(((i, 1.0 - t), (i + 1, t)))
+        result = 0.0
+        for corner in product(*corners):
+            weight = np.prod([w for _, w in corner])
+            if weight != 0.0:
+                result = result + weight * self.values[tuple(i for i, _ in corner)]
+        return result
+
+    def loo_errors(self):
+        """Leave-one-out errors.  Each interior grid line of each dimension is
+        left out in turn and predicted from its neighboring lines.
+
+        Returns
+        -------
+        errors : array of shape (number of predictions, q)
+        """
+        errors = []
+        for k, a in enumerate(self.axes):
+            v = np.moveaxis(self.values, k, 0)
+            for j in range(1, len(a) - 1):
+                t = (a[j] - a[j-1]) / (a[j+1] - a[j-1])
+                pred = (1.0 - t) * v[j-1] + t * v[j+1]
+                errors.append((pred - v[j]).reshape(-1, v.shape[-1]))
+        q = self.values.shape[-1]
+        return np.concatenate(errors) if errors else np.empty((0, q))
+
+
+class RBF(object):
+    """Cubic radial basis function interpolation with a linear polynomial tail,
+    on scattered points."""
+
+    def __init__(self, points, values):
+        """Parameters
+        ----------
+        points : array of shape (n, d)
+            The anchor points.  These are scaled to the unit cube internally.
+        values : array of shape (n, q)
+            The q quantities at each point.
+
+        """
+        points = np.asarray(points, dtype='f8')
+        self.lo = points.min(axis=0)
+        span = points.max(axis=0) - self.lo
+        self.span = np.where(span > 0, span, 1.0)
+        self.points = (points - self.lo) / self.span
+        n, d = self.points.shape
+        r = np.linalg.norm(self.points[:, None] - self.points[None], axis=-1)
+        P = np.hstack([np.ones((n, 1)), self.points])
+        A = np.zeros((n + d + 1, n + d + 1))
+        A[:n, :n] = r**3
+        A[:n, n:] = P
+        A[n:, :n] = P.T
+        self.values = values = np.asarray(values, dtype='f8')
+        rhs = np.zeros((n + d + 1, values.shape[1]))
+        rhs[:n] = values
+        self.Ainv = np.linalg.pinv(A)
+        self.coef = self.Ainv.dot(rhs)
+        self.n = n
+
+    def __call__(self, x):
+        """The quantities at point x."""
+        x = (np.asarray(x, dtype='f8') - self.lo) / self.span
+        r = np.linalg.norm(self.points - x, axis=-1)
+        basis = np.concatenate([r**3, [1.0], x])
+        return basis.dot(self.coef)
+
+    def loo_errors(self):
+        """Leave-one-out errors, from Rippa's closed form.
+
+        Returns
+        -------
+        errors : array of shape (n, q)
+        """
+        diag = np.diag(self.Ainv)[:self.n]
+        return -self.coef[:self.n] / diag[:, None]
+
+
+class Surrogate(object):
+    """Interpolated libraries over the perturbation parameters."""
+
+    def __init__(self, anchors, method='linear', space=None):
+        """Parameters
+        ----------
+        anchors : list of (State, str) tuples
+            The initial state of each simulated run and its brightlite
+            output directory.
+        method : str, optional
+            'linear' or 'rbf'.
+        space : StateSpace or None, optional
+            The space of anchor states, which the 'linear' method needs to
+            lay the anchors out on a grid.
+
+        """
+        if method not in SURROGATE_METHODS:
+            raise ValueError("surrogate method must be one of {0}, got {1!r}".format(
+                             SURROGATE_METHODS, method))
+        if method == 'linear' and space is None:
+            raise ValueError("the linear surrogate needs a full-factorial sweep")
+        self.method = method
+        self.space = space
+        dirs = dict((run_key(state), d) for state, d in anchors)
+        if method == 'linear':
+            keys = [run_key(run[0]) for run in space[::space.nburn].runs()]
+        else:
+            keys = list(dirs)
+        self.keys = keys
+        self.readers = [BrightliteReader(dirs[key], cache_size=1) for key in keys]
+        self.points = np.array(keys, dtype='f8')
+        self._models = {}
+
+    def model(self, lib):
+        """The fit interpolant of a library, with the names of its
+        transmutation matrix rows.  Libraries are fit on first use."""
+        if lib in self._models:
+            return self._models[lib]
+        tables = [reader[lib] for reader in self.readers]
+        names = sorted(set(n for t in tables for n in t.names))
+        index = dict((n, i) for i, n in enumerate(names))
+        nsteps = len(tables[0].rows['TIME'])
+        values = np.zeros((len(tables), len(ROWNAMES) + len(names), nsteps))
+        for a, t in enumerate(tables):
+            values[a, :len(ROWNAMES)] = [t.rows[row][:nsteps] for row in ROWNAMES]
+            rows = [len(ROWNAMES) + index[n] for n in t.names]
+            values[a, rows] = t.masses[:, :nsteps]
+        values = values.reshape(len(tables), -1)
+        if self.method == 'linear':
+            axes = [np.asarray(d, dtype='f8') for d in self.space.data[:-1]]
+            model = Multilinear(axes, values.reshape(self.space.shape[:-1] + (-1,)))
+        else:
+            model = RBF(self.points, values)
+        self._models[lib] = (model, names, nsteps)
+        return self._models[lib]
+
+    def predict(self, state, lib='fuel'):
+        """Interpolates a library to the initial conditions of a state.
+
+        Parameters
+        ----------
+        state : namedtuple (State)
+        lib : str or int, optional
+            'fuel' or a nuclide.
+
+        Returns
+        -------
+        library : xsgen.brightlite.Library
+        """
+        model, names, nsteps = self.model(lib)
+        values = model(np.array(run_key(state), dtype='f8'))
+        values = values.reshape(-1, nsteps)
+        rows = dict(zip(ROWNAMES, values[:len(ROWNAMES)]))
+        return Library(rows, names, values[len(ROWNAMES):])
+
+    def cross_validate(self, lib='fuel'):
+        """Estimates the interpolation error of a library by leave-one-out
+        cross-validation over the anchors.
+
+        Returns
+        -------
+        errors : dict
+            The root-mean-square leave-one-out error of each row, and of the
+            whole transmutation matrix as 'trans', relative to the RMS of the
+            values.
+        """
+        model, names, nsteps = self.model(lib)
+        errors = model.loo_errors().reshape(-1, len(ROWNAMES) + len(names), nsteps)
+        values = model.values.reshape(-1, len(ROWNAMES) + len(names), nsteps)
+        if len(errors) == 0:
+            return {}
+        result = {}
+        groups = [(row, [i]) for i, row in enumerate(ROWNAMES)]
+        groups.append(('trans', list(range(len(ROWNAMES), len(ROWNAMES) + len(names)))))
+        for name, rows in groups:
+            if len(rows) == 0:
+                continue
+            scale = np.sqrt(np.mean(values[:, rows]**2))
+            rms = np.sqrt(np.mean(errors[:, rows]**2))
+            result[name] = float(rms / scale) if scale > 0 else 0.0
+        return result
+
+
+class XSGenPlugin(XSGenPluginMeta):
+    """The plugin class, inheriting from the light
+    :class:`xsgen.surrogate_meta.XSGenPluginMeta`."""
+
+    def setup(self, rc):
+        """Replaces the states to simulate with the anchor states.
+
+        Parameters
+        ----------
+        rc : xsgen.utils.RunControl
+            The run control that has been read in.
+
+        Returns
+        -------
+        None
+        """
+        if 'brightlite' not in rc.formats:
+            raise ValueError("the surrogate needs the brightlite output format")
+        rc.surrogate_states = rc.states
+        if isinstance(rc.states, StateSpace):
+            rc.states = anchor_states(rc.states, rc.surrogate_stride)
+            rc.nstates = len(rc.states)
+        elif rc.surrogate_method == 'linear':
+            raise ValueError("the linear surrogate needs a full-factorial sweep, "
+                             "use surrogate_method = 'rbf' for sampled states")
+
+    def execute(self, rc):
+        """Builds the surrogate over the simulated states, as rc.surrogate, and
+        writes its cross-validation errors for the fuel.
+
+        Parameters
+        ----------
+        rc : xsgen.utils.RunControl
+            The run control that has been read in.
+
+        Returns
+        -------
+        None
+        """
+        anchors = [(state, outputs['brightlite']) for state, outputs in rc.run_outputs]
+        space = rc.states if isinstance(rc.states, StateSpace) else None
+        rc.surrogate = Surrogate(anchors, method=rc.surrogate_method, space=space)
+        errors = rc.surrogate.cross_validate('fuel')
+        ninterp = len(rc.surrogate_states) - len(rc.states)
+        path = os.path.join(os.path.dirname(anchors[0][1]), "surrogate.json")
+        with open(path, "w") as f:
+            json.dump({'method': rc.surrogate_method, 'simulated': len(rc.states),
+                       'interpolated': ninterp, 'cv_rel_rms': {'fuel': errors}},
+                      f, indent=1, sort_keys=True)
+        if rc.verbose:
+            print("surrogate: {0} states simulated, {1} interpolated".format(
+                  len(rc.states), ninterp))
+            for name, err in sorted(errors.items()):
+                print("  fuel {0} leave-one-out relative RMS error: {1:.3g}".format(
+                      name, err))
@@ -0,0 +1,40 @@
+"""Run control defaults and command-line interface of :mod:`xsgen.surrogate`.
+
+Surrogate Plugin Metadata API
+=============================
+"""
+from xsgen.plugins import Plugin
+
+SURROGATE_METHODS = ('linear', 'rbf')
+
+
+class XSGenPluginMeta(Plugin):
+    """The metadata of the surrogate plugin."""
+
+    requires = ('xsgen.buk',)
+    """The surrogate plugin requires :mod:`xsgen.buk`."""
+
+    parallel_safe = True
+    """The surrogate only adds ``rc.surrogate`` and writes its own file."""
+
+    defaultrc = {'surrogate_stride': 2,
+                 'surrogate_method': 'linear',
+                 }
+
+    rcdocs = {
+        'surrogate_stride': ('Simulate every this many values of each '
+                             'perturbation parameter, and its last value, and '
+                             'interpolate the states in between. Only for '
+                             'full-factorial sweeps; 1 simulates every state.'),
+        'surrogate_method': ("Interpolation method of the surrogate: 'linear' "
+                             "for multilinear interpolation over the grid of "
+                             "simulated states, or 'rbf' for radial basis "
+                             "functions."),
+        }
+
+    def update_argparser(self, parser):
+        parser.add_argument('--surrogate-stride', dest='surrogate_stride', type=int,
+                            help=self.rcdocs['surrogate_stride'])
+        parser.add_argument('--surrogate-method', dest='surrogate_method',
+                            choices=SURROGATE_METHODS,
+                            help=self.rcdocs['surrogate_method'])
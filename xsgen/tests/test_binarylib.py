@@ -0,0 +1,68 @@
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyne')
+
+from pyne.material import Material
+
+from xsgen.utils import RunControl
+from xsgen.binarylib import NPZWriter, group_name
+
+State = namedtuple('State', ['fuel_density', 'burn_times'])
+
+
+def _libs(scale=1.0):
+    fuel = {'TIME': [0.0, 100.0], 'phi_tot': [0.0, 1e14],
+            'NEUT_PROD': [scale, 0.9 * scale], 'NEUT_DEST': [1.0, 1.1],
+            'BUd': [0.0, 10.0 * scale],
+            'material': [Material({922350000: 0.04, 922380000: 0.96}, 1000.0),
+                         Material({922350000: 0.03, 922380000: 0.97}, 1000.0)],
+            'tracked_nucs': {}}
+    return {'fuel': fuel, 'state': State(10.4, 0.0)}
+
+
+def _rc():
+    return RunControl(formats=('npz',), outdirs=['npz'], track_nuc_threshold=1e-8)
+
+
+def test_group_name():
+    assert group_name(3, {}) == 'state3'
+    assert group_name(3, {'superposition': None}) == 'state3'
+    assert group_name(3, {'superposition': 1}) == 'state3_p1'
+
+
+def test_superposed_group(tmpdir):
+    writer = NPZWriter(_rc())
+    dirname = str(tmpdir.join('npz0'))
+    writer.write(_libs(), dirname)
+    writer.write(dict(_libs(2.0), superposition=0), dirname + '_p0')
+    library = tmpdir.join('npz')
+    assert sorted(p.basename for p in library.listdir()) == [
+        'index.npz', 'state0.npz', 'state0_p0.npz']
+    with np.load(str(library.join('index.npz'))) as npz:
+        assert len(npz['params']) == 1
+    with np.load(str(library.join('state0.npz'))) as npz:
+        assert np.allclose(npz['fuel/NEUT_PROD'], [1.0, 0.9])
+    with np.load(str(library.join('state0_p0.npz'))) as npz:
+        assert np.allclose(npz['fuel/NEUT_PROD'], [2.0, 1.8])
+
+
+def test_npz_runs(tmpdir):
+    writer = NPZWriter(_rc())
+    for n, density in enumerate([10.4, 10.6]):
+        libs = dict(_libs(), state=State(density, 0.0))
+        writer.write(libs, str(tmpdir.join('npz{0}'.format(n))))
+    # a new writer picks up the index that is already there
+    writer = NPZWriter(_rc())
+    writer.write(dict(_libs(3.0), state=State(10.6, 0.0)), str(tmpdir.join('npz1')))
+    library = tmpdir.join('npz')
+    with np.load(str(library.join('index.npz'))) as npz:
+        assert np.allclose(npz['params'], [[10.4], [10.6]])
+    with np.load(str(library.join('state1.npz'))) as npz:
+        assert np.allclose(npz['fuel/NEUT_PROD'], [3.0, 2.7])
+    # stored, not deflated
+    with zipfile.ZipFile(str(library.join('state0.npz'))) as z:
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in z.infolist())
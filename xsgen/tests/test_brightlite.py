@@ -0,0 +1,308 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyne')
+
+from pyne import nucname
+from pyne.material import Material
+
+from xsgen.utils import RunControl
+from xsgen.brightlite import BrightliteWriter, BrightliteReader, ROWNAMES, \
+    COMPRESSION_EXTS, zstandard, open_text, find_table, _table_name, \
+    read_table, trans_matrix, _read_journal
+
+U235, U238, XE135 = 922350000, 922380000, 541350000
+
+COMPS = [{U235: 0.04, U238: 0.96},
+         {U235: 0.035, U238: 0.965, XE135: 1e-12},
+         {U235: 0.03, U238: 0.969, XE135: 1e-3},
+         {U235: 0.025, U238: 0.974, XE135: 1e-3}]
+
+
+def _matlib(nsteps, scale=1.0):
+    return {'TIME': [100.0 * i for i in range(nsteps)],
+            'phi_tot': [0.0] + [1e14] * (nsteps - 1),
+            'NEUT_PROD': [scale * (1.0 - 0.1 * i) for i in range(nsteps)],
+            'NEUT_DEST': [1.0 + 0.1 * i for i in range(nsteps)],
+            'BUd': [10.0 * i for i in range(nsteps)],
+            'material': [Material(comp, 1000.0) for comp in COMPS[:nsteps]],
+            'tracked_nucs': [U235, U238, XE135]}
+
+
+def _libs(nsteps):
+    return {'fuel': _matlib(nsteps), U235: _matlib(nsteps, 2.0),
+            'tape9': 'TAPE9\n'}
+
+
+def _rc():
+    return RunControl(track_nuc_threshold=1e-8, enrichment=0.04,
+                      clad_density=6.5, clad_cell_radius=0.47,
+                      void_cell_radius=0.42, fuel_density=10.4,
+                      fuel_cell_radius=0.41,
+                      clad_material=Material({400900000: 1.0}, 1.0))
+
+
+def _tables(dirname):
+    return {fname: read_table(os.path.join(dirname, fname + '.txt'))
+            for fname in ('fuel', str(nucname.zzaaam(U235)))}
+
+
+def _assert_tables_equal(tables, expected):
+    for fname, (rows, names, masses) in expected.items():
+        assert tables[fname][0] == rows
+        assert tables[fname][1] == names
+        assert np.allclose(tables[fname][2], masses)
+
+
+def test_append_compact_update(tmpdir):
+    full = str(tmpdir.join('full'))
+    BrightliteWriter(_rc()).write(_libs(4), full)
+    expected = _tables(full)
+
+    # the first run journals two timesteps and compacts them
+    dirname = str(tmpdir.join('journaled'))
+    writer = BrightliteWriter(_rc())
+    writer.append(_libs(1), dirname)
+    writer.append(_libs(2), dirname)
+    assert writer.has_journals(dirname)
+    writer.compact(_libs(2), dirname)
+    assert not writer.has_journals(dirname)
+    rows, names, masses = read_table(os.path.join(dirname, 'fuel.txt'))
+    assert rows[0] == ('TIME', ['0.0', '100.0'])
+    assert masses.shape == (2, 2)
+
+    # the second run picks up the compacted library and adds the rest
+    writer = BrightliteWriter(_rc())
+    writer.append(_libs(4), dirname)
+    columns = _read_journal(os.path.join(dirname, 'fuel.journal'))
+    assert len(columns) == 2
+    rows, names, masses = writer.update(dirname, 'fuel', columns)
+    assert rows[0] == ('TIME', ['0.0', '100.0', '200.0', '300.0'])
+    assert names == sorted(str(nucname.name(nuc)) for nuc in (U235, U238, XE135))
+    # Xe-135 is below the threshold at the second timestep
+    xe = names.index(str(nucname.name(XE135)))
+    assert np.allclose(masses[xe], [0.0, 0.0, 1.0, 1.0])
+    writer.compact(_libs(4), dirname)
+    assert not os.path.isfile(os.path.join(dirname, 'fuel.journal'))
+    _assert_tables_equal(_tables(dirname), expected)
+    assert os.path.isfile(os.path.join(dirname, 'manifest.txt'))
+
+
+def test_uncompacted_journal(tmpdir):
+    full = str(tmpdir.join('full'))
+    BrightliteWriter(_rc()).write(_libs(4), full)
+    expected = _tables(full)
+
+    # a run that stopped before compacting leaves only journals
+    dirname = str(tmpdir.join('journaled'))
+    writer = BrightliteWriter(_rc())
+    for n in range(1, 5):
+        writer.append(_libs(n), dirname)
+    assert not os.path.isfile(os.path.join(dirname, 'fuel.txt'))
+
+    writer = BrightliteWriter(_rc())
+    ncols, started = writer._read_journal_state(dirname, 'fuel')
+    assert ncols == 4
+    assert started == set(expected['fuel'][1])
+    # appending again does not duplicate the timesteps on disk
+    writer.append(_libs(4), dirname)
+    assert len(_read_journal(os.path.join(dirname, 'fuel.journal'))) == 4
+    writer.write(_libs(4), dirname)
+    assert not writer.has_journals(dirname)
+    _assert_tables_equal(_tables(dirname), expected)
+
+
+def _sparse_trans_matrix(materials, threshold):
+    """The transmutation matrix as it was built before trans_matrix(): a dict
+    of the formatted rows, which a nuclide joins once it exceeds threshold."""
+    trans = {}
+    for i, mat in enumerate(materials):
+        for nuc, frac in mat.comp.items():
+            nuc_name = str(nucname.name(nuc))
+            if nuc_name in trans:
+                trans[nuc_name].append(frac * 1000)
+            elif frac > threshold:
+                trans[nuc_name] = [0.0] * i + [frac * 1000]
+    return {n: ["{:.4g}".format(f) for f in trans[n]] for n in trans}
+
+
+def _random_materials(nsteps=6, nnucs=40, seed=42):
+    rng = np.random.RandomState(seed)
+    nucs = [10000 * z + 10 * a for z, a in zip(rng.randint(30, 99, nnucs),
+                                                rng.randint(60, 250, nnucs))]
+    # fractions spanning the threshold, which some nuclides only cross later
+    fracs = 10.0 ** rng.uniform(-14, -1, (nsteps, nnucs))
+    fracs *= np.linspace(0.01, 1.0, nsteps)[:, None] ** rng.uniform(0, 4, nnucs)
+    return [Material(dict(zip(nucs, row)), 1000.0) for row in fracs]
+
+
+def test_trans_matrix_sparse():
+    for materials in ([Material(comp, 1000.0) for comp in COMPS],
+                      _random_materials()):
+        sparse = _sparse_trans_matrix(materials, 1e-8)
+        names, masses = trans_matrix(materials, 1e-8)
+        assert names == sorted(sparse)
+        assert masses.shape == (len(names), len(materials))
+        for name, row in zip(names, masses):
+            assert ["{:.4g}".format(f) for f in row] == sparse[name]
+
+
+def test_read_table_sparse(tmpdir):
+    materials = _random_materials()
+    matlib = dict((row, [float(i) for i in range(len(materials))])
+                  for row in ROWNAMES)
+    matlib.update(material=materials, tracked_nucs=[U235])
+    dirname = str(tmpdir)
+    BrightliteWriter(_rc()).write({'fuel': matlib, 'tape9': ''}, dirname)
+    path = os.path.join(dirname, 'fuel.txt')
+
+    # the library file written from the sparse rows, sorted by nuclide
+    sparse = _sparse_trans_matrix(materials, 1e-8)
+    lines = [row + "   " + "   ".join(map(str, matlib[row])) for row in ROWNAMES]
+    lines.extend(sorted(n + "   " + "   ".join(sparse[n]) for n in sparse))
+    with open(path) as f:
+        assert f.read() == "\n".join(lines) + "\n"
+
+    rows, names, masses = read_table(path)
+    assert rows == [(row, list(map(str, matlib[row]))) for row in ROWNAMES]
+    assert names == sorted(sparse)
+    assert np.array_equal(masses, [list(map(float, sparse[n])) for n in names])
+
+
+def _reader_dir(tmpdir):
+    libs = _libs(4)
+    libs[U238] = _matlib(4, 3.0)
+    dirname = str(tmpdir.join('lib'))
+    BrightliteWriter(_rc()).write(libs, dirname)
+    return dirname
+
+
+def test_reader_index(tmpdir):
+    reader = BrightliteReader(_reader_dir(tmpdir))
+    nucs = sorted([nucname.zzaaam(U235), nucname.zzaaam(U238)])
+    assert reader.nucs == nucs
+    assert len(reader) == 3
+    assert list(reader) == ['fuel'] + nucs
+    assert 'fuel' in reader
+    assert U235 in reader
+    assert nucname.zzaaam(U238) in reader
+    assert XE135 not in reader
+    with pytest.raises(KeyError):
+        reader[XE135]
+    assert reader.params['ENRICHMENT'] == 0.04
+    with pytest.raises(ValueError):
+        BrightliteReader(str(tmpdir.mkdir('empty')))
+
+
+def test_reader_cache(tmpdir):
+    reader = BrightliteReader(_reader_dir(tmpdir), cache_size=2)
+    fuel = reader['fuel']
+    assert reader['fuel'] is fuel
+    assert (reader.hits, reader.misses) == (1, 1)
+    reader[U235]
+    reader['fuel']
+    # U235 is the least recently used, so it makes room for U238
+    reader[U238]
+    assert list(reader._cache) == ['fuel', nucname.zzaaam(U238)]
+    assert (reader.hits, reader.misses) == (2, 3)
+    assert reader['fuel'] is fuel
+    reader[U235]
+    assert reader.misses == 4
+    assert list(reader._cache) == ['fuel', nucname.zzaaam(U235)]
+    reader.clear()
+    assert reader['fuel'] is not fuel
+    assert np.array_equal(reader['fuel'].masses, fuel.masses)
+
+
+def test_reader_interpolate(tmpdir):
+    reader = BrightliteReader(_reader_dir(tmpdir))
+    fuel = reader['fuel']
+    # BUd is 0, 10, 20, and 30 at 0, 100, 200, and 300 days
+    assert np.allclose(reader.burnup(), [0.0, 10.0, 30.0, 60.0])
+    xe = str(nucname.name(XE135))
+    at = reader.interpolate(30.0)
+    assert sorted(at, key=str) == sorted(reader, key=str)
+    assert at['fuel']['TIME'] == 200.0
+    assert at['fuel']['NEUT_PROD'] == fuel.rows['NEUT_PROD'][2]
+    assert at['fuel'][xe] == fuel.masses[fuel.names.index(xe)][2]
+    between = reader.interpolate(45.0, keys=['fuel', U235])
+    assert sorted(between, key=str) == sorted(['fuel', U235], key=str)
+    assert np.isclose(between['fuel']['TIME'], 250.0)
+    lib = reader[U235]
+    for row in ROWNAMES:
+        assert np.isclose(between[U235][row], lib.rows[row][2:].mean())
+    for name, masses in zip(lib.names, lib.masses):
+        assert np.isclose(between[U235][name], masses[2:].mean())
+    # burnups beyond the libraries are clipped to their ends
+    assert reader.interpolate(-5.0)['fuel']['TIME'] == 0.0
+    assert reader.interpolate(100.0)['fuel'] == reader.interpolate(60.0)['fuel']
+    assert reader.interpolate(100.0)['fuel']['TIME'] == 300.0
+
+
+COMPRESSIONS = [None, 'gzip',
+                pytest.param('zstd', marks=pytest.mark.skipif(
+                    zstandard is None, reason='zstandard is not installed'))]
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_open_text(tmpdir, compression):
+    path = str(tmpdir.join('f.txt' + COMPRESSION_EXTS[compression]))
+    text = "TIME   0.0   100.0\n" * 100
+    with open_text(path, "w", 1) as f:
+        f.write(text)
+    with open_text(path) as f:
+        assert f.read() == text
+    if compression is not None:
+        with open(path, 'rb') as f:
+            assert f.read() != text.encode()
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_compressed_tables(tmpdir, compression):
+    plain = str(tmpdir.join('plain'))
+    BrightliteWriter(_rc()).write(_libs(4), plain)
+    dirname = str(tmpdir.join('compressed'))
+    rc = _rc()
+    rc.compression = compression
+    BrightliteWriter(rc).write(_libs(4), dirname)
+    path = find_table(dirname, 'fuel')
+    assert path == os.path.join(dirname, 'fuel.txt' + COMPRESSION_EXTS[compression])
+    expected = read_table(find_table(plain, 'fuel'))
+    rows, names, masses = read_table(path)
+    assert rows == expected[0]
+    assert names == expected[1]
+    assert np.array_equal(masses, expected[2])
+    reader = BrightliteReader(dirname)
+    assert reader.nucs == [nucname.zzaaam(U235)]
+    assert np.array_equal(reader['fuel'].masses, expected[2])
+
+
+def test_find_table(tmpdir):
+    dirname = str(tmpdir)
+    assert find_table(dirname, 'fuel') is None
+    BrightliteWriter(_rc()).write(_libs(2), dirname)
+    assert find_table(dirname, 'fuel') == os.path.join(dirname, 'fuel.txt')
+    # rewriting with another compression replaces the file
+    rc = _rc()
+    rc.compression = 'gzip'
+    BrightliteWriter(rc).write(_libs(2), dirname)
+    assert find_table(dirname, 'fuel') == os.path.join(dirname, 'fuel.txt.gz')
+    assert not os.path.isfile(os.path.join(dirname, 'fuel.txt'))
+    assert _table_name('fuel.txt') == 'fuel'
+    assert _table_name('922350.txt.gz') == '922350'
+    assert _table_name('fuel.txt.zst') == 'fuel'
+    assert _table_name('params.json') is None
+    assert _table_name('fuel.journal') is None
+
+
+def test_zstd_fallback(monkeypatch):
+    pre = pytest.importorskip('xsgen.pre')
+    plugin = pre.XSGenPlugin()
+    monkeypatch.setattr(pre, 'zstandard', None)
+    rc = RunControl(compression='zstd')
+    plugin._ensure_compression(rc)
+    assert rc.compression == 'gzip'
+    with pytest.raises(ValueError):
+        plugin._ensure_compression(RunControl(compression='bz2'))
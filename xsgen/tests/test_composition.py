@@ -0,0 +1,35 @@
+import pickle
+
+import numpy as np
+
+from xsgen.composition import Composition
+
+
+def test_sorted():
+    comp = Composition.from_dict({922380000: 0.9, 80160000: 0.1})
+    assert comp.nucs.tolist() == [80160000, 922380000]
+    assert comp.fracs.tolist() == [0.1, 0.9]
+    assert 80160000 in comp
+    assert 10010000 not in comp
+    assert comp.get(922380000) == 0.9
+    assert comp.get(10010000) == 0.0
+
+
+def test_prune_normalize():
+    comp = Composition([1, 2, 3, 4], [0.5, 1e-7, 0.0, 0.25])
+    pruned = comp.prune(1e-5)
+    assert pruned.nucs.tolist() == [1, 4]
+    assert np.allclose(pruned.normalize().fracs, [2.0 / 3.0, 1.0 / 3.0])
+    assert comp.nonzero().nucs.tolist() == [1, 2, 4]
+
+
+def test_intersect():
+    comp = Composition([5, 1, 9, 3], [0.1, 0.2, 0.3, 0.4])
+    assert comp.intersect(np.array([1, 3, 4], dtype='i8')).nucs.tolist() == [1, 3]
+    assert comp.intersect({9, 10}).items() == [(9, 0.3)]
+    assert len(comp.intersect(set())) == 0
+
+
+def test_pickle():
+    comp = Composition([2, 1], [0.25, 0.75])
+    assert pickle.loads(pickle.dumps(comp)).items() == [(1, 0.75), (2, 0.25)]
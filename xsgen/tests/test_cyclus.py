@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+pytest.importorskip('pyne')
+
+from xsgen.utils import RunControl
+from xsgen.cyclus import CyclusWriter
+
+
+def _rc(**kwargs):
+    rc = RunControl(formats=('brightlite', 'cyclus'), outdirs=['lwr', 'cyc'],
+                    cyclus_template=None, cyclus_batch=True, cyclus_reactor={},
+                    batches=None, reactor='lwr')
+    rc._update(kwargs.items())
+    return rc
+
+
+def _libs(*bud):
+    return {'fuel': {'BUd': list(bud)}}
+
+
+def _facilities(path):
+    with open(path) as f:
+        sim = json.load(f)['simulation']
+    entries = sim['region']['institution']['initialfacilitylist']['entry']
+    return sim['facility'], [e['prototype'] for e in entries]
+
+
+def test_batch(tmpdir):
+    writer = CyclusWriter(_rc())
+    writer.write(_libs(0.0, 10.0), str(tmpdir.join('cyc0')))
+    writer.write(_libs(0.0, 12.0), str(tmpdir.join('cyc1')))
+    # a run that is written again, e.g. as it grows, replaces its facility
+    writer.write(_libs(0.0, 10.0, 20.0), str(tmpdir.join('cyc0')))
+    assert tmpdir.listdir() == []
+    writer.close()
+    assert [p.basename for p in tmpdir.listdir()] == ['cyc.json']
+    facilities, deployed = _facilities(str(tmpdir.join('cyc.json')))
+    assert [fac['name'] for fac in facilities] == ['lwr_lwr0', 'lwr_lwr1']
+    assert deployed == ['lwr_lwr0', 'lwr_lwr1']
+    configs = [fac['config']['ReactorFacility'] for fac in facilities]
+    assert configs[0]['libraries'] == {'val': 'lwr0'}
+    assert configs[0]['interpol_pairs'] == {'key': 'BURNUP', 'val': 30.0}
+    assert configs[1]['interpol_pairs'] == {'key': 'BURNUP', 'val': 12.0}
+
+
+def test_close_without_runs(tmpdir):
+    writer = CyclusWriter(_rc())
+    writer.close()
+    assert tmpdir.listdir() == []
+
+
+def test_unbatched(tmpdir):
+    writer = CyclusWriter(_rc(cyclus_batch=False, batches=4))
+    writer.write(_libs(0.0, 10.0), str(tmpdir.join('cyc0')))
+    writer.write(_libs(0.0, 12.0), str(tmpdir.join('cyc1')))
+    writer.close()
+    assert sorted(p.basename for p in tmpdir.listdir()) == ['cyc0.json', 'cyc1.json']
+    for n, burnup in enumerate([10.0, 12.0]):
+        facilities, deployed = _facilities(str(tmpdir.join('cyc{0}.json'.format(n))))
+        assert deployed == ['lwr_lwr{0}'.format(n)]
+        config = facilities[0]['config']['ReactorFacility']
+        assert config['interpol_pairs'] == {'key': 'BURNUP', 'val': burnup}
+        assert config['batches'] == 4
@@ -0,0 +1,59 @@
+import time
+import threading
+
+from xsgen.iopool import IOPool, snapshot
+from xsgen.tracing import Tracer
+
+
+def test_lanes_keep_order():
+    pool = IOPool(threads=2, maxsize=2)
+    seen = {'a': [], 'b': []}
+    for i in range(10):
+        for key in seen:
+            pool.submit(key, seen[key].append, i)
+    pool.close()
+    assert seen == {'a': list(range(10)), 'b': list(range(10))}
+    assert pool.latencies['a'][0] == 10
+
+
+def test_lanes_run_concurrently():
+    pool = IOPool(threads=1)
+    started = threading.Event()
+    pool.submit('slow', started.wait, 5.0)
+    pool.submit('fast', started.set)
+    pool.flush()
+    assert started.is_set()
+    pool.close()
+
+
+def test_errors_are_reraised():
+    def fail():
+        raise IOError("disk full")
+    for threads in (0, 2):
+        pool = IOPool(threads=threads)
+        try:
+            pool.submit('x', fail)
+            pool.flush()
+        except IOError as e:
+            assert str(e) == "disk full"
+        else:
+            assert False, "expected an IOError"
+        pool.close()
+
+
+def test_map_and_tracer():
+    tracer = Tracer()
+    pool = IOPool(threads=3, tracer=tracer)
+    assert pool.map(lambda x: x * 2, range(5)) == [0, 2, 4, 6, 8]
+    pool.submit('npz', time.sleep, 0.0, run=1)
+    pool.close()
+    assert tracer.events[0]['tags'] == {'format': 'npz', 'run': 1}
+
+
+def test_snapshot():
+    libs = {'fuel': {'TIME': [0, 1], 'tracked_nucs': {'U235': [1.0]}}, 'xs': []}
+    snap = snapshot(libs)
+    libs['fuel']['TIME'].append(2)
+    libs['fuel']['tracked_nucs']['U235'].append(0.5)
+    assert snap['fuel']['TIME'] == [0, 1]
+    assert snap['fuel']['tracked_nucs']['U235'] == [1.0]
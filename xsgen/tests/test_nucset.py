@@ -0,0 +1,46 @@
+import numpy as np
+
+from xsgen.nucset import parse_tape9_decay, lookup, read_nuc_file, \
+    build_nucset, decay_table
+from xsgen.tape9 import brightlitetape9
+
+NAMES = {'H3': 10030000, 'U235': 922350000, 'Xe135': 541350000,
+         'Zz999': 999990000}
+
+
+def test_table_matches_tape9():
+    parsed = parse_tape9_decay(brightlitetape9)
+    table = decay_table()
+    assert np.array_equal(parsed['nucs'], table['nucs'])
+    assert np.allclose(parsed['half_life'], table['half_life'])
+
+
+def test_lookup():
+    hl = lookup([10030000, 10010000, 999990000])
+    assert np.isclose(hl[0], 3.897e8)
+    assert np.isinf(hl[1])
+    assert np.isnan(hl[2])
+
+
+def test_read_nuc_file(tmpdir):
+    plain = tmpdir.join('plain.txt')
+    plain.write("U235, Xe135  # fission\n922380\n")
+    assert read_nuc_file(str(plain)) == ['U235', 'Xe135', 922380]
+    js = tmpdir.join('nucs.json')
+    js.write('["U235", "H3"]')
+    assert read_nuc_file(str(js)) == ['U235', 'H3']
+    py = tmpdir.join('nucs.py')
+    py.write("['U235', 'H3',]\n")
+    assert read_nuc_file(str(py)) == ['U235', 'H3']
+
+
+def test_build_nucset(tmpdir):
+    nucs = ['U235', 'Xe135', 'H3', 'Zz999', 'U235']
+    assert build_nucset(nucs, 0.0, NAMES.get) == sorted(set(NAMES.values()))
+    # Xe135 is cut by a one day half-life; the unknown nuclide falls back
+    cut = build_nucset(nucs, 86400.0, NAMES.get, half_life=lambda nuc: 1.0)
+    assert cut == [10030000, 922350000]
+    path = tmpdir.join('nucs.txt')
+    path.write("\n".join(nucs))
+    assert build_nucset(str(path), 86400.0, NAMES.get) == [10030000, 922350000,
+                                                             999990000]
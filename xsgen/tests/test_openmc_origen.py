@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('openmc')
+pytest.importorskip('pyne')
+pytest.importorskip('matplotlib')
+
+from pyne.material import Material
+
+from xsgen.openmc_origen import next_burn_step, interpolate_libs, \
+    _interpolate_material, _rel_change
+
+U235, U238 = 922350000, 922380000
+
+
+def test_next_burn_step():
+    # no change doubles the step, a large one halves it
+    assert next_burn_step(10.0, 0.0, 0.05, 1.0, 100.0) == 20.0
+    assert next_burn_step(10.0, 1.0, 0.05, 1.0, 100.0) == 5.0
+    # in between, the step is scaled towards the tolerance
+    assert np.isclose(next_burn_step(10.0, 0.045, 0.05, 1.0, 100.0), 10.0)
+    # within the bounds
+    assert next_burn_step(80.0, 0.0, 0.05, 1.0, 100.0) == 100.0
+    assert next_burn_step(1.5, 1.0, 0.05, 1.0, 100.0) == 1.0
+
+
+def test_rel_change_floor():
+    assert _rel_change(0.0, 0.0) == 0.0
+    assert _rel_change(40.0, 35.0) == 0.125
+    # a nuclide that builds up from nothing always changes by 100%
+    assert _rel_change(0.0, 0.01) == 1.0
+    # unless its change is measured against the floor
+    assert np.isclose(_rel_change(0.0, 0.01, 50.0), 2e-4)
+    assert np.isclose(_rel_change(40.0, 35.0, 50.0), 0.1)
+    assert _rel_change(960.0, 912.0, 50.0) == 0.05
+
+
+def _matlib(steps, power):
+    steps = np.asarray(steps, dtype='f8')
+    return {'TIME': steps.tolist(),
+            'phi_tot': (1e14 + 1e11 * steps).tolist(),
+            'NEUT_PROD': (2.0 - 0.01 * steps).tolist(),
+            'NEUT_DEST': (1.0 + 0.005 * steps).tolist(),
+            # constant power, so the cumulative burnup is linear
+            'BUd': [0.0] + (power * np.diff(steps)).tolist(),
+            'tracked_nucs': {'U235': (40.0 - 0.2 * steps).tolist()},
+            'material': [Material({U235: 0.04 - 0.0002 * t, U238: 0.96}, 1000.0)
+                         for t in steps]}
+
+
+def test_interpolate_libs():
+    steps = [0.0, 10.0, 30.0, 60.0]
+    libs = {'state': 'state', 'fuel': _matlib(steps, 0.5),
+            U235: _matlib(steps, 2.0), 'k': [1.3, 1.2, 1.1],
+            'xs': ['xs1', 'xs2', 'xs3'], 'particles': [100, 200, 300],
+            'phi_g': {'E_g': 'E_g', 'phi_g': ['g1', 'g2', 'g3']}}
+    times = [0.0, 20.0, 60.0]
+    out = interpolate_libs(libs, times)
+    assert out['state'] == 'state'
+    fuel = out['fuel']
+    assert fuel['TIME'] == times
+    t = np.array(times)
+    assert np.allclose(fuel['phi_tot'], 1e14 + 1e11 * t)
+    assert np.allclose(fuel['NEUT_PROD'], 2.0 - 0.01 * t)
+    assert np.allclose(fuel['NEUT_DEST'], 1.0 + 0.005 * t)
+    assert np.allclose(fuel['tracked_nucs']['U235'], 40.0 - 0.2 * t)
+    # the total burnup is kept and split by the length of each step
+    assert np.isclose(sum(fuel['BUd']), sum(libs['fuel']['BUd']))
+    assert np.allclose(fuel['BUd'], [0.0, 10.0, 20.0])
+    assert np.allclose(out[U235]['BUd'], [0.0, 40.0, 80.0])
+    # per-step values are those of the step that each burn time ends in
+    assert out['k'] == [1.2, 1.1]
+    assert out['xs'] == ['xs2', 'xs3']
+    assert out['particles'] == [200, 300]
+    assert out['phi_g'] == {'E_g': 'E_g', 'phi_g': ['g2', 'g3']}
+    assert fuel['material'][0] is libs['fuel']['material'][0]
+    # halfway between the steps at 10 and 30 days
+    before, after = libs['fuel']['material'][1:3]
+    assert np.isclose(fuel['material'][1].comp[U235],
+                      0.5 * (before.comp[U235] + after.comp[U235]))
+
+
+def test_interpolate_material():
+    materials = [Material({U235: 1.0}, 1000.0), Material({U238: 1.0}, 800.0),
+                 Material({U238: 1.0}, 700.0)]
+    steps = np.array([0.0, 10.0, 20.0])
+    assert _interpolate_material(materials, steps, 10.0) is materials[1]
+    assert _interpolate_material(materials, steps, 20.0) is materials[2]
+    mat = _interpolate_material(materials, steps, 2.5)
+    assert np.isclose(mat.comp[U235], 0.75)
+    assert np.isclose(mat.comp[U238], 0.25)
+    assert np.isclose(mat.mass, 950.0)
+    mat = _interpolate_material(materials, steps, 15.0)
+    assert list(mat.comp) == [U238]
+    assert np.isclose(mat.mass, 750.0)
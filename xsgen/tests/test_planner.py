@@ -0,0 +1,76 @@
+from collections import namedtuple
+
+import numpy as np
+
+from xsgen.planner import tally_bins, output_sizes, calibrate, make_plan, \
+    Plan, STATEPOINT_HEADER_BYTES
+from xsgen.states import StateSpace
+
+State = namedtuple('State', ['fuel_density', 'flux', 'burn_times'])
+
+
+class RC(dict):
+    __getattr__ = dict.__getitem__
+
+
+def make_rc(**kwargs):
+    rc = RC(burn_times=np.array([0.0, 100.0, 200.0, 300.0]),
+            k_particles=1000, k_cycles=20, pilot_particles=200,
+            group_structure=[10.0, 1.0, 0.1], openmc_group_struct=np.logspace(1, -9, 11),
+            track_nucs=[922350, 922380, 942390], formats=('brightlite', 'hdf5'),
+            min_burn_step=10.0)
+    rc['states'] = StateSpace(State, [[9.0, 10.0], [1e14, 2e14, 3e14],
+                                      rc['burn_times']])
+    rc.update(kwargs)
+    return rc
+
+
+def test_tally_bins():
+    bins = tally_bins(['flux', 'omcflux', 's_gh'], [10.0, 1.0, 0.1], range(11))
+    assert bins == {'flux': 2, 'omcflux': 10, 's_gh': 4}
+
+
+def test_output_sizes():
+    sizes = output_sizes(['brightlite', 'npz', 'cyclus'], 6, 4, 3, cyclus_batch=False)
+    assert sizes['brightlite'][0] == 6 * (4 + 5)
+    assert sizes['npz'][0] == 6 + 1
+    assert sizes['cyclus'] == (6, 0)
+    assert output_sizes(['cyclus'], 6, 4, 3)['cyclus'][0] == 1 + 6 * 9
+
+
+def test_make_plan():
+    plan = make_plan(make_rc(), ['flux', 'omcflux'])
+    assert plan.nruns == 6
+    assert plan.nsteps == 18
+    assert plan.openmc_calls == 18
+    assert plan.origen_calls == 18 * 4
+    assert plan.statepoint_size > STATEPOINT_HEADER_BYTES
+    assert 'brightlite' in plan.summary()
+    adaptive = make_plan(make_rc(adaptive_burn=True, adaptive_particles=True), ['flux'])
+    assert adaptive.nsteps == 6 * 30
+    assert adaptive.openmc_calls == 2 * 6 * 30
+    assert 'at most' in adaptive.summary()
+
+
+def test_make_plan_states():
+    rc = make_rc()
+    # e.g. the anchor states of the surrogate
+    anchors = StateSpace(State, [[9.0, 10.0], [1e14, 3e14], rc['burn_times']])
+    plan = make_plan(rc, ['flux'], anchors)
+    assert plan.nruns == 4
+    assert plan.nsteps == 12
+    assert make_plan(rc, ['flux']).nruns == 6
+
+
+def test_calibrate_wall_time():
+    events = [{'name': 'openmc', 'duration': 4.0,
+               'tags': {'threads': 2, 'particles': 100, 'cycles': 10}},
+              {'name': 'origen', 'duration': 1.0, 'tags': {}},
+              {'name': 'origen', 'duration': 3.0, 'tags': {}},
+              {'name': 'step', 'duration': 10.0, 'tags': {}},
+              {'name': 'xs', 'duration': 0.5, 'tags': {}}]
+    timings = calibrate(events)
+    assert timings == {'openmc': 8e-3, 'origen': 2.0, 'step': 0.5}
+    plan = Plan(1, 10, 4, 1000, 0, {})
+    assert plan.wall_time(timings, threads=4) == 10 * (0.5 + 2.0 + 2.0)
+    assert plan.wall_time({}) is None
@@ -0,0 +1,149 @@
+import sys
+
+import pytest
+
+from xsgen.plugins import Plugins
+
+META = '''
+from xsgen.plugins import Plugin
+
+class XSGenPluginMeta(Plugin):
+    defaultrc = {'answer': 42}
+
+    def update_argparser(self, parser):
+        parser.add_argument('--answer', dest='answer', type=int)
+'''
+
+IMPL = '''
+from lazyplug_meta import XSGenPluginMeta
+
+class XSGenPlugin(XSGenPluginMeta):
+    def setup(self, rc):
+        rc.setup_done = True
+'''
+
+
+def test_lazy_loading(tmpdir, monkeypatch):
+    tmpdir.join('lazyplug_meta.py').write(META)
+    tmpdir.join('lazyplug.py').write(IMPL)
+    monkeypatch.syspath_prepend(str(tmpdir))
+    plugins = Plugins(['lazyplug'])
+    assert 'lazyplug' not in sys.modules
+    assert plugins.loaded == [False]
+    ns = plugins.build_cli().parse_args(['--answer', '7'])
+    assert ns.answer == 7
+    rc = plugins.merge_rcs()
+    assert rc.answer == 42
+    plugins.setup()
+    assert 'lazyplug' in sys.modules
+    assert plugins.loaded == [True]
+    assert rc.setup_done
+    modnames = [modname for modname, _, _ in plugins.import_times]
+    assert modnames == ['lazyplug_meta', 'lazyplug']
+    assert 'lazyplug' in plugins.import_summary()
+
+
+class Recorder(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def on_phase_start(self, modname, phase, rc):
+        self.calls.append(('start', modname, phase))
+
+    def on_phase_end(self, modname, phase, metrics, rc):
+        self.calls.append(('end', modname, phase, metrics['ok']))
+
+
+def test_phase_metrics(tmpdir, monkeypatch):
+    tmpdir.join('phaseplug.py').write(IMPL.replace('lazyplug_meta', 'phaseplug_meta'))
+    tmpdir.join('phaseplug_meta.py').write(META)
+    monkeypatch.syspath_prepend(str(tmpdir))
+    recorder = Recorder()
+    plugins = Plugins(['phaseplug'], hooks=[recorder])
+    plugins.merge_rcs()
+    plugins.setup()
+    plugins.execute()
+    assert recorder.calls == [('start', 'phaseplug', 'setup'),
+                              ('end', 'phaseplug', 'setup', True),
+                              ('start', 'phaseplug', 'execute'),
+                              ('end', 'phaseplug', 'execute', True)]
+    assert [m['phase'] for m in plugins.phase_metrics] == ['setup', 'execute']
+    for m in plugins.phase_metrics:
+        assert m['plugin'] == 'phaseplug'
+        assert m['wall'] >= 0.0
+        assert m['cpu'] >= 0.0
+    assert 'execute' in plugins.phase_summary()
+
+
+SAFE = '''
+import time
+from xsgen.plugins import Plugin
+
+class XSGenPlugin(Plugin):
+    requires = {requires!r}
+    parallel_safe = True
+
+    def execute(self, rc):
+        rc.log.append(('start', __name__))
+        time.sleep({sleep})
+        if {fail}:
+            raise ValueError(__name__)
+        rc.log.append(('end', __name__))
+'''
+
+
+def _safe_plugins(tmpdir, monkeypatch, specs):
+    for name, requires, sleep, fail in specs:
+        tmpdir.join(name + '.py').write(SAFE.format(requires=requires,
+                                                    sleep=sleep, fail=fail))
+    monkeypatch.syspath_prepend(str(tmpdir))
+    plugins = Plugins([spec[0] for spec in specs])
+    plugins.merge_rcs()
+    plugins.rc.log = []
+    plugins.rc.plugin_threads = 4
+    plugins.load()
+    return plugins
+
+
+def test_concurrent_execute(tmpdir, monkeypatch):
+    plugins = _safe_plugins(tmpdir, monkeypatch, [
+        ('dagroot', (), 0.05, False),
+        ('dagleft', ('dagroot',), 0.1, False),
+        ('dagright', ('dagroot',), 0.1, False),
+        ])
+    plugins._run_phase('execute')
+    log = plugins.rc.log
+    assert log[:2] == [('start', 'dagroot'), ('end', 'dagroot')]
+    # the two branches overlap
+    assert set(log[2:4]) == set([('start', 'dagleft'), ('start', 'dagright')])
+
+
+def test_concurrent_errors(tmpdir, monkeypatch):
+    plugins = _safe_plugins(tmpdir, monkeypatch, [
+        ('errfirst', (), 0.1, True),
+        ('errsecond', (), 0.0, True),
+        ])
+    try:
+        plugins._run_phase('execute')
+    except ValueError as e:
+        assert str(e) == 'errfirst'
+    else:
+        assert False, 'no error raised'
+    assert [modname for modname, _ in plugins.errors] == ['errfirst', 'errsecond']
+
+
+def test_failed_phase_hooks(tmpdir, monkeypatch):
+    tmpdir.join('failplug.py').write(SAFE.format(requires=(), sleep=0.0, fail=True))
+    monkeypatch.syspath_prepend(str(tmpdir))
+    recorder = Recorder()
+    plugins = Plugins(['failplug'], hooks=[recorder])
+    plugins.merge_rcs()
+    plugins.rc.log = []
+    plugins.load()
+    with pytest.raises(ValueError):
+        plugins._run_phase('execute')
+    assert recorder.calls == [('start', 'failplug', 'execute'),
+                              ('end', 'failplug', 'execute', False)]
+    assert plugins.phase_metrics[-1]['ok'] is False
+    assert 'execute!' in plugins.phase_summary()
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+
+from xsgen.utils import RunControl, NotSpecified
+from xsgen.rccache import rc_key, changed_params, removed_params, load_snapshot, \
+    dump_snapshot, snapshot_path
+
+
+def _rc(tmpdir, text="reactor = 'lwr'\n", **kwargs):
+    path = tmpdir.join('rc.py')
+    path.write(text)
+    return RunControl(rc=str(path), burn_times=[0, 100, 200],
+                      fuel_material={'U235': 0.04, 'U238': 0.96}, **kwargs)
+
+
+def test_rc_key(tmpdir):
+    key = rc_key(_rc(tmpdir))
+    assert key == rc_key(_rc(tmpdir))
+    assert key != rc_key(_rc(tmpdir, text="reactor = 'fr'\n"))
+    assert key != rc_key(_rc(tmpdir, k_particles=10))
+    # objects that are not plain data are not part of the key
+    assert key == rc_key(_rc(tmpdir, tracer=object()))
+
+
+def test_rc_key_nuc_file(tmpdir):
+    nucs = tmpdir.join('nucs.txt')
+    nucs.write('U235 U238')
+    key = rc_key(_rc(tmpdir, track_nucs=str(nucs)))
+    nucs.write('U235 U238 Pu239')
+    assert key != rc_key(_rc(tmpdir, track_nucs=str(nucs)))
+
+
+def test_snapshot_roundtrip(tmpdir):
+    rc = _rc(tmpdir)
+    before = dict(rc._dict)
+    rc.burn_times = np.asarray(rc.burn_times, dtype=float)
+    rc.track_nucs = [922350000, 922380000]
+    params = changed_params(before, rc)
+    assert sorted(params) == ['burn_times', 'track_nucs']
+    cache = str(tmpdir.join('cache'))
+    key = rc_key(_rc(tmpdir))
+    assert load_snapshot(cache, key) is None
+    dump_snapshot(cache, key, params)
+    loaded = load_snapshot(cache, key)['params']
+    assert np.all(loaded['burn_times'] == rc.burn_times)
+    assert loaded['track_nucs'] == rc.track_nucs
+    assert os.listdir(cache) == [key + '.rc.pkl']
+
+
+def test_corrupt_snapshot(tmpdir):
+    cache = tmpdir.mkdir('cache')
+    cache.join('abc.rc.pkl').write('not a pickle')
+    assert load_snapshot(str(cache), 'abc') is None
+    assert snapshot_path(str(cache), 'abc').endswith('abc.rc.pkl')
+
+
+def test_snapshot_removed(tmpdir):
+    rc = _rc(tmpdir, flux=NotSpecified, fuel_specific_power=1.0)
+    before = dict(rc._dict)
+    # like pre._ensure_av, which deletes whichever of these is not specified
+    del rc.flux
+    assert removed_params(before, rc) == ['flux']
+    cache = str(tmpdir.join('cache'))
+    key = rc_key(_rc(tmpdir))
+    dump_snapshot(cache, key, changed_params(before, rc), removed_params(before, rc))
+    snapshot = load_snapshot(cache, key)
+    assert snapshot['params'] == {}
+    assert snapshot['removed'] == ['flux']
@@ -0,0 +1,70 @@
+import pickle
+
+import numpy as np
+
+from xsgen.utils import RunControl, NotSpecified
+from xsgen.rcsnapshot import RCSnapshot, ENGINE_PARAMS
+
+
+def _rc():
+    return RunControl(verbose=False, track_nucs=[922350000, 922380000],
+                      group_structure=np.array([10.0, 1.0, 0.1]),
+                      lattice_shape=(17, 17), max_burn_step=None,
+                      fuel_density=np.atleast_1d(19.1), states=object(),
+                      origen_call=NotSpecified)
+
+
+def test_snapshot():
+    rc = _rc()
+    params = RCSnapshot(rc)
+    assert params.track_nucs == (922350000, 922380000)
+    assert params.lattice_shape == (17, 17)
+    assert params.max_burn_step is None
+    assert np.all(params.group_structure == rc.group_structure)
+    assert 'track_nucs' in params
+    assert 'k_particles' not in params
+    assert 'states' not in params
+    assert params.get('k_particles', 7) == 7
+    assert sorted(params.as_dict()) == sorted(['verbose', 'track_nucs',
+        'group_structure', 'lattice_shape', 'max_burn_step', 'fuel_density'])
+    assert set(params.as_dict()) <= set(ENGINE_PARAMS)
+
+
+def test_snapshot_read_only():
+    params = RCSnapshot(_rc())
+    for func in (lambda: setattr(params, 'verbose', True),
+                 lambda: setattr(params, 'k_particles', 10),
+                 lambda: setattr(params, 'other', 10),
+                 lambda: delattr(params, 'verbose')):
+        try:
+            func()
+        except AttributeError:
+            pass
+        else:
+            assert False, 'snapshot was modified'
+    try:
+        params.group_structure[0] = 1.0
+    except ValueError:
+        pass
+    else:
+        assert False, 'snapshot array was modified'
+
+
+def test_snapshot_pickle():
+    params = RCSnapshot(_rc())
+    loaded = pickle.loads(pickle.dumps(params, pickle.HIGHEST_PROTOCOL))
+    assert loaded.track_nucs == params.track_nucs
+    assert np.all(loaded.fuel_density == params.fuel_density)
+    assert 'k_particles' not in loaded
+    assert not hasattr(loaded, '__dict__')
+
+
+def test_snapshot_rejects_objects():
+    rc = _rc()
+    rc.lattice = object()
+    try:
+        RCSnapshot(rc)
+    except TypeError:
+        pass
+    else:
+        assert False, 'object parameter was frozen'
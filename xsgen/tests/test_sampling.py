@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+import numpy as np
+
+from xsgen.sampling import latin_hypercube, smolyak, sample_states
+from xsgen.states import group_runs
+
+State = namedtuple('State', ['fuel_density', 'clad_density', 'flux', 'burn_times'])
+
+
+def test_latin_hypercube():
+    points = latin_hypercube(50, 3, seed=1)
+    assert points.shape == (50, 3)
+    # every stratum of every dimension is hit exactly once
+    for column in points.T:
+        assert sorted(np.floor(column * 50).astype(int)) == list(range(50))
+
+
+def test_smolyak():
+    assert smolyak(3, 1).tolist() == [[0.5, 0.5, 0.5]]
+    assert len(smolyak(2, 2)) == 5
+    assert len(smolyak(2, 3)) == 13
+    assert len(smolyak(10, 2)) == 21
+    assert len(smolyak(20, 3)) == 841
+
+
+def test_sample_states():
+    data = [[9.0, 11.0], [6.5], [1e14, 1e15], [0, 100, 200]]
+    states = sample_states(State, data, 'lhs', n=8, seed=2)
+    assert len(states) == 24
+    assert all(s.clad_density == 6.5 for s in states)
+    assert all(9.0 <= s.fuel_density <= 11.0 for s in states)
+    runs = group_runs(states)
+    assert len(runs) == 8
+    assert all([s.burn_times for s in run] == [0, 100, 200] for run in runs)
+    states = sample_states(State, data, 'smolyak', level=2)
+    assert len(states) == 5 * 3
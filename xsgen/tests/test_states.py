@@ -0,0 +1,55 @@
+from itertools import product
+from collections import namedtuple
+
+from xsgen.states import run_key, group_runs, StateSpace
+
+State = namedtuple('State', ['fuel_density', 'flux', 'burn_times'])
+
+
+def test_run_key():
+    assert run_key(State(10.0, 1e14, 300)) == (10.0, 1e14)
+
+
+def test_group_runs():
+    states = [State(10.0, 1e14, 200), State(9.0, 1e14, 0), State(10.0, 1e14, 0),
+              State(10.0, 1e14, 100), State(9.0, 1e14, 100)]
+    runs = group_runs(states)
+    assert runs == [[State(10.0, 1e14, 0), State(10.0, 1e14, 100), State(10.0, 1e14, 200)],
+                    [State(9.0, 1e14, 0), State(9.0, 1e14, 100)]]
+
+
+def test_group_runs_large():
+    # a 10^5 state sweep, 10^4 runs of 10 burn times
+    states = [State(*p) for p in product(range(100), range(100), range(0, 1000, 100))]
+    runs = group_runs(states)
+    assert len(runs) == 10**4
+    assert all(len(run) == 10 for run in runs)
+    assert runs[-1][0] == State(99, 99, 0)
+
+
+def test_state_space():
+    data = [[10.0, 9.0], [1e14, 1e15, 1e16], [0, 100, 200]]
+    space = StateSpace(State, data)
+    states = [State(*p) for p in product(*data)]
+    assert len(space) == len(states) == 18
+    assert list(space) == states
+    assert [space[i] for i in range(-18, 18)] == states + states
+    assert space.index(State(9.0, 1e15, 100)) == states.index(State(9.0, 1e15, 100))
+    assert list(space.runs()) == group_runs(states)
+    assert list(space[4:11]) == states[4:11]
+    assert list(space[::5]) == states[::5]
+    assert [len(run) for run in space[4:11].runs()] == [2, 3, 2]
+
+
+def test_shards():
+    data = [range(5), range(7), range(4)]
+    space = StateSpace(State, data)
+    for n in (1, 3, 8, 40):
+        shards = [space.shard(k, n) for k in range(n)]
+        assert sum(len(s) for s in shards) == len(space)
+        assert [st for s in shards for st in s] == list(space)
+        for s in shards:
+            assert all(len(run) == 4 for run in s.runs())
+    part = space[6:50]
+    assert [st for k in range(3) for st in part.shard(k, 3)] == list(part)
+    assert [st for k in range(2) for st in space[::3].shard(k, 2)] == list(space[::3])
@@ -0,0 +1,126 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from xsgen.superposition import perturbations, superpose, linearity_error
+
+
+def test_perturbations():
+    initial = {942390: [0.0, 0.01], 922350: [0.02]}
+    assert perturbations(initial) == [{922350: 0.02, 942390: 0.0},
+                                      {922350: 0.02, 942390: 0.01}]
+    # initial perturbations take precedence over sensitivities
+    assert perturbations(initial, [0.1], [922380]) == perturbations(initial)
+    assert perturbations({}, [0.01, 0.02], [922350, 922380]) == [
+        {922350: 0.01}, {922350: 0.02}, {922380: 0.01}, {922380: 0.02}]
+    assert perturbations({}) == []
+
+
+def test_superpose_untracked():
+    libs = {'fuel': {}, 922350: {}}
+    with pytest.raises(ValueError):
+        superpose(libs, {942390: 0.01})
+
+
+U235, U238, PU239, O16 = 922350000, 922380000, 942390000, 80160000
+
+
+def _libs(Material, fuel_comp=None):
+    """A run whose fuel library is exactly 4% of the U235 library and 96% of
+    the U238 one."""
+    times = [0.0, 100.0, 200.0]
+    nucs = {U235: {'NEUT_PROD': [0.0, 2.4, 2.2], 'NEUT_DEST': [0.0, 1.0, 1.1],
+                   'BUd': [0.0, 30.0, 28.0], 'U235': [1000.0, 900.0, 810.0],
+                   'Pu239': [0.0, 0.0, 0.0],
+                   'material': [{U235: 1.0}, {U235: 0.9, PU239: 0.1},
+                                {U235: 0.81, PU239: 0.19}]},
+           U238: {'NEUT_PROD': [0.0, 0.3, 0.4], 'NEUT_DEST': [0.0, 0.5, 0.6],
+                  'BUd': [0.0, 1.0, 2.0], 'U235': [0.0, 0.0, 0.0],
+                  'Pu239': [0.0, 5.0, 9.0],
+                  'material': [{U238: 1.0}, {U238: 0.995, PU239: 0.005},
+                               {U238: 0.991, PU239: 0.009}]}}
+    weights = {U235: 0.04, U238: 0.96}
+    libs = {'state': 'state'}
+    for nuc, lib in nucs.items():
+        libs[nuc] = {'TIME': times, 'phi_tot': [0.0, 1e14, 1e14],
+                     'tracked_nucs': {'U235': lib['U235'], 'Pu239': lib['Pu239']},
+                     'material': [Material(c, 1000.0) for c in lib['material']]}
+        libs[nuc].update((row, lib[row]) for row in ('NEUT_PROD', 'NEUT_DEST', 'BUd'))
+    fuel = {'TIME': times, 'phi_tot': [0.0, 2e14, 2e14], 'tracked_nucs': {}}
+    for row in ('NEUT_PROD', 'NEUT_DEST', 'BUd'):
+        fuel[row] = [sum(w * nucs[n][row][i] for n, w in weights.items())
+                     for i in range(3)]
+    for name in ('U235', 'Pu239'):
+        fuel['tracked_nucs'][name] = [sum(w * nucs[n][name][i]
+                                          for n, w in weights.items())
+                                      for i in range(3)]
+    fuel['material'] = []
+    for i in range(3):
+        comp = {}
+        for n, w in weights.items():
+            for nuc, frac in nucs[n]['material'][i].items():
+                comp[nuc] = comp.get(nuc, 0.0) + w * frac
+        fuel['material'].append(Material(comp, 1000.0))
+    if fuel_comp is not None:
+        fuel['material'][0] = Material(fuel_comp, 1000.0)
+    libs['fuel'] = fuel
+    return libs
+
+
+def test_linearity_error():
+    Material = pytest.importorskip('pyne.material').Material
+    errors = linearity_error(_libs(Material))
+    for key in ('NEUT_PROD', 'NEUT_DEST', 'BUd', 'trans'):
+        assert errors[key] < 1e-12
+    assert errors['untracked'] < 1e-12
+    # oxygen is not tracked, so it is missing from the superposed fuel
+    libs = _libs(Material, {U235: 0.036, U238: 0.864, O16: 0.1})
+    errors = linearity_error(libs)
+    assert np.isclose(errors['untracked'], 0.1)
+    assert np.isclose(errors['BUd'], 0.1)
+
+
+def test_superpose():
+    Material = pytest.importorskip('pyne.material').Material
+    libs = _libs(Material)
+    fuel, lib = libs['fuel'], libs[U235]
+    out = superpose(libs, {U235: 0.01}, 3)
+    assert out['superposition'] == 3
+    assert out[U235] is lib
+    assert out['state'] == 'state'
+    assert libs['fuel'] is fuel
+    sup = out['fuel']
+    assert sup['TIME'] == fuel['TIME']
+    assert sup['phi_tot'] == fuel['phi_tot']
+    for row in ('NEUT_PROD', 'NEUT_DEST', 'BUd'):
+        assert np.allclose(sup[row], 0.99 * np.array(fuel[row]) +
+                           0.01 * np.array(lib[row]))
+    for name in ('U235', 'Pu239'):
+        assert np.allclose(sup['tracked_nucs'][name],
+                           0.99 * np.array(fuel['tracked_nucs'][name]) +
+                           0.01 * np.array(lib['tracked_nucs'][name]))
+    for i, mat in enumerate(sup['material']):
+        for nuc in (U235, U238, PU239):
+            expected = 0.99 * fuel['material'][i].comp.get(nuc, 0.0) + \
+                0.01 * lib['material'][i].comp.get(nuc, 0.0)
+            assert np.isclose(mat.comp.get(nuc, 0.0), expected)
+
+
+def test_superposition_tolerance_warning():
+    Material = pytest.importorskip('pyne.material').Material
+    pytest.importorskip('openmc')
+    pytest.importorskip('matplotlib')
+    from xsgen.utils import RunControl
+    from xsgen.buk import XSGenPlugin
+    rc = RunControl(track_nuc_threshold=0.0, superposition_tolerance=0.01,
+                    superpositions=[], superposition_outputs=[])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        XSGenPlugin().write_superpositions(rc, _libs(Material), ['state'], 0)
+        assert len(caught) == 0
+        libs = _libs(Material, {U235: 0.036, U238: 0.864, O16: 0.1})
+        XSGenPlugin().write_superpositions(rc, libs, ['state'], 1)
+    assert len(caught) == 1
+    assert issubclass(caught[0].category, RuntimeWarning)
+    assert 'run 1' in str(caught[0].message)
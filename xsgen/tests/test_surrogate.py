@@ -0,0 +1,114 @@
+from itertools import product
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyne')
+
+from xsgen.states import StateSpace
+from xsgen.surrogate import anchor_values, anchor_states, Multilinear, RBF
+
+State = namedtuple('State', ['fuel_density', 'flux', 'burn_times'])
+
+
+def _bilinear(x, y):
+    return np.array([1.0 + 2.0*x - 3.0*y + 0.5*x*y, 4.0 - x])
+
+
+def _grid(f, xs, ys):
+    return np.array([[f(x, y) for y in ys] for x in xs])
+
+
+def test_anchor_values():
+    assert anchor_values([1, 2, 3, 4, 5], 2) == [1, 3, 5]
+    assert anchor_values([1, 2, 3, 4, 5, 6], 2) == [1, 3, 5, 6]
+    assert anchor_values([7], 3) == [7]
+
+
+def test_anchor_states():
+    space = StateSpace(State, [[9.0, 9.5, 10.0], [1.0, 2.0, 3.0, 4.0], [0.0, 100.0]])
+    anchors = anchor_states(space, 2)
+    assert anchors.data[:-1] == [[9.0, 10.0], [1.0, 3.0, 4.0]]
+    assert list(anchors.data[-1]) == [0.0, 100.0]
+    assert len(anchors) == 2 * 3 * 2
+    # sampled states are all simulated
+    sampled = [State(9.0, 1.0, 0.0), State(9.3, 2.5, 0.0)]
+    assert anchor_states(sampled, 2) is sampled
+
+
+def test_multilinear_recovers_bilinear():
+    # the axes do not need to be sorted
+    xs, ys = [0.0, 2.0, 1.0, 5.0], [3.0, -1.0, 0.0]
+    model = Multilinear([xs, ys], _grid(_bilinear, xs, ys))
+    rng = np.random.RandomState(1)
+    for x, y in zip(rng.uniform(0, 5, 20), rng.uniform(-1, 3, 20)):
+        assert np.allclose(model([x, y]), _bilinear(x, y))
+    # a dimension with a single value is constant along it
+    model = Multilinear([xs, [2.0]], _grid(_bilinear, xs, [2.0]))
+    assert np.allclose(model([1.5, 2.0]), _bilinear(1.5, 2.0))
+
+
+def test_multilinear_loo_errors():
+    xs, ys = [0.0, 1.0, 3.0, 4.0], [0.0, 1.0, 2.5]
+    model = Multilinear([xs, ys], _grid(_bilinear, xs, ys))
+    errors = model.loo_errors()
+    assert errors.shape == (2*len(ys) + len(xs), 2)
+    assert np.allclose(errors, 0.0)
+
+    def f(x, y):
+        return np.array([x**2 + y, np.sin(x*y)])
+    values = _grid(f, xs, ys)
+    model = Multilinear([xs, ys], values)
+    # each interior line predicted from a grid without it
+    expected = []
+    for k, axis in enumerate([xs, ys]):
+        for j in range(1, len(axis) - 1):
+            axes = [xs, ys]
+            axes[k] = np.delete(axis, j)
+            sub = Multilinear(axes, np.delete(values, j, axis=k))
+            others = [xs, ys][1 - k]
+            for other in others:
+                point = [axis[j], other] if k == 0 else [other, axis[j]]
+                expected.append(sub(point) - f(*point))
+    assert np.allclose(model.loo_errors(), expected)
+    # x**2 at x = 1 from x = 0 and 3: 9/3 - 1
+    assert np.isclose(model.loo_errors()[0, 0], 2.0)
+
+
+def test_rbf_recovers_linear():
+    rng = np.random.RandomState(2)
+    points = rng.uniform(0, 10, (15, 2))
+    values = np.array([[1.0 + 2.0*x - 3.0*y, 5.0] for x, y in points])
+    model = RBF(points, values)
+    for x, y in rng.uniform(0, 10, (20, 2)):
+        assert np.allclose(model([x, y]), [1.0 + 2.0*x - 3.0*y, 5.0])
+    assert np.allclose(model.loo_errors(), 0.0)
+
+
+def test_rbf_interpolates():
+    rng = np.random.RandomState(3)
+    points = rng.uniform(0, 1, (30, 2))
+    f = lambda p: np.array([np.sin(3*p[0]) * np.cos(2*p[1]), p[0]**2])
+    values = np.array([f(p) for p in points])
+    model = RBF(points, values)
+    for p, v in zip(points, values):
+        assert np.allclose(model(p), v)
+    test = rng.uniform(0.2, 0.8, (20, 2))
+    err = np.array([model(p) - f(p) for p in test])
+    assert np.sqrt(np.mean(err**2)) < 0.05
+
+
+def test_rbf_loo_errors():
+    rng = np.random.RandomState(4)
+    # the corners fix the bounding box, so every fit without an interior
+    # point scales the points the same way
+    corners = np.array(list(product([0.0, 1.0], [0.0, 2.0])))
+    points = np.vstack([corners, rng.uniform([0.1, 0.2], [0.9, 1.8], (16, 2))])
+    values = np.array([[np.exp(x) * y, x - y**2] for x, y in points])
+    errors = RBF(points, values).loo_errors()
+    assert errors.shape == values.shape
+    for i in range(len(corners), len(points)):
+        keep = np.arange(len(points)) != i
+        sub = RBF(points[keep], values[keep])
+        assert np.allclose(errors[i], sub(points[i]) - values[i])
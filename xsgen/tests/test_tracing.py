@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+from xsgen.tracing import Tracer, load_trace
+
+
+def test_nested_tags():
+    tracer = Tracer()
+    with tracer.span('run', run=3):
+        with tracer.span('step', step=1):
+            tracer.add('origen', 0.0, 2.0, mat='fuel')
+    names = [e['name'] for e in tracer.events]
+    assert names == ['origen', 'step', 'run']
+    assert tracer.events[0]['tags'] == {'run': 3, 'step': 1, 'mat': 'fuel'}
+    assert tracer.totals()['origen'] == (1, 2.0)
+
+
+def test_disabled():
+    tracer = Tracer(enabled=False)
+    with tracer.span('run', run=0):
+        pass
+    assert tracer.events == []
+
+
+def test_dump_roundtrip():
+    for format in ('jsonl', 'chrome'):
+        tracer = Tracer(format=format)
+        with tracer.span('openmc', step=2):
+            pass
+        path = os.path.join(tempfile.mkdtemp(), 'trace.' + format)
+        tracer.dump(path)
+        events = load_trace(path)
+        assert len(events) == 1
+        assert events[0]['name'] == 'openmc'
+        assert events[0]['tags'] == {'step': 2}
@@ -0,0 +1,203 @@
+"""Lightweight tracing of the phases of an xsgen execution.
+
+Spans are opened with the ``Tracer.span()`` context manager and may be nested.
+Tags given to an outer span (e.g. the run number) are inherited by all of the
+spans opened inside of it, so that every phase of a timestep can be attributed
+to its run, state, and step.  Finished spans are kept in memory and may be
+dumped either as JSON lines or in the Chrome trace event format, which can be
+loaded into ``chrome://tracing`` or Perfetto.
+
+Tracing API
+===========
+"""
+from __future__ import print_function
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+TRACE_FORMATS = ('jsonl', 'chrome')
+
+
+class Tracer(object):
+    """Records timed spans of work."""
+
+    def __init__(self, path=None, format='jsonl', enabled=True):
+        """Parameters
+        ----------
+        path : str or None, optional
+            File to dump the trace to.  If None, spans are only kept in memory.
+        format : str, optional
+            Either 'jsonl' or 'chrome'.
+        enabled : bool, optional
+            When False, spans are not recorded at all.
+
+        """
+        if format not in TRACE_FORMATS:
+            raise ValueError("trace format must be one of {0}, got {1!r}".format(
+                             TRACE_FORMATS, format))
+        self.path = path
+        self.format = format
+        self.enabled = enabled
+        self.events = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+
+    @property
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @property
+    def tags(self):
+        """The tags of the innermost open span in this thread."""
+        stack = self._stack
+        return dict(stack[-1]) if stack else {}
+
+    @contextmanager
+    def span(self, name, **tags):
+        """Times the enclosed block as a span called name.  Keyword arguments
+        are attached to the span (and to all spans nested inside of it) as tags.
+        """
+        if not self.enabled:
+            yield
+            return
+        alltags = self.tags
+        alltags.update(tags)
+        self._stack.append(alltags)
+        start = time.time()
+        try:
+            yield
+        finally:
+            duration = time.time() - start
+            self._stack.pop()
+            self._record(name, start, duration, alltags)
+
+    def add(self, name, start, duration, **tags):
+        """Records a span that was timed elsewhere, such as in a worker process.
+
+        Parameters
+        ----------
+        name : str
+            Name of the span.
+        start : float
+            Start time of the span, in seconds since the epoch.
+        duration : float
+            Length of the span [s].
+        tags : optional
+            Extra tags, added to those of the currently open span.
+        """
+        if not self.enabled:
+            return
+        alltags = self.tags
+        alltags.update(tags)
+        self._record(name, start, duration, alltags)
+
+    def _record(self, name, start, duration, tags):
+        event = {'name': name, 'start': start, 'duration': duration,
+                 'pid': os.getpid(), 'tid': threading.current_thread().ident,
+                 'tags': _jsonable(tags)}
+        with self._lock:
+            self.events.append(event)
+
+    def totals(self):
+        """Aggregates the recorded spans by name.
+
+        Returns
+        -------
+        totals : dict
+            Maps span names to (count, total duration [s]) tuples.
+        """
+        totals = {}
+        for event in self.events:
+            count, total = totals.get(event['name'], (0, 0.0))
+            totals[event['name']] = (count + 1, total + event['duration'])
+        return totals
+
+    def summary(self):
+        """Returns a table of the time spent in each kind of span."""
+        totals = self.totals()
+        if len(totals) == 0:
+            return "No spans were traced."
+        width = max(len(name) for name in totals)
+        template = "{0:<{w}}  {1:>8}  {2:>12}  {3:>12}"
+        lines = [template.format("span", "count", "total [s]", "mean [s]", w=width)]
+        for name, (count, total) in sorted(totals.items(), key=lambda x: -x[1][1]):
+            lines.append(template.format(name, count, "{0:.4f}".format(total),
+                                         "{0:.4f}".format(total / count), w=width))
+        return "\n".join(lines)
+
+    def dump(self, path=None, format=None):
+        """Writes the recorded spans out to a file.
+
+        Parameters
+        ----------
+        path : str or None, optional
+            Output file, defaults to the tracer's path.  Nothing is written if
+            neither is given.
+        format : str or None, optional
+            Output format, defaults to the tracer's format.
+        """
+        path = self.path if path is None else path
+        format = self.format if format is None else format
+        if path is None:
+            return
+        with open(path, 'w') as f:
+            if format == 'chrome':
+                json.dump({'traceEvents': [self._chrome_event(e) for e in self.events],
+                           'displayTimeUnit': 'ms'}, f)
+            else:
+                for event in self.events:
+                    f.write(json.dumps(event))
+                    f.write("\n")
+
+    def _chrome_event(self, event):
+        return {'name': event['name'], 'ph': 'X', 'pid': event['pid'],
+                'tid': event['tid'], 'args': event['tags'],
+                'ts': (event['start'] - self._t0) * 1e6,
+                'dur': event['duration'] * 1e6}
+
+
+def load_trace(path):
+    """Reads the spans from a trace file written by ``Tracer.dump()`` in
+    either format.
+
+    Parameters
+    ----------
+    path : str
+        Path to the trace file.
+
+    Returns
+    -------
+    events : list of dicts
+        The spans, with 'name', 'start', 'duration', and 'tags' keys.
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    if text.lstrip().startswith('{"traceEvents"'):
+        events = []
+        for e in json.loads(text)['traceEvents']:
+            events.append({'name': e['name'], 'start': e['ts'] * 1e-6,
+                           'duration': e['dur'] * 1e-6, 'tags': e.get('args', {})})
+        return events
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _jsonable(tags):
+    """Makes sure that tag values, which are often numpy scalars or State
+    namedtuples, may be serialized to JSON."""
+    clean = {}
+    for key, value in tags.items():
+        if hasattr(value, '_asdict'):
+            value = dict((k, _jsonable({'v': v})['v'])
+                         for k, v in value._asdict().items())
+        elif hasattr(value, 'tolist'):
+            value = value.tolist()
+        elif not isinstance(value, (int, float, bool, str, type(None))):
+            value = str(value)
+        clean[key] = value
+    return clean
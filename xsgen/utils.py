@@ -5,8 +5,6 @@ import subprocess
 from pprint import pformat
 from contextlib import contextmanager
 
-from pyne import nucname
-
 import sys
 if sys.version_info[0] >= 3:
     basestring = str
@@ -18,6 +16,7 @@ DEFAULT_PLUGINS = ("xsgen.pre", "xsgen.buk", "xsgen.post")
 def load_nuc_file(path):
     """Takes a file that contains whitespace separated nuclide names and
     returns the zzaaam representation as a sorted list."""
+    from pyne import nucname
     with open(path, 'r') as f:
         s = f.read()
 
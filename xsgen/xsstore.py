@@ -0,0 +1,189 @@
+"""A memory-mapped store for the fine-group cross sections that the physics
+engines load into their data sources.
+
+Loading the OpenMC, EAF, and simple data sources at a given temperature is
+expensive, especially for fine (e.g. 1001-group) source group structures.  The
+first process to need a given set of tables exports them into a flat NumPy
+file, alongside an index of where each (nuclide, reaction, temperature)
+cross section lives.  Every later process - pool workers or concurrent xsgen
+runs pointing at the same store directory - attaches to the file read-only.
+Since the file is memory-mapped, the pages are shared through the operating
+system's page cache rather than being copied into each process.
+
+Cross section store API
+=======================
+"""
+from __future__ import print_function
+import os
+import time
+import hashlib
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from xsgen.version import xsgen_version
+
+INDEX_DTYPE = np.dtype([('ds', 'i4'), ('nuc', 'i8'), ('rx', 'i8'), ('temp', 'f8'),
+                        ('start', 'i8'), ('stop', 'i8')])
+
+
+def store_key(rc):
+    """Computes the name of the store for a run control, from everything that
+    determines the contents of the loaded data sources.
+
+    Parameters
+    ----------
+    rc : xsgen.utils.RunControl
+
+    Returns
+    -------
+    key : str
+        A hex digest.
+    """
+    h = hashlib.sha1()
+    h.update(xsgen_version.encode())
+    h.update(repr((rc.temperature, rc.is_thermal, rc.openmc_cross_sections)).encode())
+    h.update(np.ascontiguousarray(rc.openmc_group_struct, dtype='f8').tobytes())
+    return h.hexdigest()
+
+
+def max_rss():
+    """The peak resident set size of this process [MB], or None if this is not
+    available on this platform."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class XSStore(object):
+    """A store of the fine-group cross section tables of a list of data sources."""
+
+    def __init__(self, path):
+        """Parameters
+        ----------
+        path : str
+            Path of the store, without extension.  The store consists of the
+            files ``path + '.data.npy'`` and ``path + '.index.npy'``.
+
+        """
+        self.path = path
+        self.data = None
+        self.index = None
+
+    @property
+    def datafile(self):
+        return self.path + '.data.npy'
+
+    @property
+    def indexfile(self):
+        return self.path + '.index.npy'
+
+    def exists(self):
+        """Whether the store has been exported."""
+        return os.path.isfile(self.datafile) and os.path.isfile(self.indexfile)
+
+    def export(self, data_sources):
+        """Writes the loaded tables of the data sources to the store.  The files
+        are written under temporary names and then moved into place so that
+        concurrent processes never attach to a partial store.
+
+        Parameters
+        ----------
+        data_sources : list of pyne.xs.data_source.DataSource
+            Data sources whose ``rxcache`` has been filled by ``load()``.
+        """
+        index = []
+        chunks = []
+        start = 0
+        for i, ds in enumerate(data_sources):
+            for key, value in getattr(ds, 'rxcache', {}).items():
+                if value is None or len(key) != 3:
+                    continue
+                value = np.asarray(value)
+                if value.ndim != 1 or value.dtype.kind not in 'fiu':
+                    continue
+                nuc, rx, temp = key
+                stop = start + len(value)
+                index.append((i, nuc, rx, temp, start, stop))
+                chunks.append(value.astype('f8'))
+                start = stop
+        d = os.path.dirname(self.path)
+        if d and not os.path.isdir(d):
+            os.makedirs(d)
+        tmp = '.{0}.tmp'.format(os.getpid())
+        data = np.concatenate(chunks) if chunks else np.empty(0, 'f8')
+        with open(self.datafile + tmp, 'wb') as f:
+            np.save(f, data)
+        with open(self.indexfile + tmp, 'wb') as f:
+            np.save(f, np.array(index, dtype=INDEX_DTYPE))
+        os.rename(self.datafile + tmp, self.datafile)
+        os.rename(self.indexfile + tmp, self.indexfile)
+
+    def open(self):
+        """Memory-maps the store read-only."""
+        self.data = np.load(self.datafile, mmap_mode='r')
+        self.index = np.load(self.indexfile)
+
+    def attach(self, data_sources):
+        """Fills the ``rxcache`` of the data sources with read-only views into
+        the store, in place of calling their ``load()`` methods.  Reactions not
+        found in the store are still loaded lazily by the data sources.
+
+        Parameters
+        ----------
+        data_sources : list of pyne.xs.data_source.DataSource
+            The same kinds of data sources, in the same order, that the store
+            was exported from.
+        """
+        if self.data is None:
+            self.open()
+        data = self.data
+        for i, nuc, rx, temp, start, stop in self.index.tolist():
+            data_sources[i].rxcache[nuc, rx, temp] = data[start:stop]
+
+
+def load_data_sources(data_sources, temp, xscache, store_dir=None, key=None):
+    """Loads the data sources and the cross section cache, going through the
+    store in store_dir when one is given.
+
+    Parameters
+    ----------
+    data_sources : list of pyne.xs.data_source.DataSource
+        The data sources to load.
+    temp : float
+        The temperature to load the data sources at [K].
+    xscache : pyne.xs.cache.XSCache
+        The cache built on top of the data sources.
+    store_dir : str or None, optional
+        Directory of the store.  If None, the data sources are loaded directly.
+    key : str or None, optional
+        Name of the store in store_dir, see ``store_key()``.
+
+    Returns
+    -------
+    stats : dict
+        How the tables were loaded ('source' is one of 'direct', 'export', or
+        'attach'), the load time [s], and the peak RSS afterwards [MB].
+    """
+    start = time.time()
+    if store_dir is None:
+        source = 'direct'
+        for ds in data_sources:
+            ds.load(temp)
+        xscache.load()
+    else:
+        store = XSStore(os.path.join(store_dir, key))
+        if store.exists():
+            source = 'attach'
+            store.attach(data_sources)
+        else:
+            source = 'export'
+            for ds in data_sources:
+                ds.load(temp)
+            xscache.load()
+            store.export(data_sources)
+    return {'source': source, 'time': time.time() - start, 'rss': max_rss()}